@@ -88,6 +88,12 @@ model_applications/clouds/GridStat_fcstMPAS_obsERA5_cloudBaseHgt.conf
 #
 # .. highlight:: bash
 # .. literalinclude:: ../../../../parm/use_cases/model_applications/clouds/GridStat_fcstMPAS_obsERA5_cloudBaseHgt/read_input_data.py
+#
+# The script imports the reader functions that are shared by all of the cloud
+# use cases from parm/use_cases/model_applications/clouds/read_cloud_data.py
+#
+# .. highlight:: bash
+# .. literalinclude:: ../../../../parm/use_cases/model_applications/clouds/read_cloud_data.py
 
 ##############################################################################
 # Running METplus
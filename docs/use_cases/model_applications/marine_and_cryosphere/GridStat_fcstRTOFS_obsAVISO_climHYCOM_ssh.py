@@ -38,7 +38,7 @@ model_applications/marine_and_cryosphere/GridStat_fcstRTOFS_obsAVISO_climHYCOM_s
 # You will need to use a version of Python 3.6+ that has the following packages installed:
 #
 # * scikit-learn
-# * pyresample
+# * scipy
 #
 # If the version of Python used to compile MET did not have these libraries at the time of compilation, you will need to add these packages or create a new Python environment with these packages.
 #
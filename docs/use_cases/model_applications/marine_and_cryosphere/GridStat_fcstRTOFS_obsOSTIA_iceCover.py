@@ -35,7 +35,7 @@ model_applications/marine_and_cryosphere/GridStat_fcstRTOFS_obsOSTIA_iceCover.co
 #
 # * scikit-learn
 # * pyproj
-# * pyresample
+# * scipy
 #
 # If the version of Python used to compile MET did not have these libraries at the time of compilation, you will need to add these packages or create a new Python environment with these packages.
 #
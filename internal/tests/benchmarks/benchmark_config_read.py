@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Program Name: benchmark_config_read.py
+Contact(s): George McCabe
+Description: Time reading every option of a METplus final conf file. Every
+ option is read once with the expanded values discarded before each read,
+ then several more times using the cached values, like wrappers that read
+ the same variables when they are initialized and for each run time.
+ Reads that expand values are most of the time spent initializing wrappers.
+Usage:
+  benchmark_config_read.py [final_conf] [--passes N] [--options N]
+If final_conf is not provided, a conf with the requested number of options
+is generated. Each generated option refers to other options so reading it
+requires nested string expansion, similar to the *_INPUT_DIR and
+*_OUTPUT_TEMPLATE values in a typical final conf.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir,
+                                                os.pardir)))
+
+from metplus.util.config_metplus import METplusConfig
+
+
+def write_generated_conf(filename, num_options):
+    """! Write a conf file with many options that refer to each other.
+
+    @param filename path to write
+    @param num_options number of options to write in the [config] section
+    """
+    with open(filename, 'w') as file_handle:
+        file_handle.write('[config]\n')
+        file_handle.write('INPUT_BASE = /d1/data/input\n')
+        file_handle.write('OUTPUT_BASE = /d1/data/output\n')
+        for index in range(num_options):
+            if index % 3 == 0:
+                value = f'{{INPUT_BASE}}/model_{index}'
+            elif index % 3 == 1:
+                value = f'{{VAR_{index - 1}}}/{{OUTPUT_BASE}}/sub_{index}'
+            else:
+                value = f'{{VAR_{index - 1}}}/{{valid?fmt=%Y%m%d}}/file.nc'
+            file_handle.write(f'VAR_{index} = {value}\n')
+
+
+def get_readers(config):
+    """! Get the function to read each option in every section of the config.
+    Filename templates cannot be expanded by getstr because they contain
+    tags like {valid?fmt=%Y%m%d} that are filled in for each run time, so
+    they are read with getraw like the wrappers do.
+
+    @param config METplusConfig object
+    @returns list of tuples of the function, section, and option
+    """
+    readers = []
+    for section in config.sections():
+        for option in config.keys(section):
+            try:
+                config.getstr(section, option)
+                readers.append((config.getstr, section, option))
+            except (KeyError, ValueError, IndexError):
+                readers.append((config.getraw, section, option))
+    return readers
+
+
+def read_all_options(config, readers, use_cache):
+    """! Read every option in the config.
+
+    @param config METplusConfig object
+    @param readers list of tuples from get_readers
+    @param use_cache if False, discard cached values before each read
+    @returns number of options that were read
+    """
+    for reader, section, option in readers:
+        if not use_cache:
+            config._clear_interp_cache()
+        reader(section, option)
+    return len(readers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('Usage:')[0])
+    parser.add_argument('final_conf', nargs='?',
+                        help='final conf file from a METplus run')
+    parser.add_argument('--passes', type=int, default=5,
+                        help='number of times to read every option')
+    parser.add_argument('--options', type=int, default=5000,
+                        help='number of options to generate if final_conf '
+                             'is not provided')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conf_file = args.final_conf
+        if not conf_file:
+            conf_file = os.path.join(tmp_dir, 'generated.conf')
+            write_generated_conf(conf_file, args.options)
+
+        config = METplusConfig()
+        config.read(conf_file)
+        readers = get_readers(config)
+
+        num_getstr = sum(1 for reader, _, _ in readers
+                         if reader == config.getstr)
+        print(f'Read {len(readers)} options: {num_getstr} with getstr and '
+              f'{len(readers) - num_getstr} templates with getraw')
+
+        # discard values before each read, then fill the cache on the first
+        # pass that uses it and read the cached values on the other passes
+        passes = ([('uncached', False), ('cold', True)] +
+                  [('warm', True)] * (args.passes - 1))
+        config._clear_interp_cache()
+        for label, use_cache in passes:
+            start_time = time.perf_counter()
+            count = read_all_options(config, readers, use_cache)
+            elapsed = time.perf_counter() - start_time
+            print(f'{label:>8}: {elapsed:.3f} seconds '
+                  f'({elapsed / count * 1e6:.1f} microseconds per option)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Program Name: benchmark_datastore_contention.py
+Contact(s): George McCabe
+Description: Time several processes writing to the same produtil Datastore
+ at once, first with the default file locking and then with the sqlite3
+ write-ahead log. Each writer creates products and updates their location,
+ availability and metadata, like tasks that deliver output files. With file
+ locking, a writer that cannot get the lock sleeps before trying again, so
+ most of the time is spent waiting once more than one process is writing.
+Usage:
+  benchmark_datastore_contention.py [--writers N] [--products N]
+      [--updates N] [--batch N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir,
+                                                os.pardir)))
+
+from produtil.datastore import Datastore, Product
+
+
+def run_writer(filename, wal, writer_id, num_products, num_updates, batch,
+               start_event):
+    """! Create products and update them many times.
+
+    @param filename path to the sqlite3 database file
+    @param wal if True, use the write-ahead log instead of file locking
+    @param writer_id number used to give each writer its own products
+    @param num_products number of products to create
+    @param num_updates number of times to update each product
+    @param batch number of updates to make in each transaction
+    @param start_event multiprocessing.Event set when all writers are ready
+    """
+    datastore = Datastore(filename, wal=wal)
+    start_event.wait()
+    products = [Product(datastore, f'file_{index}', f'writer_{writer_id}')
+                for index in range(num_products)]
+    updates = [(product, update) for update in range(num_updates)
+               for product in products]
+    for index in range(0, len(updates), batch):
+        with datastore.transaction():
+            for product, update in updates[index:index + batch]:
+                product.set_loc_avail(f'/d1/output/{product.prodname}.'
+                                      f'{update}', True)
+                product['update'] = str(update)
+
+
+def run_writers(filename, wal, args):
+    """! Start the writer processes and wait for all of them to finish.
+
+    @param filename path to the sqlite3 database file
+    @param wal if True, use the write-ahead log instead of file locking
+    @param args parsed command line arguments
+    @returns number of seconds from starting the writers until all finished
+    """
+    # create the tables before starting the writers
+    Datastore(filename, wal=wal)
+    start_event = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=run_writer,
+                                args=(filename, wal, writer_id,
+                                      args.products, args.updates,
+                                      args.batch, start_event))
+        for writer_id in range(args.writers)
+    ]
+    for process in processes:
+        process.start()
+
+    start_time = time.perf_counter()
+    start_event.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start_time
+
+    if any(process.exitcode for process in processes):
+        raise RuntimeError('A writer process failed')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('Usage:')[0])
+    parser.add_argument('--writers', type=int, default=8,
+                        help='number of writer processes')
+    parser.add_argument('--products', type=int, default=20,
+                        help='number of products created by each writer')
+    parser.add_argument('--updates', type=int, default=10,
+                        help='number of times each product is updated')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='number of product updates in each transaction')
+    args = parser.parse_args()
+
+    num_writes = args.writers * args.products * args.updates
+    print(f'{args.writers} writers making {num_writes} product updates, '
+          f'{args.batch} per transaction')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, wal in (('lockfile', False), ('wal', True)):
+            filename = os.path.join(tmp_dir, f'{label}.sqlite3')
+            elapsed = run_writers(filename, wal, args)
+            print(f'{label:>8}: {elapsed:.3f} seconds '
+                  f'({num_writes / elapsed:.0f} updates per second)')
+
+
+if __name__ == '__main__':
+    main()
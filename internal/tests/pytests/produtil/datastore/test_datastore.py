@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import pytest
+
+import os
+import sys
+import sqlite3
+import threading
+import logging
+import subprocess
+from pathlib import Path
+
+from produtil.datastore import Datastore, Product, FileProduct
+from produtil.datastore import wait_for_products
+from produtil.filewatch import inotify_available
+
+# get METplus directory relative to this file
+# from this script's directory, go up 5 directories
+METPLUS_DIR = str(Path(__file__).parents[5])
+
+WRITER_SCRIPT = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from produtil.datastore import Datastore, Product
+datastore = Datastore(sys.argv[2], wal=True)
+for index in range(int(sys.argv[4])):
+    with datastore.transaction():
+        product = Product(datastore, f'file_{index}', sys.argv[3])
+        product.set_loc_avail(f'/path/{sys.argv[3]}/{index}', True)
+assert not datastore._connections
+'''
+
+
+def _count_rows(filename, table):
+    connection = sqlite3.connect(filename)
+    try:
+        return connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def _write_products(datastore, category, num_products):
+    for index in range(num_products):
+        with datastore.transaction():
+            product = Product(datastore, f'file_{index}', category,
+                              meta={'index': str(index)})
+            product.set_loc_avail(f'/path/{category}/{index}', True)
+
+
+@pytest.mark.util
+def test_datastore_wal_threads(tmp_path_factory):
+    filename = os.path.join(tmp_path_factory.mktemp('datastore'), 'ds.db')
+    datastore = Datastore(filename, wal=True)
+    num_threads = 4
+    num_products = 25
+    errors = []
+
+    def run_writer(writer_id):
+        try:
+            _write_products(datastore, f'thread{writer_id}', num_products)
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=run_writer, args=(writer_id,))
+               for writer_id in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    # connections are returned to the pool after each transaction and
+    # reused by other threads instead of opening one per transaction
+    assert not datastore._connections
+    assert 0 < len(datastore._idle_connections) <= num_threads
+
+    # changes were committed and can be read by another connection
+    expected = num_threads * num_products
+    assert _count_rows(filename, 'products') == expected
+    assert _count_rows(filename, 'metadata') == expected
+    connection = sqlite3.connect(filename)
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    connection.close()
+
+
+@pytest.mark.util
+def test_datastore_wal_processes(tmp_path_factory):
+    filename = os.path.join(tmp_path_factory.mktemp('datastore'), 'ds.db')
+    datastore = Datastore(filename, wal=True)
+    num_products = 50
+    processes = [
+        subprocess.Popen([sys.executable, '-c', WRITER_SCRIPT, METPLUS_DIR,
+                          filename, f'process{writer_id}', str(num_products)])
+        for writer_id in range(2)
+    ]
+    # write from this process at the same time
+    _write_products(datastore, 'parent', num_products)
+    assert [process.wait() for process in processes] == [0, 0]
+
+    assert not datastore._connections
+    assert _count_rows(filename, 'products') == 3 * num_products
+    with datastore.transaction() as transaction:
+        rows = transaction.query('SELECT location FROM products WHERE id=?',
+                                 (f'process1::file_{num_products - 1}',))
+    assert rows == [(f'/path/process1/{num_products - 1}',)]
+
+
+@pytest.mark.util
+def test_datastore_wal_busy(tmp_path_factory):
+    filename = os.path.join(tmp_path_factory.mktemp('datastore'), 'ds.db')
+    datastore = Datastore(filename, wal=True, busy_timeout=0.2)
+
+    # another connection holds the write lock
+    other = sqlite3.connect(filename, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    with pytest.raises(sqlite3.OperationalError):
+        with datastore.transaction():
+            pass
+    # connection is released if the lock could not be acquired
+    assert not datastore._connections
+    other.execute('ROLLBACK')
+    other.close()
+
+    # nested transactions are committed when the outermost one exits
+    with datastore.transaction() as transaction:
+        with datastore.transaction() as inner:
+            inner.mutate_many('INSERT INTO metadata VALUES (?,?,?)',
+                              [('id', f'key{index}', str(index))
+                               for index in range(5)])
+        assert len(datastore._connections) == 1
+        transaction.mutate('INSERT INTO metadata VALUES (?,?,?)',
+                           ('id', 'key5', '5'))
+    assert not datastore._connections
+    assert _count_rows(filename, 'metadata') == 6
+
+
+@pytest.mark.parametrize(
+    'wal, watch', [
+        (False, True),
+        (True, True),
+        (False, False),
+    ]
+)
+@pytest.mark.util
+def test_wait_for_products_missing(tmp_path_factory, monkeypatch, caplog,
+                                   wal, watch):
+    if watch and not inotify_available():
+        pytest.skip('inotify is not available')
+
+    work_dir = tmp_path_factory.mktemp('datastore')
+    datastore = Datastore(os.path.join(work_dir, 'ds.db'), wal=wal)
+    product = FileProduct(datastore, 'missing', 'test',
+                          location=os.path.join(work_dir, 'missing.nc'))
+
+    num_checks = 0
+    check = FileProduct.check
+    def count_checks(self, *args, **kwargs):
+        nonlocal num_checks
+        num_checks += 1
+        return check(self, *args, **kwargs)
+
+    monkeypatch.setattr(FileProduct, 'check', count_checks)
+    logger = logging.getLogger('test_wait_for_products_missing')
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        found = wait_for_products(product, logger, sleeptime=1, maxtime=3,
+                                  watch=watch, min_sleeptime=1)
+
+    assert found == 0
+    # checking the product must not wake up the watcher, so the product is
+    # only checked about once per second instead of continuously
+    assert num_checks <= 10
+    not_available = [record for record in caplog.records
+                     if 'not available' in record.getMessage() and
+                     record.levelno >= logging.INFO]
+    assert 1 <= len(not_available) <= num_checks
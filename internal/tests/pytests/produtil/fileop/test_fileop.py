@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import threading
+
+import pytest
+
+from produtil.fileop import wait_for_files
+
+
+@pytest.mark.parametrize(
+    'watch', [True, False]
+)
+@pytest.mark.util
+def test_wait_for_files_no_logger(tmp_path_factory, watch):
+    input_dir = str(tmp_path_factory.mktemp('wait'))
+    new_file = os.path.join(input_dir, 'new.nc')
+
+    def write_file():
+        time.sleep(1.5)
+        with open(new_file, 'w') as file_handle:
+            file_handle.write('data')
+
+    writer = threading.Thread(target=write_file)
+    writer.start()
+    try:
+        assert wait_for_files([new_file], logger=None, maxwait=10,
+                              sleeptime=1, min_mtime_age=0, watch=watch)
+    finally:
+        writer.join()
+
+    # give up after maxwait if file is never written
+    missing = os.path.join(input_dir, 'missing.nc')
+    assert not wait_for_files([missing], logger=None, maxwait=3,
+                              sleeptime=1, watch=watch)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import pytest
+
+import os
+import sys
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+# get METplus directory relative to this file
+# from this script's directory, go up 4 directories
+METPLUS_DIR = str(Path(__file__).parents[4])
+sys.path.insert(0, METPLUS_DIR)
+
+from internal.tests.use_cases import run_use_case_suite as suite
+
+
+def _make_job(tmp_dir, name, code='pass', requirements=None, memory=None,
+              prev_time=None):
+    """! Create a use case job that runs a Python command instead of
+    run_metplus.py.
+    """
+    use_case = SimpleNamespace(name=name)
+    job = suite.UseCaseJob(use_case, 'category', requirements or [],
+                           [sys.executable, '-c', code], os.environ.copy(),
+                           os.path.join(tmp_dir, 'output', name),
+                           os.path.join(tmp_dir, 'logs', f'{name}.log'))
+    if memory is not None:
+        job.est_memory = memory
+    if prev_time is not None:
+        job.est_time = job.prev_time = prev_time
+    return job
+
+
+@pytest.mark.parametrize(
+    'pending_memory, running_memory, max_jobs, max_memory, expected', [
+        # nothing to run
+        ([], [], 2, None, None),
+        # nothing running always starts first job
+        ([100, 200], [], 2, 50, 0),
+        # no memory budget starts first job
+        ([100, 200], [100], 2, None, 0),
+        # job count is full
+        ([100], [100, 100], 2, None, None),
+        # first job that fits within memory budget is started
+        ([400, 200], [500], 3, 800, 1),
+        # no job fits within memory budget
+        ([400, 400], [500], 3, 800, None),
+    ]
+)
+@pytest.mark.util
+def test_get_next_job(tmp_path_factory, pending_memory, running_memory,
+                      max_jobs, max_memory, expected):
+    tmp_dir = str(tmp_path_factory.mktemp('suite'))
+    pending = [_make_job(tmp_dir, f'pending{index}', memory=memory)
+               for index, memory in enumerate(pending_memory)]
+    running = {
+        index: (_make_job(tmp_dir, f'running{index}', memory=memory), None,
+                None)
+        for index, memory in enumerate(running_memory)
+    }
+    assert suite._get_next_job(pending, running, max_jobs,
+                               max_memory) == expected
+
+
+@pytest.mark.util
+def test_run_jobs(tmp_path_factory, monkeypatch):
+    monkeypatch.setattr(suite, 'POLL_SECONDS', 0.05)
+    tmp_dir = str(tmp_path_factory.mktemp('suite'))
+    jobs = [
+        _make_job(tmp_dir, 'short', 'import time; time.sleep(0.2)',
+                  prev_time=1),
+        _make_job(tmp_dir, 'fail', 'import sys; print("bad"); sys.exit(3)'),
+        _make_job(tmp_dir, 'long', 'import time; time.sleep(0.5)',
+                  prev_time=5),
+        _make_job(tmp_dir, 'other_env', 'pass', requirements=['other_env']),
+    ]
+
+    # child process that is not a use case must not be reaped by the suite
+    other = subprocess.Popen([sys.executable, '-c', 'import sys; sys.exit(7)'])
+    suite.run_jobs(jobs, max_jobs=2)
+    assert other.wait() == 7
+
+    results = {job.name: job for job in jobs}
+    assert results['short'].returncode == 0
+    assert results['long'].returncode == 0
+    assert results['other_env'].returncode == 0
+    assert results['fail'].returncode == 3
+    for job in jobs:
+        assert job.wall_time is not None
+        assert job.peak_rss > 0
+    assert results['long'].wall_time >= 0.5
+    with open(results['fail'].log_file, 'r') as file_handle:
+        assert file_handle.read().strip() == 'bad'
+
+    # longest use case starts first and environment groups run in order
+    start_order = sorted(jobs, key=lambda job: job.start_time)
+    assert [job.name for job in start_order] == ['long', 'short', 'fail',
+                                                 'other_env']
+
+
+@pytest.mark.parametrize(
+    'wall_time, prev_time, max_slowdown, expected', [
+        # no limit set
+        (100, 20, None, None),
+        # no baseline time
+        (100, None, 2, None),
+        # baseline too short to check
+        (100, suite.MIN_SLOWDOWN_SECONDS - 1, 2, None),
+        # within limit
+        (40, 20, 2, None),
+        # slower than allowed
+        (50, 20, 2, 2.5),
+    ]
+)
+@pytest.mark.util
+def test_get_slowdown(tmp_path_factory, wall_time, prev_time, max_slowdown,
+                      expected):
+    job = _make_job(str(tmp_path_factory.mktemp('suite')), 'use_case',
+                    prev_time=prev_time)
+    job.wall_time = wall_time
+    assert suite.get_slowdown(job, max_slowdown) == expected
+
+
+@pytest.mark.util
+def test_compare_to_baseline(tmp_path_factory, monkeypatch, capsys):
+    tmp_dir = str(tmp_path_factory.mktemp('suite'))
+    output_base = os.path.join(tmp_dir, 'output')
+    baseline = os.path.join(tmp_dir, 'baseline')
+    compared = []
+
+    def compare_output(dir_a, dir_b):
+        compared.append((dir_a, dir_b))
+        if dir_b.endswith('differs'):
+            return [['file.nc', 'file.nc', 'data differs', '']]
+        return []
+
+    # run comparisons in threads so the replaced function is used
+    monkeypatch.setattr(suite, '_compare_output', compare_output)
+    monkeypatch.setattr(suite, 'ProcessPoolExecutor', ThreadPoolExecutor)
+
+    jobs = []
+    for name, returncode, wall_time in (('same', 0, 30), ('differs', 0, 30),
+                                        ('slow', 0, 90), ('failed', 1, 30)):
+        job = _make_job(tmp_dir, name, prev_time=30)
+        job.returncode = returncode
+        job.wall_time = wall_time
+        job.peak_rss = 10.0
+        jobs.append(job)
+
+    suite.compare_to_baseline(jobs, output_base, baseline, 2, max_slowdown=2)
+    results = {job.name: job for job in jobs}
+
+    # failed use cases are not compared
+    assert sorted(compared) == sorted(
+        (os.path.join(baseline, name), os.path.join(output_base, name))
+        for name in ('same', 'differs', 'slow')
+    )
+    assert results['same'].diffs == []
+    assert results['same'].slowdown is None
+    assert results['differs'].diffs
+    assert results['slow'].slowdown == 3.0
+    assert results['failed'].diffs is None
+
+    assert not suite.print_summary(jobs)
+    output = capsys.readouterr().out
+    assert 'output differs from baseline: category/differs' in output
+    assert 'took 3.0x baseline time: category/slow' in output
+    assert 'Use case failed: category/failed' in output
+    assert suite.print_summary([results['same']])
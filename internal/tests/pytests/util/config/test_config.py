@@ -341,3 +341,57 @@ def test_getraw_nested_curly_braces(metplus_config_files,
     output_base = config.getdir('OUTPUT_BASE')
     if output_base and os.path.exists(output_base):
         rmtree(output_base)
+
+
+@pytest.mark.parametrize(
+    'change_section, change_key, new_value, expected', [
+        # change variable referenced by value
+        ('config', 'A', 'new', 'new/b/c'),
+        # change variable referenced by a nested variable
+        ('config', 'C', 'new', 'a/b/new'),
+        # set variable in requested section to override [config] value
+        ('my_section', 'A', 'new', 'new/b/c'),
+        # set unrelated variable
+        ('config', 'OTHER', 'new', 'a/b/c'),
+        # change the variable itself
+        ('my_section', 'VALUE', '{A}', 'a'),
+    ]
+)
+@pytest.mark.parametrize(
+    'method', ['getstr', 'getraw']
+)
+@pytest.mark.util
+def test_get_cache_invalidated(metplus_config, change_section, change_key,
+                               new_value, expected, method):
+    config = metplus_config
+    config.set('config', 'A', 'a')
+    config.set('config', 'B', '{C_NESTED}')
+    config.set('config', 'C_NESTED', 'b/{C}')
+    config.set('config', 'C', 'c')
+    config.set('config', 'OTHER', 'other')
+    config.add_section('my_section')
+    config.set('my_section', 'VALUE', '{A}/{B}')
+
+    get_value = getattr(config, method)
+    assert get_value('my_section', 'VALUE') == 'a/b/c'
+    # value should be read from cache if nothing changed
+    config._conf.set('my_section', 'VALUE', 'changed without set')
+    assert get_value('my_section', 'VALUE') == 'a/b/c'
+    config._conf.set('my_section', 'VALUE', '{A}/{B}')
+
+    config.set(change_section, change_key, new_value)
+    assert get_value('my_section', 'VALUE') == expected
+
+
+@pytest.mark.parametrize(
+    'method', ['getstr', 'getraw']
+)
+@pytest.mark.util
+def test_get_cache_env(metplus_config, monkeypatch, method):
+    config = metplus_config
+    config.set('config', 'ENV_VALUE', '{ENV[METPLUS_TEST_CACHE_VAR]}/x')
+    get_value = getattr(config, method)
+    monkeypatch.setenv('METPLUS_TEST_CACHE_VAR', 'one')
+    assert get_value('config', 'ENV_VALUE') == 'one/x'
+    monkeypatch.setenv('METPLUS_TEST_CACHE_VAR', 'two')
+    assert get_value('config', 'ENV_VALUE') == 'two/x'
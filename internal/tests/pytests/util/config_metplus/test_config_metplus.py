@@ -933,3 +933,91 @@ def test_parse_var_list_double_digit(metplus_config):
     for n, var_item in enumerate(var_list, start=1):
         assert var_item['fcst_name'] == f'fcst_name{n}'
         assert var_item['obs_name'] == f'obs_name{n}'
+
+
+@pytest.mark.parametrize(
+    'items, expected', [
+        # later items override earlier items
+        ([{'config': {'A': '1', 'B': '2'}}, {'config': {'A': '3'}}],
+         {'config': {'A': '3', 'B': '2'}}),
+        # old sections are moved to config and override config in same item
+        ([{'config': {'A': '1'}, 'dir': {'A': '2', 'B': '3'}}],
+         {'config': {'A': '2', 'B': '3'}}),
+        # config in a later item overrides old sections in an earlier item
+        ([{'dir': {'A': '2'}}, {'config': {'A': '1'}}],
+         {'config': {'A': '1'}}),
+        # other sections are kept
+        ([{'user_env_vars': {'A': '1'}}, {'exe': {'WGRIB2': 'wgrib2'}}],
+         {'user_env_vars': {'A': '1'}, 'config': {'WGRIB2': 'wgrib2'}}),
+    ]
+)
+@pytest.mark.util
+def test_merge_conf_sections(items, expected):
+    merged = {}
+    for item in items:
+        config_metplus._merge_conf_sections(merged, item)
+    assert merged == expected
+
+
+@pytest.mark.util
+def test_read_conf_file_cache(tmp_path_factory, monkeypatch):
+    parm_base = str(tmp_path_factory.mktemp('parm'))
+    cache_dir = str(tmp_path_factory.mktemp('conf_cache'))
+    monkeypatch.setattr(config_metplus, 'PARM_BASE', parm_base)
+    monkeypatch.setattr(config_metplus, 'CONF_CACHE_DIR', cache_dir)
+    monkeypatch.setattr(config_metplus, '_PARSED_CONFS', {})
+
+    conf_file = os.path.join(parm_base, 'test.conf')
+    with open(conf_file, 'w') as file_handle:
+        file_handle.write('[DEFAULT]\nD = default\n'
+                          '[config]\nA = 1 ; comment\nB = {A}%\n')
+
+    expected = {'DEFAULT': {'D': 'default'},
+                'config': {'A': '1', 'B': '{A}%'}}
+    assert config_metplus._read_conf_file(conf_file) == expected
+    assert len(os.listdir(cache_dir)) == 1
+
+    # parsed file should be read from cache by a new process
+    monkeypatch.setattr(config_metplus, '_PARSED_CONFS', {})
+    monkeypatch.setattr(config_metplus, '_parse_conf_file', None)
+    assert config_metplus._read_conf_file(conf_file) == expected
+
+    # file should be parsed again if it changes
+    monkeypatch.undo()
+    monkeypatch.setattr(config_metplus, 'PARM_BASE', parm_base)
+    monkeypatch.setattr(config_metplus, 'CONF_CACHE_DIR', cache_dir)
+    with open(conf_file, 'w') as file_handle:
+        file_handle.write('[config]\nA = 22\n')
+    assert config_metplus._read_conf_file(conf_file) == {'config': {'A': '22'}}
+
+
+@pytest.mark.util
+def test_parse_var_list_cache(metplus_config):
+    config = metplus_config
+    config.set('config', 'FCST_VAR1_NAME', 'fcst_{valid?fmt=%Y%m%d}')
+    config.set('config', 'FCST_VAR1_LEVELS', 'A{lead?fmt=%2H}')
+    config.set('config', 'OBS_VAR1_NAME', 'obs')
+    config.set('config', 'OBS_VAR1_LEVELS', 'A06')
+
+    # time information should be substituted for each run
+    for valid, lead in (('2020020112', 3), ('2020020212', 6)):
+        time_info = ti_calculate({
+            'valid': datetime.strptime(valid, '%Y%m%d%H'),
+            'lead_hours': lead,
+        })
+        var_list = config_metplus.parse_var_list(config, time_info)
+        assert len(var_list) == 1
+        assert var_list[0]['fcst_name'] == f'fcst_{valid[:8]}'
+        assert var_list[0]['fcst_level'] == f'A{lead:02d}'
+
+    # fields added to the config should be found
+    config.set('config', 'BOTH_VAR2_NAME', 'both')
+    var_list = config_metplus.parse_var_list(config, time_info)
+    assert [item['index'] for item in var_list] == [1, 2]
+    assert var_list[1]['obs_name'] == 'both'
+
+    # changed fields should be used
+    config.set('config', 'OBS_VAR1_NAME', 'new_obs')
+    var_list = config_metplus.parse_var_list(config, time_info,
+                                             data_type='OBS')
+    assert [item['obs_name'] for item in var_list] == ['new_obs', 'both']
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import json
+import pytest
+
+from metplus.util import profile_util as pu
+from metplus.wrappers.command_runner import CommandRunner
+
+
+@pytest.fixture(autouse=True)
+def stop_active_profile():
+    pu.stop_profile()
+    yield
+    pu.stop_profile()
+
+
+@pu.profiled('recurse')
+def _recurse(count):
+    return 0 if count == 0 else 1 + _recurse(count - 1)
+
+
+class GridStatWrapper:
+    instance = 'obs_one'
+
+    @pu.profiled('find_data', method=True)
+    def find_data(self):
+        return _recurse(2)
+
+
+@pytest.mark.util
+def test_profile_span_not_active():
+    with pu.profile_span('find_data') as span:
+        assert span is None
+    assert _recurse(3) == 3
+
+
+@pytest.mark.util
+def test_profile_spans():
+    profile = pu.start_profile()
+    wrapper = GridStatWrapper()
+    assert pu.get_profile_name(wrapper) == 'GridStat(obs_one)'
+    for _ in range(3):
+        assert wrapper.find_data() == 2
+    assert _recurse(1) == 1
+
+    rows = {(row['span'], row['wrapper']): row for row in profile.get_rows()}
+    assert set(rows) == {('find_data', 'GridStat(obs_one)'),
+                         ('recurse', 'GridStat(obs_one)'),
+                         ('recurse', '')}
+    # recursive calls are only counted once
+    assert rows[('recurse', 'GridStat(obs_one)')]['count'] == 3
+    assert rows[('recurse', '')]['count'] == 1
+    assert (rows[('find_data', 'GridStat(obs_one)')]['total_seconds'] >=
+            rows[('recurse', 'GridStat(obs_one)')]['total_seconds'])
+    assert len(profile.get_summary_lines()) == 4
+    assert pu.stop_profile() is profile
+
+
+@pytest.mark.parametrize(
+    'extension', ['json', 'csv']
+)
+@pytest.mark.util
+def test_run_cmd_profile(metplus_config, tmp_path_factory, extension):
+    config = metplus_config
+    config.set('config', 'LOG_METPLUS', '')
+    profile = pu.start_profile()
+    runner = CommandRunner(config, logger=config.logger)
+    with pu.profile_span('run_all_times', 'Example'):
+        ret, _ = runner.run_cmd('sh -c "exit 3"')
+    assert ret == 3
+
+    rows = {row['span']: row for row in profile.get_rows()}
+    assert rows['run_cmd']['wrapper'] == 'Example'
+    assert rows['run_cmd']['max_rss_kb'] > 0
+    assert len(profile.commands) == 1
+    assert profile.commands[0]['return_code'] == 3
+
+    profile_file = os.path.join(tmp_path_factory.mktemp('profile'),
+                                f'profile.{extension}')
+    profile.write(profile_file)
+    with open(profile_file, 'r') as file_handle:
+        if extension == 'csv':
+            actual = list(csv.DictReader(file_handle))
+            assert [row['span'] for row in actual] == list(rows)
+        else:
+            actual = json.load(file_handle)
+            assert actual['spans'] == list(rows.values())
+            assert actual['commands'][0]['command'] == 'sh -c "exit 3"'
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+
+import numpy as np
+
+from metplus.util import py_embed_cache as pec
+
+
+def _write_script(script_dir):
+    script = os.path.join(script_dir, 'read_data.py')
+    with open(script, 'w') as file_handle:
+        file_handle.write(
+            'import sys\n'
+            'import numpy as np\n'
+            'met_data = np.ma.masked_less(np.arange(4.0).reshape(2, 2), 1)\n'
+            'met_data *= float(sys.argv[1])\n'
+            'attrs = {"name": sys.argv[2], "valid": np.int64(3)}\n'
+        )
+    return script
+
+
+@pytest.mark.parametrize(
+    'command, expected_script, expected_args', [
+        ('/path/to/read.py a b', '/path/to/read.py', ['a', 'b']),
+        ('python3 /path/to/read.py "a b"', '/path/to/read.py', ['a b']),
+        ('/path/to/read.py', '/path/to/read.py', []),
+        ('TMP', None, None),
+    ]
+)
+@pytest.mark.util
+def test_split_script_command(command, expected_script, expected_args):
+    assert pec.split_script_command(command) == (expected_script,
+                                                 expected_args)
+
+
+@pytest.mark.util
+def test_write_read_cache(tmp_path_factory):
+    script_dir = tmp_path_factory.mktemp('py_embed_cache')
+    script = _write_script(script_dir)
+    cache_prefix = os.path.join(script_dir, 'cache', 'abc')
+    assert not pec.is_cached(cache_prefix)
+
+    pec.write_cache(cache_prefix, script, ['2', 'TMP'])
+    assert pec.is_cached(cache_prefix)
+    assert not [item for item in os.listdir(os.path.dirname(cache_prefix))
+                if 'tmp' in item]
+
+    met_data, attrs = pec.read_cache(cache_prefix)
+    assert isinstance(met_data, np.memmap)
+    assert np.isnan(met_data[0, 0])
+    assert met_data[1].tolist() == [4.0, 6.0]
+    assert attrs == {'name': 'TMP', 'valid': 3}
+
+
+@pytest.mark.util
+def test_get_cache_key(tmp_path_factory):
+    script_dir = tmp_path_factory.mktemp('py_embed_cache')
+    script = _write_script(script_dir)
+    command = f'{script} 2 TMP'
+    key = pec.get_cache_key(command, 'PYTHON_NUMPY')
+    assert key == pec.get_cache_key(command, 'PYTHON_NUMPY')
+    assert key != pec.get_cache_key(f'{script} 3 TMP', 'PYTHON_NUMPY')
+    assert key != pec.get_cache_key(command, 'PYTHON_XARRAY')
+
+    # modifying the script invalidates the key
+    stat = os.stat(script)
+    os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert key != pec.get_cache_key(command, 'PYTHON_NUMPY')
+
+
+@pytest.mark.util
+def test_get_cache_key_dependencies(tmp_path_factory):
+    top_dir = tmp_path_factory.mktemp('py_embed_cache')
+    script_dir = os.path.join(top_dir, 'use_case')
+    os.makedirs(script_dir)
+    script = _write_script(script_dir)
+    shared_module = os.path.join(top_dir, 'shared.py')
+    data_file = os.path.join(top_dir, 'data.nc')
+    other_dir = os.path.join(top_dir, 'use_case', 'other')
+    os.makedirs(other_dir)
+    other_module = os.path.join(other_dir, 'other.py')
+    for path in (shared_module, data_file, other_module):
+        with open(path, 'w') as file_handle:
+            file_handle.write('a')
+
+    command = f'{script} {data_file}:OBTYPE:TCDC:2024010100,2024010106:2'
+    assert pec.get_dependency_files(*pec.split_script_command(command)) == [
+        script, data_file, shared_module
+    ]
+
+    key = pec.get_cache_key(command, 'PYTHON_NUMPY')
+    for path in (data_file, shared_module):
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        new_key = pec.get_cache_key(command, 'PYTHON_NUMPY')
+        assert new_key != key
+        key = new_key
+
+    # modules in other directories are not included
+    stat = os.stat(other_module)
+    os.utime(other_module,
+             ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert pec.get_cache_key(command, 'PYTHON_NUMPY') == key
@@ -0,0 +1,283 @@
+import pytest
+
+import os
+import time
+import threading
+from datetime import datetime
+
+from metplus.util import realtime
+from metplus.util.realtime import *
+from metplus.util import do_string_sub
+from metplus.wrappers.example_wrapper import ExampleWrapper
+from metplus.wrappers.grid_stat_wrapper import GridStatWrapper
+
+
+@pytest.mark.parametrize(
+    'template, expected', [
+        ('/d1/in/{valid?fmt=%Y%m%d}/file_{valid?fmt=%H}.nc',
+         ('/d1/in', 2, '{valid?fmt=%Y%m%d}/file_{valid?fmt=%H}.nc')),
+        ('/d1/in/file_{valid?fmt=%H}.nc',
+         ('/d1/in', 1, 'file_{valid?fmt=%H}.nc')),
+        ('/d1/in/static.nc', ('/d1/in', 1, 'static.nc')),
+        ('/d1/in/mem*/file_{init?fmt=%H}.nc',
+         ('/d1/in', 2, 'mem*/file_{init?fmt=%H}.nc')),
+    ]
+)
+@pytest.mark.util
+def test_split_template(template, expected):
+    assert realtime._split_template(template) == expected
+
+
+@pytest.mark.parametrize(
+    'use_inotify', [
+        True, False,
+    ]
+)
+@pytest.mark.util
+def test_run_realtime_daemon(metplus_config, tmp_path_factory, monkeypatch,
+                             use_inotify):
+    input_dir = str(tmp_path_factory.mktemp('realtime'))
+    config = metplus_config
+    config.set('config', 'LOOP_BY', 'VALID')
+    config.set('config', 'VALID_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'VALID_BEG', '2024010100')
+    config.set('config', 'VALID_END', '2024010106')
+    config.set('config', 'VALID_INCREMENT', '6H')
+    config.set('config', 'LEAD_SEQ', '0')
+    config.set('config', 'EXAMPLE_INPUT_DIR', input_dir)
+    config.set('config', 'EXAMPLE_INPUT_TEMPLATE',
+               '{valid?fmt=%Y%m%d}/file_{valid?fmt=%H}.nc')
+    config.set('config', 'REALTIME_DAEMON_SCAN_TIME', 1)
+    config.set('config', 'REALTIME_DAEMON_MAX_RUN_TIME', 30)
+
+    if not use_inotify:
+        real_watcher = realtime.DirectoryWatcher
+        monkeypatch.setattr(
+            realtime, 'DirectoryWatcher',
+            lambda logger: real_watcher(logger=logger, use_inotify=False)
+        )
+
+    wrapper = ExampleWrapper(config)
+    run_times = []
+    monkeypatch.setattr(wrapper, 'run_at_time',
+                        lambda input_dict: run_times.append(
+                            input_dict['valid']))
+
+    def write_file(valid):
+        path = os.path.join(input_dir, valid.strftime('%Y%m%d'),
+                            valid.strftime('file_%H.nc'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file_handle:
+            file_handle.write('data')
+
+    # write first file before the daemon starts and the second file later.
+    # also write a file that is not one of the run times
+    write_file(datetime(2024, 1, 1, 0))
+    write_file(datetime(2024, 1, 1, 3))
+
+    def write_later():
+        time.sleep(0.5)
+        write_file(datetime(2024, 1, 1, 6))
+
+    writer = threading.Thread(target=write_later)
+    writer.start()
+    start_time = time.time()
+    assert realtime.run_realtime_daemon(config, [wrapper]) == []
+    writer.join()
+
+    # daemon stops when all run times are processed
+    assert time.time() - start_time < 10
+    assert run_times == [datetime(2024, 1, 1, 0), datetime(2024, 1, 1, 6)]
+
+
+@pytest.mark.util
+def test_realtime_trigger_check(metplus_config, tmp_path_factory):
+    input_dir = str(tmp_path_factory.mktemp('trigger'))
+    config = metplus_config
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2024010100')
+    config.set('config', 'LEAD_SEQ', '0, 6')
+    config.set('config', 'EXAMPLE_INPUT_DIR', input_dir)
+    config.set('config', 'EXAMPLE_INPUT_TEMPLATE',
+               'file_{init?fmt=%Y%m%d%H}_f{lead?fmt=%3H}.nc')
+    wrapper = ExampleWrapper(config)
+
+    trigger = RealtimeTrigger(config, wrapper, min_age=60)
+    time_input = {'loop_by': 'init', 'init': datetime(2024, 1, 1),
+                  'now': datetime.now(), 'today': ''}
+    path = os.path.join(input_dir, 'file_2024010100_f000.nc')
+    assert trigger.get_run_times(path, 'INIT') == {datetime(2024, 1, 1)}
+
+    # all forecast leads must exist
+    with open(path, 'w') as file_handle:
+        file_handle.write('data')
+    assert trigger.check(time_input) is False
+
+    # a compressed file can be used, but must be old enough
+    path = os.path.join(input_dir, 'file_2024010100_f006.nc.gz')
+    with open(path, 'w') as file_handle:
+        file_handle.write('data')
+    ready = trigger.check(time_input)
+    assert ready is not True and ready > time.time()
+
+    trigger.min_age = 0
+    assert trigger.check(time_input) is True
+
+
+@pytest.mark.util
+def test_realtime_daemon_forget(metplus_config, tmp_path_factory,
+                                monkeypatch):
+    input_dir = str(tmp_path_factory.mktemp('forget'))
+    config = metplus_config
+    config.set('config', 'LOOP_BY', 'VALID')
+    config.set('config', 'VALID_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'VALID_BEG', '2024010100')
+    config.set('config', 'VALID_INCREMENT', '6H')
+    config.set('config', 'LEAD_SEQ', '0')
+    config.set('config', 'EXAMPLE_INPUT_DIR', input_dir)
+    config.set('config', 'EXAMPLE_INPUT_TEMPLATE',
+               'file_{valid?fmt=%Y%m%d%H}.nc')
+    wrapper = ExampleWrapper(config)
+    run_times = []
+    monkeypatch.setattr(wrapper, 'run_at_time',
+                        lambda input_dict: run_times.append(
+                            input_dict['valid']))
+
+    def write_file(valid):
+        path = os.path.join(input_dir, valid.strftime('file_%Y%m%d%H.nc'))
+        with open(path, 'w') as file_handle:
+            file_handle.write('data')
+        return path
+
+    valid_times = [datetime(2024, 1, 1, hour) for hour in (0, 6, 12, 18)]
+    valid_times.append(datetime(2024, 1, 2, 0))
+    paths = [write_file(valid) for valid in valid_times]
+
+    trigger = RealtimeTrigger(config, wrapper)
+    with DirectoryWatcher(use_inotify=False) as watcher:
+        trigger.watch(watcher)
+        daemon = realtime._RealtimeDaemon(config, [trigger],
+                                          RealtimeRunTimes(config), watcher,
+                                          datetime.now(), [],
+                                          horizon=12 * 3600)
+        daemon.run(scan_time=0.1, max_run_time=0.3)
+        assert run_times == valid_times
+        assert daemon.seen == set(paths)
+
+        # run times older than the horizon are forgotten
+        assert daemon.cutoff == datetime(2024, 1, 1, 12)
+        assert trigger.done == set(valid_times[2:])
+
+        # forgotten run times are not processed again if their files change
+        assert not daemon._get_candidates(paths[:2], time.time())
+
+        # removed files are forgotten at the next scan
+        os.remove(paths[0])
+        new_path = write_file(datetime(2024, 1, 2, 6))
+        daemon.run(scan_time=0.1, max_run_time=0.3)
+        assert run_times == valid_times + [datetime(2024, 1, 2, 6)]
+        assert daemon.seen == set(paths[1:] + [new_path])
+        assert trigger.done == set(valid_times[3:] +
+                                   [datetime(2024, 1, 2, 6)])
+
+
+@pytest.mark.parametrize(
+    'loop_by, template, expected', [
+        # valid only template maps to the init of each lead
+        ('INIT', 'obs_{valid?fmt=%Y%m%d%H}.nc',
+         {datetime(2024, 1, 1, 6), datetime(2024, 1, 1, 0)}),
+        # init and lead give the init directly
+        ('INIT', 'fcst_{init?fmt=%Y%m%d%H}_f{lead?fmt=%3H}.nc',
+         {datetime(2024, 1, 1, 12)}),
+        ('VALID', 'obs_{valid?fmt=%Y%m%d%H}.nc',
+         {datetime(2024, 1, 1, 12)}),
+        # init only template maps to the valid of each lead
+        ('VALID', 'fcst_{init?fmt=%Y%m%d%H}.nc',
+         {datetime(2024, 1, 1, 18), datetime(2024, 1, 2, 0)}),
+    ]
+)
+@pytest.mark.util
+def test_realtime_trigger_run_times_from_leads(metplus_config, loop_by,
+                                               template, expected):
+    config = metplus_config
+    config.set('config', 'LOOP_BY', loop_by)
+    config.set('config', 'LEAD_SEQ', '6, 12')
+    config.set('config', 'EXAMPLE_INPUT_DIR', '/d1/in')
+    config.set('config', 'EXAMPLE_INPUT_TEMPLATE', template)
+    trigger = RealtimeTrigger(config, ExampleWrapper(config))
+    path = os.path.join('/d1/in', do_string_sub(
+        template, init=datetime(2024, 1, 1, 12),
+        valid=datetime(2024, 1, 1, 12), lead=0
+    ))
+    assert trigger.get_run_times(path, loop_by) == expected
+
+
+@pytest.mark.parametrize(
+    'use_inotify, map_leads', [
+        (True, True),
+        (False, True),
+        (False, False),
+    ]
+)
+@pytest.mark.util
+def test_run_realtime_daemon_obs_last(metplus_config, tmp_path_factory,
+                                      monkeypatch, use_inotify, map_leads):
+    input_dir = str(tmp_path_factory.mktemp('obs_last'))
+    config = metplus_config
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2024010100')
+    config.set('config', 'INIT_END', '2024010100')
+    config.set('config', 'LEAD_SEQ', '6')
+    config.set('config', 'FCST_GRID_STAT_INPUT_DIR', input_dir)
+    config.set('config', 'FCST_GRID_STAT_INPUT_TEMPLATE',
+               'fcst_{init?fmt=%Y%m%d%H}_f{lead?fmt=%3H}.nc')
+    config.set('config', 'OBS_GRID_STAT_INPUT_DIR', input_dir)
+    config.set('config', 'OBS_GRID_STAT_INPUT_TEMPLATE',
+               'obs_{valid?fmt=%Y%m%d%H}.nc')
+    # only scan often if inotify is not used so that new files must be
+    # mapped to the run time when they are written
+    config.set('config', 'REALTIME_DAEMON_SCAN_TIME', 30 if use_inotify else 1)
+    config.set('config', 'REALTIME_DAEMON_MAX_RUN_TIME', 20)
+
+    if not use_inotify:
+        real_watcher = realtime.DirectoryWatcher
+        monkeypatch.setattr(
+            realtime, 'DirectoryWatcher',
+            lambda logger: real_watcher(logger=logger, use_inotify=False)
+        )
+    elif not realtime.DirectoryWatcher().active:
+        pytest.skip('inotify is not available')
+
+    # if files are not mapped to the run time of each lead, the run time
+    # must be found when it is checked again at the next scan
+    if not map_leads:
+        monkeypatch.setattr(RealtimeTrigger, '_get_run_times_from_leads',
+                            lambda self, time_info, other, loop_by: set())
+
+    wrapper = GridStatWrapper(config)
+    run_times = []
+    monkeypatch.setattr(wrapper, 'run_at_time',
+                        lambda input_dict: run_times.append(
+                            input_dict['init']))
+
+    def write_file(filename):
+        with open(os.path.join(input_dir, filename), 'w') as file_handle:
+            file_handle.write('data')
+
+    # forecast is written before the daemon starts and obs is written later
+    write_file('fcst_2024010100_f006.nc')
+
+    def write_later():
+        time.sleep(0.5)
+        write_file('obs_2024010106.nc')
+
+    writer = threading.Thread(target=write_later)
+    writer.start()
+    start_time = time.time()
+    realtime.run_realtime_daemon(config, [wrapper])
+    writer.join()
+
+    assert time.time() - start_time < 10
+    assert run_times == [datetime(2024, 1, 1, 0)]
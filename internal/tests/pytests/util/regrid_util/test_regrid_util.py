@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+
+import numpy as np
+from scipy.interpolate import NearestNDInterpolator, LinearNDInterpolator
+
+from metplus.util import regrid_util as ru
+
+
+def _grids():
+    src_lon, src_lat = np.meshgrid(np.arange(0.0, 10.0, 1.0),
+                                   np.arange(-5.0, 5.0, 1.0))
+    dst_lon, dst_lat = np.meshgrid(np.arange(0.25, 9.0, 0.5),
+                                   np.arange(-4.75, 4.0, 0.5))
+    data = np.sin(src_lon) + np.cos(src_lat)
+    return src_lon, src_lat, data, dst_lon, dst_lat
+
+
+@pytest.fixture(autouse=True)
+def clear_memory_cache():
+    ru._WEIGHTS_CACHE.clear()
+    yield
+    ru._WEIGHTS_CACHE.clear()
+
+
+@pytest.mark.parametrize(
+    'method, interp_class', [
+        ('nearest', NearestNDInterpolator),
+        ('linear', LinearNDInterpolator),
+    ]
+)
+@pytest.mark.util
+def test_regrid_matches_scipy(tmp_path_factory, method, interp_class):
+    cache_dir = tmp_path_factory.mktemp('regrid')
+    src_lon, src_lat, data, dst_lon, dst_lat = _grids()
+    points = np.column_stack((src_lon.ravel(), src_lat.ravel()))
+    expected = interp_class(points, data.ravel())(dst_lon, dst_lat)
+
+    actual = ru.regrid(src_lon, src_lat, data, dst_lon, dst_lat,
+                       method=method, fill_value=np.nan, cache_dir=cache_dir)
+    assert actual.shape == dst_lon.shape
+    np.testing.assert_allclose(actual, expected)
+
+
+@pytest.mark.util
+def test_regrid_weights_cached_on_disk(tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp('regrid')
+    src_lon, src_lat, data, dst_lon, dst_lat = _grids()
+    first = ru.regrid(src_lon, src_lat, data, dst_lon, dst_lat,
+                      method='linear', cache_dir=cache_dir)
+    weight_files = os.listdir(cache_dir)
+    assert len(weight_files) == 1
+    assert weight_files[0].startswith('regrid_weights_')
+
+    # clear in-memory cache and ensure weights are read from disk
+    ru._WEIGHTS_CACHE.clear()
+    original = ru.compute_regrid_weights
+    ru.compute_regrid_weights = None
+    try:
+        second = ru.regrid(src_lon, src_lat, data * 2, dst_lon, dst_lat,
+                           method='linear', cache_dir=cache_dir)
+    finally:
+        ru.compute_regrid_weights = original
+    np.testing.assert_allclose(second, first * 2)
+
+    # different target grid creates a new weight file
+    ru.regrid(src_lon, src_lat, data, dst_lon[:-1], dst_lat[:-1],
+              method='linear', cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+
+
+@pytest.mark.util
+def test_regrid_gauss_masked(tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp('regrid')
+    src_lon, src_lat = np.meshgrid(np.arange(0.0, 1.0, 0.1),
+                                   np.arange(0.0, 1.0, 0.1))
+    data = np.ma.masked_array(np.full(src_lon.shape, 3.0))
+    data[:, 5:] = np.ma.masked
+    dst_lon = np.array([[0.05, 0.95, 20.0]])
+    dst_lat = np.array([[0.05, 0.95, 20.0]])
+    actual = ru.regrid(src_lon, src_lat, data, dst_lon, dst_lat,
+                       method='gauss', cache_dir=cache_dir,
+                       radius=50000, sigma=25000)
+    assert actual.shape == (1, 3)
+    assert actual[0, 0] == pytest.approx(3.0)
+    # only masked source points or no source points in radius
+    assert actual.mask.tolist() == [[False, True, True]]
+
+
+@pytest.mark.util
+def test_regrid_extra_dimensions(tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp('regrid')
+    src_lon, src_lat, data, dst_lon, dst_lat = _grids()
+    stacked = np.stack((data, data + 1), axis=-1)
+    actual = ru.regrid(src_lon, src_lat, stacked, dst_lon, dst_lat,
+                       method='nearest', cache_dir=cache_dir)
+    assert actual.shape == dst_lon.shape + (2,)
+    np.testing.assert_allclose(actual[..., 1], actual[..., 0] + 1)
+
+
+@pytest.mark.util
+def test_regrid_invalid_method():
+    src_lon, src_lat, _, dst_lon, dst_lat = _grids()
+    with pytest.raises(ValueError):
+        ru.compute_regrid_weights(src_lon, src_lat, dst_lon, dst_lat,
+                                  method='bad')
+
+
+@pytest.mark.parametrize(
+    'method', ['nearest', 'gauss']
+)
+@pytest.mark.util
+def test_regrid_no_cache_with_tree(tmp_path_factory, method):
+    cache_dir = tmp_path_factory.mktemp('regrid')
+    src_lon, src_lat, data, dst_lon, dst_lat = _grids()
+    expected = ru.regrid(src_lon, src_lat, data, dst_lon, dst_lat,
+                         method=method, cache_dir=cache_dir)
+    ru._WEIGHTS_CACHE.clear()
+    tree = ru.build_source_tree(src_lon, src_lat, method=method)
+
+    no_cache_dir = tmp_path_factory.mktemp('no_cache')
+    for dst_slice in (slice(None), slice(2, None)):
+        actual = ru.regrid(src_lon, src_lat, data, dst_lon[dst_slice],
+                           dst_lat[dst_slice], method=method,
+                           cache_dir=no_cache_dir, cache=False, tree=tree)
+        np.testing.assert_allclose(actual, expected[dst_slice])
+
+    assert not os.listdir(no_cache_dir)
+    assert not ru._WEIGHTS_CACHE
+
+
+@pytest.mark.util
+def test_regrid_cache_eviction(tmp_path_factory, monkeypatch):
+    cache_dir = tmp_path_factory.mktemp('regrid')
+    monkeypatch.setattr(ru, 'MAX_CACHE_FILES', 2)
+    monkeypatch.setattr(ru, 'MAX_MEMORY_WEIGHTS', 2)
+    src_lon, src_lat, data, dst_lon, dst_lat = _grids()
+    for index in range(4):
+        ru.regrid(src_lon, src_lat, data, dst_lon[index:], dst_lat[index:],
+                  cache_dir=cache_dir)
+        # ensure modification times differ so oldest file is removed
+        for weight_file in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, weight_file)
+            os.utime(path, (index, os.path.getmtime(path) - 10))
+
+    assert len(os.listdir(cache_dir)) == 2
+    assert len(ru._WEIGHTS_CACHE) == 2
+
+    # most recently used weights are kept
+    last_hash = ru.get_grid_hash(src_lon, src_lat, dst_lon[3:], dst_lat[3:],
+                                 'nearest')
+    assert last_hash in ru._WEIGHTS_CACHE
+    assert f'regrid_weights_{last_hash}.npz' in os.listdir(cache_dir)
@@ -0,0 +1,206 @@
+import pytest
+
+import os
+import sys
+from unittest import mock
+
+import produtil.run
+import produtil.mpiprog
+import produtil.mpi_impl.no_mpi
+from produtil.mpi_impl.srun import Implementation as SrunImplementation
+
+from metplus.util import run_util
+from metplus.util.config_metplus import get_shard_log_timestamp
+
+
+def _shard_commands(num_shards):
+    return [[sys.executable, '-c', 'pass', '--shard', f'{index}/{num_shards}']
+            for index in range(num_shards)]
+
+
+@pytest.mark.parametrize(
+    'ret, expected_failed', [
+        (0, 0),
+        (3, 1),
+    ]
+)
+@pytest.mark.util
+def test_launch_shards_mpiserial(monkeypatch, ret, expected_failed):
+    mpiimpl = SrunImplementation.detect(srun_path='/usr/bin/srun',
+                                        mpiserial_path='/usr/bin/mpiserial',
+                                        scontrol_path='/usr/bin/scontrol',
+                                        force=True, silent=True)
+    monkeypatch.setattr(produtil.run, 'detect_mpi', lambda: mpiimpl)
+
+    programs = []
+    def fake_run(runner, logger=None):
+        programs.append(runner)
+        return ret
+
+    monkeypatch.setattr(produtil.run, 'run', fake_run)
+    mpirun = mock.Mock(wraps=produtil.run.mpirun)
+    monkeypatch.setattr(produtil.run, 'mpirun', mpirun)
+
+    commands = _shard_commands(3)
+    assert run_util._launch_shards(commands, mock.Mock()) == expected_failed
+    assert len(programs) == 1
+
+    # each shard must be a serial rank, not an MPI rank
+    program = mpirun.call_args.args[0]
+    ranks = [rank for rank, _ in program.expand_iter(True)]
+    assert all(isinstance(rank, produtil.mpiprog.MPISerial) for rank in ranks)
+    assert [list(rank.args()) for rank in ranks] == commands
+    assert program.nranks() == len(commands)
+    assert '/usr/bin/mpiserial' in programs[0].to_shell()
+
+
+@pytest.mark.util
+def test_launch_shards_no_mpiserial(monkeypatch):
+    mpiimpl = SrunImplementation.detect(srun_path='/usr/bin/srun',
+                                        scontrol_path='/usr/bin/scontrol',
+                                        force=True, silent=True)
+    monkeypatch.setattr(mpiimpl, '_mpiserial_path', None)
+    monkeypatch.setattr(mpiimpl, 'find_mpiserial', lambda path, force: None)
+    monkeypatch.setattr(produtil.run, 'detect_mpi', lambda: mpiimpl)
+    monkeypatch.setattr(produtil.run, 'run', mock.Mock())
+
+    logger = mock.Mock()
+    assert run_util._launch_shards(_shard_commands(2), logger) == 0
+    produtil.run.run.assert_not_called()
+    logger.warning.assert_called_once()
+
+
+@pytest.mark.util
+def test_launch_shards_local(monkeypatch):
+    mpiimpl = produtil.mpi_impl.no_mpi.Implementation.detect()
+    monkeypatch.setattr(produtil.run, 'detect_mpi', lambda: mpiimpl)
+    monkeypatch.setattr(produtil.run, 'run', mock.Mock())
+
+    commands = _shard_commands(2)
+    commands.append([sys.executable, '-c', 'import sys; sys.exit(2)'])
+    logger = mock.Mock()
+    assert run_util._launch_shards(commands, logger) == 1
+    produtil.run.run.assert_not_called()
+    logger.error.assert_called_once()
+
+
+def _fake_wrapper(name, per_run_time, commands=()):
+    wrapper = mock.Mock(isOK=True, errors=0)
+    wrapper.get_wrapper_instance_name.return_value = name
+    wrapper.runs_per_run_time.return_value = per_run_time
+    wrapper.run_all_times.return_value = [(f'{name} cmd', [])
+                                          for _ in commands]
+    return wrapper
+
+
+@pytest.mark.parametrize(
+    'per_run_time, expected_split', [
+        ([], 0),
+        ([True, True], 2),
+        ([True, False], 1),
+        ([True, False, True], 1),
+        ([False, True], 0),
+    ]
+)
+@pytest.mark.util
+def test_get_shard_split(per_run_time, expected_split):
+    processes = [_fake_wrapper(f'w{index}', value)
+                 for index, value in enumerate(per_run_time)]
+    assert run_util.get_shard_split(processes) == expected_split
+
+
+@pytest.mark.parametrize(
+    'process, overrides, expected_result', [
+        ('GridStat', {}, True),
+        ('StatAnalysis', {}, False),
+        ('StatAnalysis',
+         {'STAT_ANALYSIS_RUNTIME_FREQ': 'RUN_ONCE_PER_INIT_OR_VALID'}, True),
+        ('SeriesAnalysis',
+         {'SERIES_ANALYSIS_RUNTIME_FREQ': 'RUN_ONCE_PER_LEAD'}, False),
+        ('GenVxMask', {}, True),
+        ('TCPairs', {}, False),
+        ('TCPairs', {'TC_PAIRS_RUN_ONCE': False}, True),
+    ]
+)
+@pytest.mark.util
+def test_runs_per_run_time(metplus_config, process, overrides,
+                           expected_result):
+    config = metplus_config
+    for key, value in overrides.items():
+        config.set('config', key, value)
+    wrapper = run_util._get_wrapper_instance(config, process)
+    assert wrapper.runs_per_run_time() == expected_result
+
+
+@pytest.mark.parametrize(
+    'shard_count, after_shards, expected_run', [
+        (1, False, ['GridStat', 'StatAnalysis', 'PointStat']),
+        (2, False, ['GridStat']),
+        (1, True, ['StatAnalysis', 'PointStat']),
+    ]
+)
+@pytest.mark.util
+def test_run_metplus_shard_split(metplus_config, monkeypatch, shard_count,
+                                 after_shards, expected_run):
+    config = metplus_config
+    config.set('config', 'PROCESS_LIST', 'GridStat, StatAnalysis, PointStat')
+    config.set('config', 'SHARD_COUNT', shard_count)
+    processes = [_fake_wrapper('GridStat', True),
+                 _fake_wrapper('StatAnalysis', False),
+                 _fake_wrapper('PointStat', True)]
+    monkeypatch.setattr(run_util, '_load_all_wrappers',
+                        lambda config, process_list: processes)
+
+    assert run_util.run_metplus(config, after_shards=after_shards) == 0
+    actual_run = [process.get_wrapper_instance_name()
+                  for process in processes
+                  if process.run_all_times.called]
+    assert actual_run == expected_run
+
+
+@pytest.mark.parametrize(
+    'failed', [0, 1]
+)
+@pytest.mark.util
+def test_run_metplus_shards_after_shards(metplus_config, monkeypatch,
+                                         failed):
+    config = metplus_config
+    monkeypatch.setattr(run_util, '_launch_shards',
+                        lambda commands, logger: failed)
+    run_metplus = mock.Mock(return_value=0)
+    monkeypatch.setattr(run_util, 'run_metplus', run_metplus)
+
+    result = run_util.run_metplus_shards(config, ['my.conf'], 2,
+                                         'run_metplus.py')
+    assert result == failed
+    if failed:
+        run_metplus.assert_not_called()
+    else:
+        run_metplus.assert_called_once_with(config, after_shards=True)
+
+
+@pytest.mark.util
+def test_all_commands_after_shards(metplus_config, monkeypatch):
+    config = metplus_config
+    config.set('config', 'PROCESS_LIST', 'GridStat, StatAnalysis')
+    log_dir = config.getdir('LOG_DIR')
+    os.makedirs(log_dir, exist_ok=True)
+    log_timestamp = config.getstr('config', 'LOG_TIMESTAMP')
+    for shard_index in range(2):
+        shard_timestamp = get_shard_log_timestamp(log_timestamp, shard_index)
+        with open(os.path.join(log_dir, f'.all_commands.{shard_timestamp}'),
+                  'w') as file_handle:
+            file_handle.write(f'COMMAND:\nshard{shard_index} cmd\n\n')
+
+    processes = [_fake_wrapper('GridStat', True, commands=[1]),
+                 _fake_wrapper('StatAnalysis', False, commands=[1])]
+    monkeypatch.setattr(run_util, '_load_all_wrappers',
+                        lambda config, process_list: processes)
+
+    filename = run_util.merge_all_commands(config, 2)
+    assert run_util.run_metplus(config, after_shards=True) == 0
+
+    with open(filename, 'r') as file_handle:
+        commands = [line.strip() for line in file_handle
+                    if line.strip().endswith('cmd')]
+    assert commands == ['shard0 cmd', 'shard1 cmd', 'StatAnalysis cmd']
@@ -443,3 +443,21 @@ def test_find_indices_in_config_section(metplus_config, regex, index,
     pp.pprint(indices)
 
     assert indices == expected_result
+
+
+@pytest.mark.util
+def test_find_indices_in_config_section_cache(metplus_config):
+    config = metplus_config
+    regex = r'MODEL(\d+)$'
+    config.set('config', 'MODEL1', 'model1')
+    indices = find_indices_in_config_section(regex, config)
+    assert indices == {'1': [None]}
+
+    # modifying the result should not change later results
+    indices['1'].append('changed')
+    assert find_indices_in_config_section(regex, config) == {'1': [None]}
+
+    # variables added to the config should be found
+    config.set('config', 'MODEL3', 'model3')
+    assert find_indices_in_config_section(regex, config) == {'1': [None],
+                                                             '3': [None]}
@@ -70,6 +70,40 @@ def test_get_storms(metplus_config, filename, expected_result):
         assert storm_dict['header'].split()[storm_id_index] == 'STORM_ID'
 
 
+@pytest.mark.util
+def test_get_storms_cache(tmp_path_factory, monkeypatch):
+    filepath = os.path.join(tmp_path_factory.mktemp('storms'), 'filter.tcst')
+    with open(filepath, 'w') as file_handle:
+        file_handle.write('AMODEL STORM_ID\nGFSO AL01\nGFSO AL02\n')
+
+    storm_dict = get_storms(filepath)
+    assert get_storms(filepath, id_only=True) == ['AL01', 'AL02']
+
+    # changing returned values does not change the cached values
+    storm_dict['AL01'].append('bad line')
+    storm_dict.pop('AL02')
+    assert get_storms(filepath) == {'header': 'AMODEL STORM_ID\n',
+                                    'AL01': ['GFSO AL01\n'],
+                                    'AL02': ['GFSO AL02\n']}
+
+    # file is read again if it is modified
+    with open(filepath, 'a') as file_handle:
+        file_handle.write('GFSO AL03\n')
+    assert get_storms(filepath, id_only=True) == ['AL01', 'AL02', 'AL03']
+
+    # least recently used files are removed when the cache is full
+    from metplus.util import system_util
+    monkeypatch.setattr(system_util, 'STORMS_CACHE_SIZE', 2)
+    system_util._STORMS_CACHE.clear()
+    get_storms(filepath)
+    get_storms(filepath, sort_column='AMODEL')
+    get_storms(filepath)
+    get_storms(filepath, sort_column='BAD')
+    assert len(system_util._STORMS_CACHE) == 2
+    assert [key[-1] for key in system_util._STORMS_CACHE] == ['STORM_ID',
+                                                             'BAD']
+
+
 @pytest.mark.util
 def test_get_storms_mtd(metplus_config):
     index = 23
@@ -157,3 +191,105 @@ def test_preprocess_file_options(metplus_config,
         expected = filename
     result = preprocess_file(filename, data_type, config, allow_dir)
     assert result == expected
+
+
+@pytest.mark.parametrize(
+    'pattern', [
+        'a/file_*.nc',
+        'a/file_?.nc',
+        'a/file_[12].nc',
+        '*/file_1.nc',
+        '*/sub*/*.txt',
+        'a/.hidden*',
+        'a/*',
+        'a/file_1.nc',
+        'a/missing.nc',
+        'missing/*.nc',
+        '*/',
+    ]
+)
+@pytest.mark.util
+def test_directory_listing_glob(tmp_path_factory, pattern):
+    import glob
+    top_dir = str(tmp_path_factory.mktemp('listing'))
+    for rel_path in ('a/file_1.nc', 'a/file_2.nc', 'a/file_3.nc',
+                     'a/.hidden_1.nc', 'a/sub1/x.txt', 'b/file_1.nc',
+                     'b/sub2/y.txt', 'b/other.txt'):
+        full_path = os.path.join(top_dir, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path, 'w').close()
+
+    full_pattern = os.path.join(top_dir, pattern)
+    listing = DirectoryListing()
+    assert listing.glob(full_pattern) == sorted(glob.glob(full_pattern))
+
+
+@pytest.mark.parametrize(
+    'filename, data_type, expected', [
+        ('internal/tests/data/zip/testfile4.txt', None, True),
+        ('internal/tests/data/zip/testfile.txt', None, True),
+        ('internal/tests/data/zip/testfile3.txt', None, True),
+        ('internal/tests/data/zip/missing.txt', None, False),
+        ('internal/tests/data/missing/missing.txt', None, False),
+        ('internal/tests/data/zip/missing.txt', 'PYTHON_NUMPY', True),
+        ('internal/tests/data/zip/PYTHON_NUMPY', None, True),
+    ]
+)
+@pytest.mark.util
+def test_directory_listing_may_preprocess(metplus_config, filename,
+                                          data_type, expected):
+    config = metplus_config
+    filepath = os.path.join(config.getdir('METPLUS_BASE'), filename)
+    listing = DirectoryListing()
+    assert listing.may_preprocess(filepath, data_type, config) == expected
+    if not expected:
+        assert preprocess_file(filepath, data_type, config) is None
+
+
+@pytest.mark.parametrize(
+    'extension, watch', [
+        ('', True),
+        ('.gz', True),
+        ('', False),
+        ('.gz', False),
+    ]
+)
+@pytest.mark.util
+def test_wait_for_input_files(tmp_path_factory, extension, watch):
+    import time
+    import logging
+    import threading
+    from produtil.filewatch import inotify_available
+    input_dir = str(tmp_path_factory.mktemp('wait'))
+    existing = os.path.join(input_dir, 'existing.nc')
+    with open(existing, 'w') as file_handle:
+        file_handle.write('data')
+
+    # write file to a directory that does not exist yet
+    new_file = os.path.join(input_dir, 'sub', 'new.nc')
+
+    def write_file():
+        time.sleep(0.5)
+        os.makedirs(os.path.dirname(new_file))
+        with open(f'{new_file}{extension}', 'w') as file_handle:
+            file_handle.write('data')
+
+    logger = logging.getLogger('test_wait_for_input_files')
+    writer = threading.Thread(target=write_file)
+    writer.start()
+    start_time = time.time()
+    waiter = InputFileWaiter([existing, new_file], min_size=1)
+    assert waiter.checkfiles(maxwait=30, sleeptime=20, logger=logger,
+                             watch=watch)
+    writer.join()
+    elapsed = time.time() - start_time
+    # events are received as soon as the file is written, and polling
+    # starts with short sleeps, so neither waits for the full sleep time
+    assert elapsed < 10
+    if watch and inotify_available():
+        assert elapsed < 3
+
+    # give up after wait time if file is never written
+    missing = os.path.join(input_dir, 'missing.nc')
+    assert wait_for_input_files([existing], 5, logger)
+    assert not wait_for_input_files([missing], 2, logger, sleep_time=1)
@@ -47,6 +47,19 @@ def test_get_skip_time_no_valid():
     assert skip_time(input_dict, {'%Y': ['2019']}) == False
 
 
+@pytest.mark.util
+def test_skip_time_compiled(metplus_config):
+    conf = metplus_config
+    conf.set('config', 'SKIP_TIMES', '"%d:30,31", "%m:begin_end_incr(3,11,1)"')
+    skip_times = get_skip_times(conf)
+    assert isinstance(skip_times, SkipTimes)
+    assert skip_times.get_int_sets() == [('%d', {30, 31}),
+                                         ('%m', set(range(3, 12)))]
+    assert skip_time({'valid': datetime(2019, 1, 30)}, skip_times)
+    assert skip_time({'valid': datetime(2019, 4, 1)}, skip_times)
+    assert not skip_time({'valid': datetime(2019, 1, 29)}, skip_times)
+
+
 @pytest.mark.parametrize(
     'skip_times_conf, expected_dict', [
         ('"%d:30,31"', {'%d': ['30','31']}),
@@ -444,3 +457,153 @@ def test_get_lead_sequence_init_min_10(metplus_config):
     test_seq = get_lead_sequence(conf, input_dict)
     lead_seq = [12, 24]
     assert test_seq == [relativedelta(hours=lead) for lead in lead_seq]
+
+
+@pytest.mark.util
+def test_get_lead_sequence_cached(metplus_config):
+    conf = metplus_config
+    conf.set('config', 'INIT_SEQ', "0, 12")
+    conf.set('config', 'LEAD_SEQ_MAX', 24)
+    first = get_lead_sequence(conf, {'valid': datetime(2019, 2, 1, 12)})
+    assert first == [relativedelta(hours=lead) for lead in [0, 12, 24]]
+
+    # modifying the returned list does not modify the cached list
+    first.clear()
+    second = get_lead_sequence(conf, {'valid': datetime(2019, 2, 2, 12)})
+    assert second == [relativedelta(hours=lead) for lead in [0, 12, 24]]
+
+    # different valid hour is computed separately
+    test_seq = get_lead_sequence(conf, {'valid': datetime(2019, 2, 1, 13)})
+    assert test_seq == [relativedelta(hours=lead) for lead in [1, 13]]
+
+    # changing the config invalidates the cache
+    conf.set('config', 'LEAD_SEQ_MIN', 10)
+    test_seq = get_lead_sequence(conf, {'valid': datetime(2019, 2, 1, 12)})
+    assert test_seq == [relativedelta(hours=lead) for lead in [12, 24]]
+
+
+def _get_expected_run_times(config, skip_times):
+    expected = []
+    for input_dict in time_generator(config):
+        for lead in get_lead_sequence(config, input_dict):
+            input_dict['lead'] = lead
+            time_info = ti_calculate(input_dict)
+            if skip_time(time_info, skip_times):
+                continue
+            expected.append((time_info['init'], time_info['valid'],
+                             time_info['lead_seconds']))
+    return expected
+
+
+@pytest.mark.parametrize(
+    'config_dict', [
+        {'LOOP_BY': 'INIT', 'INIT_BEG': '2019123000', 'INIT_END': '2020010218',
+         'INIT_INCREMENT': '6H', 'LEAD_SEQ': '0, 3, 6'},
+        {'LOOP_BY': 'VALID', 'VALID_BEG': '2019123000',
+         'VALID_END': '2020010218', 'VALID_INCREMENT': '1H',
+         'INIT_SEQ': '0, 12', 'LEAD_SEQ_MAX': '36'},
+        {'LOOP_BY': 'INIT', 'INIT_BEG': '2019123000', 'INIT_END': '2020033000',
+         'INIT_INCREMENT': '1m', 'LEAD_SEQ': '0, 1m'},
+        {'LOOP_BY': 'VALID', 'VALID_LIST': '2020010100, 2019123012',
+         'LEAD_SEQ': '12, 0'},
+    ]
+)
+@pytest.mark.util
+def test_get_run_time_arrays(metplus_config, config_dict):
+    np = pytest.importorskip('numpy')
+    config = metplus_config
+    config.set('config', f"{config_dict['LOOP_BY']}_TIME_FMT", '%Y%m%d%H')
+    config.set('config', 'SKIP_TIMES', '"%d:31", "%Y%m%d%H:2020010112"')
+    for key, value in config_dict.items():
+        config.set('config', key, value)
+
+    skip_times = get_skip_times(config)
+    expected = _get_expected_run_times(config, skip_times)
+    arrays = get_run_time_arrays(config)
+
+    actual = list(zip(arrays['init'].astype(datetime),
+                      arrays['valid'].astype(datetime),
+                      arrays['lead'].astype('int64')))
+    assert actual == expected
+    assert (arrays['da_init'] == arrays['valid']).all()
+
+
+@pytest.mark.util
+def test_get_run_time_arrays_offsets(metplus_config):
+    np = pytest.importorskip('numpy')
+    config = metplus_config
+    config.set('config', 'LOOP_BY', 'VALID')
+    config.set('config', 'VALID_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'VALID_BEG', '2020010100')
+    config.set('config', 'VALID_END', '2020010106')
+    config.set('config', 'VALID_INCREMENT', '6H')
+
+    arrays = get_run_time_arrays(config, skip_times={}, offsets=[0, 3600])
+    assert len(arrays['valid']) == 4
+    assert arrays['offset'].astype('int64').tolist() == [0, 3600, 0, 3600]
+    assert ((arrays['da_init'] - arrays['valid']) == arrays['offset']).all()
+
+
+@pytest.mark.parametrize(
+    'time_format', ['%d', '%m', '%Y%m%d', '%H', '%j', '%Y%m%d%H%M%S', '%y%m']
+)
+@pytest.mark.util
+def test_get_skip_time_mask(time_format):
+    np = pytest.importorskip('numpy')
+    valid_times = np.arange(np.datetime64('2019-12-30T00'),
+                            np.datetime64('2020-03-02T00'),
+                            np.timedelta64(7, 'h')).astype('datetime64[s]')
+    values = [valid.strftime(time_format)
+              for valid in valid_times.astype(datetime)]
+    skip_times = {time_format: values[::5]}
+    expected = [skip_time({'valid': valid}, skip_times)
+                for valid in valid_times.astype(datetime)]
+    assert get_skip_time_mask(valid_times, skip_times).tolist() == expected
+
+
+@pytest.mark.parametrize(
+    'shard, expected_indices', [
+        ((0, 1), [0, 1, 2, 3, 4, 5, 6]),
+        ((0, 2), [0, 2, 4, 6]),
+        ((1, 2), [1, 3, 5]),
+        ((2, 3), [2, 5]),
+    ]
+)
+@pytest.mark.util
+def test_is_in_shard(shard, expected_indices):
+    assert [index for index in range(7)
+            if is_in_shard(shard, index)] == expected_indices
+
+
+@pytest.mark.util
+def test_loop_over_times_and_call_shards(metplus_config):
+    config = metplus_config
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2021010100')
+    config.set('config', 'INIT_END', '2021010200')
+    config.set('config', 'INIT_INCREMENT', '6H')
+    config.set('config', 'SHARD_COUNT', 2)
+
+    class MockWrapper:
+        def __init__(self):
+            self.instance = None
+            self.errors = 0
+            self.run_times = []
+            self.all_commands = []
+
+        def clear(self):
+            pass
+
+        def run_at_time(self, time_input):
+            self.run_times.append(time_input['init'].strftime('%H'))
+
+    run_times = []
+    for shard_index in range(2):
+        config.set('config', 'SHARD_INDEX', shard_index)
+        wrapper = MockWrapper()
+        assert loop_over_times_and_call(config, wrapper) == []
+        run_times.append(wrapper.run_times)
+
+    assert run_times == [['00', '12', '00'], ['06', '18']]
+    assert get_shard(config) == (1, 2)
@@ -912,3 +912,240 @@ def test_find_and_check_output_file_skip(metplus_config, exists, skip, is_dir,
 
     # cast result to bool because None isn't equal to False
     assert bool(result) == run
+
+
+@pytest.mark.parametrize(
+    'enabled, data_type, name_suffix, expect_cached', [
+        (True, 'PYTHON_NUMPY', '', True),
+        (False, 'PYTHON_NUMPY', '', False),
+        (True, 'PYTHON_PANDAS', '', False),
+        (True, 'PYTHON_NUMPY', ' MET_PYTHON_INPUT_ARG', False),
+    ]
+)
+@pytest.mark.wrapper
+def test_get_python_embedding_cache_name(metplus_config, tmp_path_factory,
+                                         enabled, data_type, name_suffix,
+                                         expect_cached):
+    pytest.importorskip('numpy')
+    from metplus.util import py_embed_cache
+
+    script_dir = tmp_path_factory.mktemp('py_embed')
+    count_file = os.path.join(script_dir, 'count.txt')
+    script = os.path.join(script_dir, 'read_data.py')
+    with open(script, 'w') as file_handle:
+        file_handle.write(
+            'import sys\n'
+            'import numpy as np\n'
+            f'with open("{count_file}", "a") as count:\n'
+            '    count.write("run\\n")\n'
+            'met_data = np.arange(6.0).reshape(2, 3) * float(sys.argv[1])\n'
+            'attrs = {"name": "TEST", "scale": np.float32(2)}\n'
+        )
+
+    config = metplus_config
+    config.set('config', 'DO_NOT_RUN_EXE', False)
+    config.set('config', 'PYTHON_EMBEDDING_CACHE', enabled)
+    name = f'{script} 2{name_suffix}'
+
+    for _ in range(2):
+        cbw = CommandBuilder(config)
+        cbw.c_dict['FCST_INPUT_DATATYPE'] = data_type
+        fields = cbw.get_field_info(d_type='FCST', v_name=name,
+                                    v_level='L0')
+        assert len(fields) == 1
+        assert cbw.errors == 0
+
+    if not expect_cached:
+        assert fields[0] == f'{{ name="{name}"; level="L0"; }}'
+        assert not os.path.exists(count_file)
+        return
+
+    # script should only run once
+    with open(count_file, 'r') as file_handle:
+        assert file_handle.read().splitlines() == ['run']
+
+    cache_name = fields[0].split('"')[1]
+    cache_script, cache_prefix = cache_name.split()
+    assert cache_script == os.path.abspath(py_embed_cache.__file__)
+    assert cache_prefix.startswith(cbw.c_dict['PYTHON_EMBEDDING_CACHE_DIR'])
+
+    met_data, attrs = py_embed_cache.read_cache(cache_prefix)
+    assert met_data.tolist() == [[0, 2, 4], [6, 8, 10]]
+    assert attrs == {'name': 'TEST', 'scale': 2}
+
+
+@pytest.mark.parametrize(
+    'plan_settings, expected_valids', [
+        ({}, ['20200101000000', '20200101060000']),
+        ({'PLAN_WRAPPERS': 'GridStat'}, []),
+        ({'PLAN_WRAPPERS': 'CommandBuilder',
+          'PLAN_TIME_BEG': '2020010106'}, ['20200101060000']),
+        ({'PLAN_TIME_END': '2020010100'}, ['20200101000000']),
+    ]
+)
+@pytest.mark.wrapper
+def test_write_plan_record(metplus_config, tmp_path_factory, plan_settings,
+                           expected_valids):
+    import json
+    tmp_dir = tmp_path_factory.mktemp('plan')
+    plan_file = os.path.join(tmp_dir, 'plan.jsonl')
+    data_file = os.path.join(tmp_dir, 'data.nc')
+    with open(data_file, 'w') as file_handle:
+        file_handle.write('x' * 10)
+    list_file = os.path.join(tmp_dir, 'file_list.txt')
+    with open(list_file, 'w') as file_handle:
+        file_handle.write(f'file_list\n{data_file}\n')
+    output_path = os.path.join(tmp_dir, 'out', 'output.nc')
+
+    config = metplus_config
+    config.set('config', 'PLAN_FILE', plan_file)
+    for key, value in plan_settings.items():
+        config.set('config', key, value)
+
+    cbw = CommandBuilder(config)
+    assert cbw.c_dict['DO_NOT_RUN_EXE']
+    for valid in ('2020010100', '2020010106'):
+        time_info = ti_calculate({
+            'valid': datetime.datetime.strptime(valid, '%Y%m%d%H'),
+            'lead': 3600,
+        })
+        cbw.set_environment_variables(time_info)
+        cbw.infiles = [list_file]
+        cbw.set_output_path(output_path)
+        assert cbw.run_command(f'app {list_file} {output_path}')
+
+    if not expected_valids:
+        assert not os.path.exists(plan_file)
+        return
+
+    with open(plan_file, 'r') as file_handle:
+        records = [json.loads(line) for line in file_handle]
+
+    assert [record['valid'] for record in records] == expected_valids
+    for record in records:
+        assert record['wrapper'] == 'CommandBuilder'
+        assert record['lead_seconds'] == 3600
+        assert record['command'] == f'app {list_file} {output_path}'
+        assert record['inputs'] == [list_file, data_file]
+        assert record['outputs'] == [output_path]
+        assert record['input_bytes'] == (os.path.getsize(list_file) + 10)
+
+
+@pytest.mark.parametrize(
+    'num_processes, stage_compressed', [
+        (1, True),
+        (4, True),
+        (4, False),
+    ]
+)
+@pytest.mark.wrapper
+def test_check_that_files_exist_preprocess(metplus_config, tmp_path_factory,
+                                           num_processes, stage_compressed):
+    import gzip
+    input_dir = str(tmp_path_factory.mktemp('members'))
+    staging_dir = str(tmp_path_factory.mktemp('staging'))
+
+    config = metplus_config
+    config.set('config', 'STAGING_DIR', staging_dir)
+
+    check_file_list = []
+    for member in range(1, 6):
+        file_path = os.path.join(input_dir, f'mem{member}.nc')
+        check_file_list.append((file_path, 'mem{member}.nc'))
+        # leave member 3 missing and do not compress member 5
+        if member == 3:
+            continue
+        if member == 5:
+            with open(file_path, 'wb') as file_handle:
+                file_handle.write(b'member 5')
+            continue
+        with gzip.open(f'{file_path}.gz', 'wb') as file_handle:
+            file_handle.write(f'member {member}'.encode('utf-8'))
+
+    cbw = CommandBuilder(config)
+    cbw.c_dict['MANDATORY'] = False
+    cbw.c_dict['FCST_FILL_MISSING'] = True
+    cbw.c_dict['PREPROCESS_NUM_PROCESSES'] = num_processes
+    cbw.c_dict['FCST_STAGE_COMPRESSED_INPUT'] = stage_compressed
+
+    found = cbw._check_that_files_exist(check_file_list, 'FCST_',
+                                        allow_dir=False, mandatory=True,
+                                        input_must_exist=True)
+
+    input_files = [file_path for file_path, _ in check_file_list]
+    assert found[2] == f'MISSING{input_files[2]}'
+    assert found[4] == input_files[4]
+    for index in (0, 1, 3):
+        if not stage_compressed:
+            assert found[index] == f'{input_files[index]}.gz'
+            assert not os.path.exists(staging_dir + input_files[index])
+            continue
+
+        assert found[index] == staging_dir + input_files[index]
+        with open(found[index], 'rb') as file_handle:
+            assert file_handle.read() == f'member {index+1}'.encode('utf-8')
+
+    # no temporary files should remain in staging directory
+    for _, _, files in os.walk(staging_dir):
+        assert not [name for name in files if name.endswith('.tmp')]
+
+
+@pytest.mark.wrapper
+def test_set_environment_variables_only_subs_tags(metplus_config,
+                                                  monkeypatch):
+    from metplus.wrappers import command_builder
+    subbed = []
+    real_do_string_sub = command_builder.do_string_sub
+
+    def count_do_string_sub(tmpl, **kwargs):
+        subbed.append(tmpl)
+        return real_do_string_sub(tmpl, **kwargs)
+
+    monkeypatch.setattr(command_builder, 'do_string_sub', count_do_string_sub)
+
+    cbw = CommandBuilder(metplus_config)
+    static_value = 'mask = {grid = [ "FULL" ]; poly = [];}'
+    time_value = 'climo = {file_name = [ "/climo/{valid?fmt=%m%d}.nc" ];}'
+    cbw.env_var_keys = ['METPLUS_STATIC', 'METPLUS_TIME', 'METPLUS_UNSET']
+    cbw.env_var_dict = {'METPLUS_STATIC': static_value,
+                        'METPLUS_TIME': time_value}
+
+    time_info = ti_calculate({'valid': datetime.datetime(2020, 2, 1, 12)})
+    cbw.set_environment_variables(time_info)
+
+    assert cbw.env_var_dict['METPLUS_STATIC'] == static_value
+    assert cbw.env['METPLUS_STATIC'] == static_value
+    assert cbw.env['METPLUS_TIME'] == (
+        'climo = {file_name = [ "/climo/0201.nc" ];}'
+    )
+    assert cbw.env['METPLUS_UNSET'] == ''
+    assert subbed == [time_value]
+
+
+@pytest.mark.wrapper
+def test_find_data_waits_for_input(metplus_config, tmp_path_factory):
+    import time
+    import threading
+    input_dir = str(tmp_path_factory.mktemp('input'))
+    config = metplus_config
+    config.set('config', 'INPUT_WAIT_TIME', 30)
+    config.set('config', 'INPUT_WAIT_SLEEP_TIME', 1)
+
+    cbw = CommandBuilder(config)
+    cbw.c_dict['FCST_INPUT_DIR'] = input_dir
+    cbw.c_dict['FCST_INPUT_TEMPLATE'] = '{valid?fmt=%Y%m%d%H}.nc'
+    time_info = ti_calculate({'valid': datetime.datetime(2024, 1, 1, 12)})
+    expected = os.path.join(input_dir, '2024010112.nc')
+
+    def write_file():
+        time.sleep(0.5)
+        with open(expected, 'w') as file_handle:
+            file_handle.write('data')
+
+    writer = threading.Thread(target=write_file)
+    writer.start()
+    with cbw.cached_directory_listing():
+        # list the directory before the file is written
+        assert not cbw._dir_listing.exists(expected)
+        assert cbw.find_data(time_info, data_type='FCST') == expected
+    writer.join()
@@ -81,3 +81,214 @@ def test_run_gen_vx_mask_twice(metplus_config):
 
     assert test_passed
 
+
+
+@pytest.mark.wrapper
+def test_run_gen_vx_mask_unique_temp_files(metplus_config):
+    input_dict = {'valid': datetime.datetime.strptime("201802010000",'%Y%m%d%H%M'),
+                  'lead': 0}
+    time_info = time_util.ti_calculate(input_dict)
+
+    config = metplus_config
+    temp_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'temp_masks')
+    config.set('config', 'GEN_VX_MASK_TEMP_DIR', temp_dir)
+    config.set('config', 'GEN_VX_MASK_UNIQUE_TEMP_FILES', True)
+    wrap = gen_vx_mask_wrapper(config)
+    wrap.c_dict['INPUT_TEMPLATE'] = '{valid?fmt=%Y%m%d%H}_ZENITH'
+    wrap.c_dict['MASK_INPUT_TEMPLATES'] = ['LAT', 'LON']
+    wrap.c_dict['OUTPUT_DIR'] = os.path.join(wrap.config.getdir('OUTPUT_BASE'),
+                                             'GenVxMask_test')
+    wrap.c_dict['OUTPUT_TEMPLATE'] = '{valid?fmt=%Y%m%d%H}_ZENITH_LAT_LON_MASK.nc'
+    cmd_args = ["-type lat -thresh 'ge30&&le50'", "-type lon -thresh 'le-70&&ge-130' -intersection -name lat_lon_mask"]
+    wrap.c_dict['COMMAND_OPTIONS'] = cmd_args
+
+    wrap.run_at_time_all(time_info)
+
+    temp_file = os.path.join(temp_dir,
+                             f'temp_{config.run_id}_20180201000000_0_0.nc')
+    expected_cmds = [f"{wrap.app_path} 2018020100_ZENITH LAT {temp_file} {cmd_args[0]} -v 2",
+                     f"{wrap.app_path} {temp_file} LON {wrap.config.getdir('OUTPUT_BASE')}/GenVxMask_test/2018020100_ZENITH_LAT_LON_MASK.nc {cmd_args[1]} -v 2"]
+
+    assert len(wrap.all_commands) == len(expected_cmds)
+    for (cmd, _), expected_cmd in zip(wrap.all_commands, expected_cmds):
+        assert cmd == expected_cmd
+
+
+@pytest.mark.parametrize(
+    'shard_count, expected_unique', [
+        (None, False),
+        (1, False),
+        (2, True),
+    ]
+)
+@pytest.mark.wrapper
+def test_gen_vx_mask_unique_temp_files_shards(metplus_config, shard_count,
+                                              expected_unique):
+    config = metplus_config
+    if shard_count is not None:
+        config.set('config', 'SHARD_COUNT', shard_count)
+    wrap = gen_vx_mask_wrapper(config)
+    assert wrap.c_dict['UNIQUE_TEMP_FILES'] == expected_unique
+
+
+@pytest.mark.parametrize(
+    'num_processes, reuse', [
+        (1, False),
+        (1, True),
+        (4, False),
+        (4, True),
+    ]
+)
+@pytest.mark.wrapper
+def test_run_gen_vx_mask_chains_all_times(metplus_config, num_processes,
+                                          reuse):
+    config = metplus_config
+    temp_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'temp_masks')
+    config.set('config', 'LOOP_BY', 'VALID')
+    config.set('config', 'VALID_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'VALID_BEG', '2018020100')
+    config.set('config', 'VALID_END', '2018020112')
+    config.set('config', 'VALID_INCREMENT', '6H')
+    config.set('config', 'GEN_VX_MASK_INPUT_TEMPLATE', 'ZENITH')
+    config.set('config', 'GEN_VX_MASK_INPUT_MASK_TEMPLATE', 'LAT, LON')
+    config.set('config', 'GEN_VX_MASK_OPTIONS',
+               "-type lat -thresh 'ge30&&le50', -type lon -thresh 'le-70&&ge-130' -intersection")
+    config.set('config', 'GEN_VX_MASK_OUTPUT_TEMPLATE',
+               '{OUTPUT_BASE}/GenVxMask_test/{valid?fmt=%Y%m%d%H}_mask.nc')
+    config.set('config', 'GEN_VX_MASK_TEMP_DIR', temp_dir)
+    config.set('config', 'GEN_VX_MASK_UNIQUE_TEMP_FILES', True)
+    config.set('config', 'GEN_VX_MASK_NUM_PROCESSES', num_processes)
+    config.set('config', 'GEN_VX_MASK_REUSE_INTERMEDIATE_FILES', reuse)
+    wrap = gen_vx_mask_wrapper(config)
+    assert wrap.isOK
+
+    all_commands = wrap.run_all_times()
+    assert wrap.errors == 0
+
+    out_dir = f"{config.getdir('OUTPUT_BASE')}/GenVxMask_test"
+    valids = ['2018020100', '2018020106', '2018020112']
+    # first step is the same for all times, so it is only run once if reused
+    first_valids = valids[:1] if reuse else valids
+    expected_cmds = []
+    for valid in first_valids:
+        temp_file = os.path.join(temp_dir,
+                                 f'temp_{config.run_id}_{valid}0000_0_0.nc')
+        expected_cmds.append(f"{wrap.app_path} ZENITH LAT {temp_file}")
+    for valid in valids:
+        expected_cmds.append(f"LON {out_dir}/{valid}_mask.nc")
+
+    assert len(all_commands) == len(expected_cmds)
+    for expected_cmd in expected_cmds:
+        assert any(expected_cmd in cmd for cmd, _ in all_commands)
+
+    # commands that use a reused file must run after the file is created
+    if reuse:
+        first_temp = os.path.join(temp_dir,
+                                  f'temp_{config.run_id}_20180201000000_0_0.nc')
+        assert all(first_temp in cmd for cmd, _ in all_commands)
+        assert all_commands[0][0].startswith(f"{wrap.app_path} ZENITH LAT")
+
+
+def _set_chain_config(config, num_processes, reuse):
+    temp_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'temp_masks')
+    config.set('config', 'LOOP_BY', 'VALID')
+    config.set('config', 'VALID_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'VALID_BEG', '2018020100')
+    config.set('config', 'VALID_END', '2018020112')
+    config.set('config', 'VALID_INCREMENT', '6H')
+    config.set('config', 'GEN_VX_MASK_INPUT_TEMPLATE', 'ZENITH')
+    config.set('config', 'GEN_VX_MASK_INPUT_MASK_TEMPLATE', 'LAT, LON')
+    config.set('config', 'GEN_VX_MASK_OPTIONS',
+               "-type lat -thresh 'ge30&&le50', -type lon -thresh 'le-70&&ge-130' -intersection")
+    config.set('config', 'GEN_VX_MASK_OUTPUT_TEMPLATE',
+               '{OUTPUT_BASE}/GenVxMask_test/{valid?fmt=%Y%m%d%H}_mask.nc')
+    config.set('config', 'GEN_VX_MASK_TEMP_DIR', temp_dir)
+    config.set('config', 'GEN_VX_MASK_NUM_PROCESSES', num_processes)
+    config.set('config', 'GEN_VX_MASK_REUSE_INTERMEDIATE_FILES', reuse)
+    return temp_dir
+
+
+@pytest.mark.parametrize(
+    'num_processes', [1, 4]
+)
+@pytest.mark.wrapper
+def test_gen_vx_mask_reuse_skipped_chain(metplus_config, num_processes):
+    config = metplus_config
+    temp_dir = _set_chain_config(config, num_processes, True)
+    config.set('config', 'GEN_VX_MASK_SKIP_IF_OUTPUT_EXISTS', True)
+
+    # output for the first run time exists, so its chain is skipped and
+    # the intermediate file it would create is never written
+    out_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'GenVxMask_test')
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, '2018020100_mask.nc'), 'w') as file_handle:
+        file_handle.write('mask')
+
+    wrap = gen_vx_mask_wrapper(config)
+    all_commands = wrap.run_all_times()
+    assert wrap.errors == 0
+
+    # the next run time creates the intermediate file instead of reusing
+    # the file from the skipped run time
+    skipped_temp = f'temp_{config.run_id}_20180201000000_0_0.nc'
+    temp_file = os.path.join(temp_dir,
+                             f'temp_{config.run_id}_20180201060000_0_0.nc')
+    assert not any(skipped_temp in cmd for cmd, _ in all_commands)
+    assert all_commands[0][0].startswith(f"{wrap.app_path} ZENITH LAT "
+                                         f"{temp_file}")
+    assert len(all_commands) == 3
+    assert all(temp_file in cmd for cmd, _ in all_commands)
+
+
+@pytest.mark.wrapper
+def test_gen_vx_mask_reuse_concurrent_groups(metplus_config):
+    config = metplus_config
+    temp_dir = _set_chain_config(config, 4, True)
+    wrap = gen_vx_mask_wrapper(config)
+
+    calls = []
+    run_command_groups = wrap.run_command_groups
+    def record_groups(command_groups, **kwargs):
+        calls.append([[cmd for cmd, *_ in group] for group in command_groups])
+        return run_command_groups(command_groups, **kwargs)
+
+    wrap.run_command_groups = record_groups
+    wrap.run_all_times()
+    assert wrap.errors == 0
+
+    # reused intermediate file is created first, then the chain of each run
+    # time is run as a separate group so the run times run concurrently
+    temp_file = os.path.join(temp_dir,
+                             f'temp_{config.run_id}_20180201000000_0_0.nc')
+    assert len(calls) == 2
+    assert len(calls[0]) == 1 and len(calls[0][0]) == 1
+    assert calls[0][0][0].startswith(f"{wrap.app_path} ZENITH LAT {temp_file}")
+    assert len(calls[1]) == 3
+    for group, valid in zip(calls[1], ['2018020100', '2018020106',
+                                       '2018020112']):
+        assert len(group) == 1
+        assert group[0].startswith(f"{wrap.app_path} {temp_file} LON")
+        assert f'{valid}_mask.nc' in group[0]
+
+
+@pytest.mark.wrapper
+def test_gen_vx_mask_reuse_failed_chain(metplus_config):
+    config = metplus_config
+    temp_dir = _set_chain_config(config, 1, True)
+    wrap = gen_vx_mask_wrapper(config)
+
+    # first chain fails, so its intermediate file must not be reused
+    results = iter([False, True, True])
+    wrap.run_command_groups = lambda command_groups, **kwargs: next(results)
+    all_commands = wrap.run_all_times()
+
+    temp_files = [
+        os.path.join(temp_dir, f'temp_{config.run_id}_{valid}0000_0_0.nc')
+        for valid in ('2018020100', '2018020106')
+    ]
+    first_cmds = [cmd for cmd, _ in all_commands
+                  if cmd.startswith(f"{wrap.app_path} ZENITH LAT")]
+    assert len(first_cmds) == 2
+    for cmd, temp_file in zip(first_cmds, temp_files):
+        assert temp_file in cmd
+    assert temp_files[1] in all_commands[-1][0]
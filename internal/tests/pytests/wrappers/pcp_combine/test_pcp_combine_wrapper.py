@@ -106,6 +106,55 @@ def test_get_accumulation_6_to_6(metplus_config):
             input_dir+"/20160904/file.2016090418.06h" in in_files)
 
 
+@pytest.mark.parametrize(
+    'accums, selection, lookback, input_files, expected_files', [
+        # first accum in list at valid time cannot be used
+        (['3', '1'], 'ORDER', 4, {'18.03h': 1, '18.01h': 1, '17.03h': 1},
+         ['18.01h', '17.03h']),
+        (['1', '3'], 'ORDER', 3,
+         {'18.01h': 1, '17.01h': 1, '16.01h': 1, '18.03h': 100},
+         ['18.01h', '17.01h', '16.01h']),
+        (['1', '3'], 'FEWEST_FILES', 3,
+         {'18.01h': 1, '17.01h': 1, '16.01h': 1, '18.03h': 100},
+         ['18.03h']),
+        (['3', '1'], 'SMALLEST_SIZE', 3,
+         {'18.01h': 1, '17.01h': 1, '16.01h': 1, '18.03h': 100},
+         ['18.01h', '17.01h', '16.01h']),
+        # accumulation cannot be covered
+        (['3', '1'], 'ORDER', 4, {'18.03h': 1, '18.01h': 1}, None),
+    ]
+)
+@pytest.mark.wrapper
+def test_get_accumulation_selection(metplus_config, tmp_path_factory, accums,
+                                    selection, lookback, input_files,
+                                    expected_files):
+    data_src = 'OBS'
+    pcw = pcp_combine_wrapper(metplus_config, data_src)
+    input_dir = str(tmp_path_factory.mktemp('accum'))
+    os.makedirs(os.path.join(input_dir, '20160904'))
+    for input_file, size in input_files.items():
+        with open(os.path.join(input_dir, '20160904',
+                               f'file.20160904{input_file}'), 'w') as file:
+            file.write('x' * size)
+
+    time_info = ti_calculate({'valid': datetime(2016, 9, 4, 18)})
+    pcw.c_dict[f'{data_src}_INPUT_DIR'] = input_dir
+    pcw.c_dict[f'{data_src}_ACCUMS'] = accums
+    pcw.c_dict[f'{data_src}_NAMES'] = []
+    pcw.c_dict[f'{data_src}_INPUT_SELECTION'] = selection
+    pcw._build_input_accum_list(data_src, time_info)
+
+    files_found = pcw.get_accumulation(time_info, lookback * 3600, data_src)
+    if expected_files is None:
+        assert files_found is None
+        return
+
+    expected = [os.path.join(input_dir, '20160904', f'file.20160904{item}')
+                for item in expected_files]
+    assert [item[0] for item in files_found] == expected
+    assert pcw.args == [item for pair in files_found for item in pair]
+
+
 @pytest.mark.wrapper
 def test_get_lowest_forecast_file_dated_subdir(metplus_config):
     data_src = "FCST"
@@ -862,3 +911,153 @@ def test_subtract_method_zero_accum(metplus_config):
         for (cmd, env_vars), expected_cmd in zip(all_cmds, expected_cmds):
             # ensure commands are generated as expected
             assert cmd == expected_cmd
+
+
+@pytest.mark.parametrize(
+    'method, prev_exists', [
+        ('ADD', True),
+        ('SUM', True),
+        ('ADD', False),
+    ]
+)
+@pytest.mark.wrapper
+def test_pcp_combine_rolling_accum(metplus_config, tmp_path_factory,
+                                   method, prev_exists):
+    config = metplus_config
+    input_dir = get_test_data_dir(config, subdir='accum')
+    output_dir = str(tmp_path_factory.mktemp('rolling'))
+    config.set('config', 'DO_NOT_RUN_EXE', True)
+    config.set('config', 'PROCESS_LIST', 'PCPCombine')
+    config.set('config', 'LOOP_BY', 'VALID')
+    config.set('config', 'VALID_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'VALID_BEG', '2016090418')
+    config.set('config', 'VALID_END', '2016090418')
+    config.set('config', 'VALID_INCREMENT', '1H')
+    config.set('config', 'LEAD_SEQ', '0')
+    config.set('config', 'OBS_PCP_COMBINE_RUN', True)
+    config.set('config', 'OBS_PCP_COMBINE_METHOD', method)
+    config.set('config', 'OBS_PCP_COMBINE_USE_ROLLING_ACCUM', True)
+    config.set('config', 'OBS_PCP_COMBINE_INPUT_DIR', input_dir)
+    config.set('config', 'OBS_PCP_COMBINE_INPUT_TEMPLATE',
+               '{valid?fmt=%Y%m%d}/file.{valid?fmt=%Y%m%d%H}.{level?fmt=%HH}h')
+    config.set('config', 'OBS_PCP_COMBINE_INPUT_ACCUMS', '1')
+    config.set('config', 'OBS_PCP_COMBINE_INPUT_NAMES', 'P01M_NONE')
+    config.set('config', 'OBS_PCP_COMBINE_OUTPUT_DIR', output_dir)
+    config.set('config', 'OBS_PCP_COMBINE_OUTPUT_TEMPLATE',
+               'out.{valid?fmt=%Y%m%d%H}_A{level?fmt=%HH}h.nc')
+    config.set('config', 'OBS_PCP_COMBINE_OUTPUT_ACCUM', '3H')
+    config.set('config', 'OBS_PCP_COMBINE_OUTPUT_NAME', 'APCP_03')
+
+    prev_output = os.path.join(output_dir, 'out.2016090417_A03h.nc')
+    if prev_exists:
+        open(prev_output, 'w').close()
+
+    wrapper = PCPCombineWrapper(config)
+    assert wrapper.isOK
+
+    all_cmds = wrapper.run_all_times()
+
+    app_path = os.path.join(config.getdir('MET_BIN_DIR'), wrapper.app_name)
+    verbosity = f"-v {wrapper.c_dict['VERBOSITY']}"
+    in_fmt = '\'name="P01M_NONE";\''
+    out_fmt = '\'name="APCP_03"; level="(*,*)";\''
+    partial_file = os.path.join(config.getdir('STAGING_DIR'),
+                                'pcp_combine_rolling',
+                                'obs_20160904180000_7200s.nc')
+    if not prev_exists:
+        assert len(all_cmds) == 1
+        assert f'-{method.lower()}' in all_cmds[0][0]
+        return
+
+    expected_cmds = [
+        (f"{app_path} {verbosity} -subtract {prev_output} {out_fmt} "
+         f"{input_dir}/20160904/file.2016090415.01h {in_fmt} "
+         f'-name "APCP_03" {partial_file}'),
+        (f"{app_path} {verbosity} -add {partial_file} {out_fmt} "
+         f"{input_dir}/20160904/file.2016090418.01h {in_fmt} "
+         f'-name "APCP_03" {output_dir}/out.2016090418_A03h.nc'),
+    ]
+    assert [cmd for cmd, _ in all_cmds] == expected_cmds
+
+
+@pytest.mark.wrapper
+def test_pcp_combine_rolling_accum_invalid(metplus_config):
+    config = metplus_config
+    config.set('config', 'FCST_PCP_COMBINE_RUN', True)
+    config.set('config', 'FCST_PCP_COMBINE_METHOD', 'SUBTRACT')
+    config.set('config', 'FCST_PCP_COMBINE_USE_ROLLING_ACCUM', True)
+    config.set('config', 'FCST_PCP_COMBINE_INPUT_TEMPLATE', 'in')
+    config.set('config', 'FCST_PCP_COMBINE_OUTPUT_TEMPLATE', 'out')
+    wrapper = PCPCombineWrapper(config)
+    assert not wrapper.isOK
+
+
+@pytest.mark.wrapper
+def test_pcp_combine_rolling_accum_fcst(metplus_config, tmp_path_factory):
+    config = metplus_config
+    input_dir = str(tmp_path_factory.mktemp('rolling_in'))
+    output_dir = str(tmp_path_factory.mktemp('rolling_out'))
+    config.set('config', 'DO_NOT_RUN_EXE', True)
+    config.set('config', 'PROCESS_LIST', 'PCPCombine')
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2016090400')
+    config.set('config', 'INIT_END', '2016090400')
+    config.set('config', 'INIT_INCREMENT', '6H')
+    config.set('config', 'LEAD_SEQ', '3, 5')
+    config.set('config', 'FCST_PCP_COMBINE_RUN', True)
+    config.set('config', 'FCST_PCP_COMBINE_METHOD', 'ADD')
+    config.set('config', 'FCST_PCP_COMBINE_CONSTANT_INIT', True)
+    config.set('config', 'FCST_PCP_COMBINE_USE_ROLLING_ACCUM', True)
+    config.set('config', 'FCST_PCP_COMBINE_INPUT_DIR', input_dir)
+    config.set('config', 'FCST_PCP_COMBINE_INPUT_TEMPLATE',
+               '{init?fmt=%Y%m%d%H}_f{lead?fmt=%HHH}.nc')
+    config.set('config', 'FCST_PCP_COMBINE_INPUT_ACCUMS', '1')
+    config.set('config', 'FCST_PCP_COMBINE_INPUT_NAMES', 'APCP_01')
+    config.set('config', 'FCST_PCP_COMBINE_OUTPUT_DIR', output_dir)
+    config.set('config', 'FCST_PCP_COMBINE_OUTPUT_TEMPLATE',
+               'out.{init?fmt=%Y%m%d%H}_f{lead?fmt=%HHH}_A{level?fmt=%HH}h.nc')
+    config.set('config', 'FCST_PCP_COMBINE_OUTPUT_ACCUM', '3H')
+    config.set('config', 'FCST_PCP_COMBINE_OUTPUT_NAME', 'APCP_03')
+
+    for lead in range(1, 6):
+        open(os.path.join(input_dir, f'2016090400_f{lead:03d}.nc'),
+             'w').close()
+
+    # previous output of a different run valid at the same time as the
+    # previous output of this run must not be used
+    other_run = os.path.join(output_dir, 'out.2016090323_f005_A03h.nc')
+    open(other_run, 'w').close()
+    prev_output = os.path.join(output_dir, 'out.2016090400_f004_A03h.nc')
+    open(prev_output, 'w').close()
+    open(os.path.join(output_dir, 'out.2016090400_f002_A03h.nc'),
+         'w').close()
+
+    wrapper = PCPCombineWrapper(config)
+    assert wrapper.isOK
+
+    all_cmds = wrapper.run_all_times()
+
+    app_path = os.path.join(config.getdir('MET_BIN_DIR'), wrapper.app_name)
+    verbosity = f"-v {wrapper.c_dict['VERBOSITY']}"
+    in_fmt = '\'name="APCP_01";\''
+    out_fmt = '\'name="APCP_03"; level="(*,*)";\''
+    partial_file = os.path.join(config.getdir('STAGING_DIR'),
+                                'pcp_combine_rolling',
+                                'fcst_20160904050000_7200s.nc')
+    # lead 3 cannot use the previous lead because its window would start
+    # before the initialization time, so all inputs are added
+    expected_cmds = [
+        (f"{app_path} {verbosity} -add "
+         f"{input_dir}/2016090400_f003.nc {in_fmt} "
+         f"{input_dir}/2016090400_f002.nc {in_fmt} "
+         f"{input_dir}/2016090400_f001.nc {in_fmt} "
+         f'-name "APCP_03" {output_dir}/out.2016090400_f003_A03h.nc'),
+        (f"{app_path} {verbosity} -subtract {prev_output} {out_fmt} "
+         f"{input_dir}/2016090400_f002.nc {in_fmt} "
+         f'-name "APCP_03" {partial_file}'),
+        (f"{app_path} {verbosity} -add {partial_file} {out_fmt} "
+         f"{input_dir}/2016090400_f005.nc {in_fmt} "
+         f'-name "APCP_03" {output_dir}/out.2016090400_f005_A03h.nc'),
+    ]
+    assert [cmd for cmd, _ in all_cmds] == expected_cmds
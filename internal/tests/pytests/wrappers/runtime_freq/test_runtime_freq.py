@@ -6,6 +6,7 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 from metplus.wrappers.runtime_freq_wrapper import RuntimeFreqWrapper
+from metplus.wrappers.runtime_freq_wrapper import TimeIndexedFileList
 
 
 @pytest.mark.parametrize(
@@ -107,3 +108,83 @@ def test_compare_time_info(metplus_config, runtime, filetime, expected_result):
     wrapper = RuntimeFreqWrapper(config)
     actual_result = wrapper.compare_time_info(runtime, filetime)
     assert actual_result == expected_result
+
+
+def _get_file_dicts():
+    file_dicts = []
+    leads = [0, 10800, relativedelta(hours=6), relativedelta(months=1)]
+    for day in range(1, 4):
+        init = datetime(2019, 1, day, 12)
+        for lead in leads:
+            valid = init + (relativedelta(seconds=lead)
+                            if isinstance(lead, int) else lead)
+            for storm_id in ('AL01', 'AL02'):
+                file_dicts.append({
+                    'time_info': {'init': init, 'valid': valid, 'lead': lead,
+                                  'storm_id': storm_id},
+                    'input0': [f'{init:%Y%m%d%H}_{valid:%Y%m%d%H}_{storm_id}'],
+                })
+    return file_dicts
+
+
+@pytest.mark.parametrize(
+    'runtime', [
+        {'init': '*', 'valid': '*', 'lead': '*'},
+        {'init': datetime(2019, 1, 2, 12), 'valid': '*', 'lead': '*'},
+        {'init': '*', 'valid': datetime(2019, 1, 2, 18), 'lead': '*'},
+        {'init': '*', 'valid': '*', 'lead': 21600},
+        {'init': '*', 'valid': '*', 'lead': relativedelta(hours=3)},
+        {'init': '*', 'valid': '*', 'lead': relativedelta(months=1)},
+        {'init': datetime(2019, 1, 3, 12), 'valid': '*', 'lead': 0},
+        {'init': datetime(2019, 1, 3, 12), 'valid': '*', 'lead': 7200},
+        {'init': datetime(2019, 1, 4, 12), 'valid': '*', 'lead': '*'},
+    ]
+)
+@pytest.mark.wrapper
+def test_time_indexed_file_list_find(metplus_config, runtime):
+    wrapper = RuntimeFreqWrapper(metplus_config)
+    file_dicts = _get_file_dicts()
+    expected = [index for index, file_dict in enumerate(file_dicts)
+                if wrapper.compare_time_info(runtime, file_dict['time_info'])]
+
+    indexed_files = TimeIndexedFileList(file_dicts)
+    assert indexed_files == file_dicts
+    actual = [index for index in indexed_files.find(runtime,
+                                                    wrapper.TIME_INDEX_KEYS)
+              if wrapper.compare_time_info(runtime,
+                                           indexed_files[index]['time_info'])]
+    assert actual == expected
+
+    # storm ID narrows search when included in keys
+    runtime = dict(runtime, storm_id='AL02')
+    keys = wrapper.TIME_INDEX_KEYS + ('storm_id',)
+    storm_positions = indexed_files.find(runtime, keys)
+    assert set(storm_positions) >= {index for index in expected
+                                    if index % 2 == 1}
+    assert all(index % 2 == 1 for index in storm_positions)
+
+
+@pytest.mark.wrapper
+def test_subset_input_files_leads(metplus_config, tmp_path_factory):
+    wrapper = RuntimeFreqWrapper(metplus_config)
+    wrapper.app_name = 'test'
+    wrapper.c_dict['ALL_FILES'] = _get_file_dicts()
+    output_dir = tmp_path_factory.mktemp('file_lists')
+    time_info = {'init': '*', 'valid': '*', 'lead': '*'}
+    list_file_dict = wrapper.subset_input_files(time_info,
+                                                output_dir=output_dir,
+                                                leads=[10800, 0])
+    assert isinstance(wrapper.c_dict['ALL_FILES'], TimeIndexedFileList)
+    with open(list_file_dict['input0'], 'r') as file_handle:
+        actual = file_handle.read().splitlines()
+
+    # files are listed in the order they were found
+    assert actual == [
+        'file_list',
+        '2019010112_2019010112_AL01', '2019010112_2019010112_AL02',
+        '2019010112_2019010115_AL01', '2019010112_2019010115_AL02',
+        '2019010212_2019010212_AL01', '2019010212_2019010212_AL02',
+        '2019010212_2019010215_AL01', '2019010212_2019010215_AL02',
+        '2019010312_2019010312_AL01', '2019010312_2019010312_AL02',
+        '2019010312_2019010315_AL01', '2019010312_2019010315_AL02',
+    ]
@@ -6,6 +6,7 @@ from dateutil.relativedelta import relativedelta
 
 from metplus.util import ti_get_seconds_from_lead, sub_var_list
 from metplus.wrappers.series_analysis_wrapper import SeriesAnalysisWrapper
+import metplus.wrappers.series_analysis_wrapper as series_analysis_module
 
 fcst_dir = '/some/fcst/dir'
 obs_dir = '/some/obs/dir'
@@ -452,6 +453,40 @@ def test_get_fcst_file_info(metplus_config):
     assert end == expected_end
 
 
+@pytest.mark.wrapper_a
+def test_get_parsed_file_list(metplus_config, tmp_path_factory, monkeypatch):
+    wrapper = series_analysis_wrapper(metplus_config)
+    template = '/fake/fcst_{init?fmt=%Y%m%d%H}_F{lead?fmt=%3H}.nc'
+    file_list_path = os.path.join(tmp_path_factory.mktemp('sa'), 'files')
+    with open(file_list_path, 'w') as file_handle:
+        file_handle.write('file_list\n'
+                          '/fake/fcst_2005080700_F012.nc\n'
+                          '/fake/fcst_2005080700_F006.nc\n'
+                          '/fake/no_time_info.nc\n')
+
+    file_list = wrapper._get_parsed_file_list(file_list_path, template)
+    assert len(file_list.files) == 3
+    assert [item['lead'] for item in file_list.time_info] == [43200, 21600]
+    assert file_list.get_lead_range() == ('006', '012')
+
+    # same object is returned until the file list file changes
+    assert wrapper._get_parsed_file_list(file_list_path, template) is file_list
+    with open(file_list_path, 'a') as file_handle:
+        file_handle.write('/fake/fcst_2005080700_F018.nc\n')
+    file_list = wrapper._get_parsed_file_list(file_list_path, template)
+    assert file_list.get_lead_range() == ('006', '018')
+
+    # least recently used file lists are removed when the cache is full
+    monkeypatch.setattr(series_analysis_module,
+                        'PARSED_FILE_LIST_CACHE_SIZE', 2)
+    other_template = '/fake/{init?fmt=%Y%m%d%H}_F{lead?fmt=%3H}.nc'
+    wrapper._get_parsed_file_list(file_list_path, other_template)
+    assert wrapper._get_parsed_file_list(file_list_path, template) is file_list
+    wrapper._get_parsed_file_list(file_list_path, '/fake/{init?fmt=%Y}.nc')
+    assert len(wrapper._parsed_file_lists) == 2
+    assert wrapper._get_parsed_file_list(file_list_path, template) is file_list
+
+
 @pytest.mark.wrapper_a
 def test_get_storms_list(metplus_config):
     """Verify that the expected number of storms
@@ -918,6 +953,39 @@ def test_get_netcdf_min_max(metplus_config):
     assert max == expected_max
 
 
+@pytest.mark.wrapper_a
+def test_get_netcdf_min_max_values(metplus_config, tmp_path_factory):
+    netCDF4 = pytest.importorskip('netCDF4')
+    import numpy as np
+
+    filepath = os.path.join(tmp_path_factory.mktemp('series'), 'series.nc')
+    with netCDF4.Dataset(filepath, 'w') as nc_file:
+        nc_file.createDimension('lat', 2)
+        nc_file.createDimension('lon', 3)
+        total = nc_file.createVariable('series_cnt_TOTAL', 'f4',
+                                       ('lat', 'lon'), fill_value=-9999.)
+        total[:] = np.array([[1, 2, 3], [4, 5, -9999.]])
+        rmse = nc_file.createVariable('series_cnt_RMSE', 'f4', ('lat', 'lon'))
+        rmse[:] = np.array([[np.nan, -2, 3], [4, 0.5, 10]])
+        empty = nc_file.createVariable('series_cnt_FBAR', 'f4',
+                                       ('lat', 'lon'), fill_value=-9999.)
+        empty[:] = np.full((2, 3), -9999.)
+
+    wrapper = series_analysis_wrapper(metplus_config)
+    names = ['series_cnt_TOTAL', 'series_cnt_RMSE', 'series_cnt_FBAR',
+             'series_cnt_OBAR']
+    min_max = wrapper._get_netcdf_min_max_values(filepath, names)
+    assert min_max == {
+        'series_cnt_TOTAL': (1, 5),
+        'series_cnt_RMSE': (-2, 10),
+        'series_cnt_FBAR': (None, None),
+        'series_cnt_OBAR': (None, None),
+    }
+    assert wrapper._get_netcdf_min_max(filepath, 'series_cnt_RMSE') == (-2, 10)
+    assert (wrapper._get_netcdf_min_max('/fake/file.nc', 'series_cnt_RMSE')
+            == (None, None))
+
+
 @pytest.mark.wrapper_a
 def test_get_config_file(metplus_config):
     fake_config_name = '/my/config/file'
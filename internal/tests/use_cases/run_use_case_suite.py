@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+
+"""
+Program Name: run_use_case_suite.py
+Contact(s): George McCabe
+Abstract: Runs METplus use cases in parallel. Use cases are grouped by their
+ additional Python requirements (see METplusUseCasesByRequirement) and run
+ concurrently as long as the number of running use cases and the sum of their
+ estimated memory usage stay within the requested budget. The wall time and
+ peak resident set size (RSS) of each use case is recorded in a JSON file.
+ If a baseline directory is provided, the output of each use case is compared
+ to the baseline using diff_util and the wall time is compared to the results
+ file from the baseline run.
+Usage: run_use_case_suite.py <categories> [subset] --output_base <dir>
+ [--baseline <dir>] [--jobs <n>] [--max_memory <MB>]
+<categories> comma-separated list of use case categories or 'all'
+[subset] (optional) comma-separated list of use case indices, i.e. 0-3,5
+Condition codes: 0 on success, 1 if any use case failed, differed from the
+ baseline, or ran slower than allowed by --max_slowdown
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import subprocess
+from os.path import dirname, realpath
+from concurrent.futures import ProcessPoolExecutor
+
+metplus_home = dirname(dirname(dirname(dirname(realpath(__file__)))))
+
+# add METplus directory to sys path so the test suite can be found
+sys.path.insert(0, metplus_home)
+
+from internal.tests.use_cases.metplus_use_case_suite import METplusUseCaseSuite
+from metplus.util.string_manip import expand_int_string_to_list
+
+use_case_dir = os.path.join(metplus_home, 'parm', 'use_cases')
+
+# name of results file written to the output directory
+RESULTS_FILENAME = 'use_case_results.json'
+
+# name of environment used for use cases that do not list an *_env requirement
+METPLUS_BASE_ENV = 'metplus_base'
+
+# memory in MB to assume for a use case that has no previous results
+DEFAULT_MEMORY_PER_JOB = 2048
+
+# use cases that ran faster than this in the baseline are not checked for
+# slowdown because their run time is dominated by startup noise
+MIN_SLOWDOWN_SECONDS = 10
+
+# seconds to sleep between checks for use cases that have finished
+POLL_SECONDS = 0.5
+
+
+class UseCaseJob:
+    """! Single use case to run with the command, environment, and estimates
+    used to schedule it and the results that are recorded after it runs.
+    """
+
+    def __init__(self, use_case, category, requirements, command, env,
+                 output_dir, log_file):
+        """! Create use case job.
+
+        @param use_case METplusUseCase to run
+        @param category name of use case category, i.e. medium_range
+        @param requirements list of Python requirements of use case
+        @param command list of command line arguments to run
+        @param env dictionary of environment variables to run the command with
+        @param output_dir directory that the use case writes output
+        @param log_file file to write stdout and stderr of command
+        """
+        self.name = use_case.name
+        self.category = category
+        self.requirements = requirements
+        self.env_name = get_env_name(requirements)
+        self.command = command
+        self.env = env
+        self.output_dir = output_dir
+        self.log_file = log_file
+
+        self.est_memory = DEFAULT_MEMORY_PER_JOB
+        self.est_time = 0.0
+        self.prev_time = None
+
+        self.start_time = None
+        self.returncode = None
+        self.wall_time = None
+        self.peak_rss = None
+        self.diffs = None
+        self.slowdown = None
+
+    @property
+    def key(self):
+        return f'{self.category}/{self.name}'
+
+    def set_estimates(self, previous):
+        """! Use results from a previous run to estimate the memory and time
+        needed to run the use case.
+
+        @param previous dictionary of results for the use case or None
+        """
+        if not previous:
+            return
+        if previous.get('peak_rss_mb'):
+            # add 10% margin to previous peak memory usage
+            self.est_memory = previous['peak_rss_mb'] * 1.1
+        if previous.get('wall_time'):
+            self.est_time = previous['wall_time']
+            self.prev_time = previous['wall_time']
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'category': self.category,
+            'requirements': self.requirements,
+            'command': shlex.join(self.command),
+            'returncode': self.returncode,
+            'wall_time': self.wall_time,
+            'peak_rss_mb': self.peak_rss,
+            'diffs': self.diffs,
+            'slowdown': self.slowdown,
+        }
+
+
+def get_env_name(requirements):
+    """! Get name of Python environment needed to run a use case. If a
+    requirement ending with _env is set, the text before _env is used.
+
+    @param requirements list of Python requirements of use case
+    @returns name of environment
+    """
+    use_env = [item for item in requirements if item.endswith('_env')]
+    if use_env:
+        return use_env[0].replace('_env', '')
+    return METPLUS_BASE_ENV
+
+
+def get_env_settings(requirements, env_bin_dir):
+    """! Get environment variables and config overrides needed to run a use
+    case in the Python environment that provides its requirements.
+
+    @param requirements list of Python requirements of use case
+    @param env_bin_dir template for directory containing the python3
+     executable of each environment, i.e. /usr/local/conda/envs/{env}/bin, or
+     None to use the python3 from the current PATH for all use cases
+    @returns tuple of environment dictionary and list of config overrides
+    """
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(
+        [metplus_home, os.path.join(metplus_home, 'ush')] +
+        [item for item in [env.get('PYTHONPATH')] if item]
+    )
+
+    env_name = get_env_name(requirements)
+    python_exe = 'python3'
+    if env_bin_dir:
+        bin_dir = env_bin_dir.format(env=env_name)
+        env['PATH'] = f"{bin_dir}{os.pathsep}{env.get('PATH', '')}"
+        python_exe = os.path.join(bin_dir, 'python3')
+
+    # if py_embed listed in requirements and using a Python
+    # environment that differs from the MET env, set MET_PYTHON_EXE
+    overrides = []
+    if 'py_embed' in requirements and env_name != METPLUS_BASE_ENV:
+        overrides.append(f'user_env_vars.MET_PYTHON_EXE={python_exe}')
+
+    return env, overrides
+
+
+def get_jobs(categories, subset, output_base, config_args, env_bin_dir):
+    """! Build list of use case jobs to run from use case categories.
+
+    @param categories comma-separated list of use case categories or 'all'
+    @param subset list of use case indices or None to run all
+    @param output_base directory to write output of all use cases
+    @param config_args list of config files or overrides to add to each case
+    @param env_bin_dir template for Python environment bin directory
+    @returns list of UseCaseJob ordered by requirement group
+    """
+    test_suite = METplusUseCaseSuite()
+    if categories == 'all':
+        categories = list(test_suite.all_cases.keys())
+    test_suite.add_use_case_groups(categories, subset)
+
+    run_metplus = os.path.join(metplus_home, 'ush', 'run_metplus.py')
+    jobs = []
+    for group_name, use_cases_by_req in test_suite.category_groups.items():
+        category = group_name.split('-')[0]
+        for use_case_by_requirement in use_cases_by_req:
+            reqs = use_case_by_requirement.requirements
+            env, overrides = get_env_settings(reqs, env_bin_dir)
+            for use_case in use_case_by_requirement.use_cases:
+                output_dir = os.path.join(output_base, category, use_case.name)
+                command = [run_metplus]
+                for config_arg in use_case.config_args:
+                    if config_arg.endswith('.conf'):
+                        config_arg = os.path.join(use_case_dir, config_arg)
+                    command.append(config_arg)
+                command.extend(config_args)
+                command.extend(overrides)
+                command.append(f'config.OUTPUT_BASE={output_dir}')
+                log_file = os.path.join(output_base, 'logs', category,
+                                        f'{use_case.name}.log')
+                jobs.append(UseCaseJob(use_case, category, reqs, command, env,
+                                       output_dir, log_file))
+    return jobs
+
+
+def read_results(results_file):
+    """! Read results from a previous run.
+
+    @param results_file path to JSON results file
+    @returns dictionary with {category}/{name} as key and dictionary of
+     results as the value, or an empty dictionary if file does not exist
+    """
+    if not results_file or not os.path.exists(results_file):
+        return {}
+    with open(results_file, 'r') as file_handle:
+        results = json.load(file_handle)
+    return {f"{item['category']}/{item['name']}": item for item in results}
+
+
+def write_results(jobs, results_file):
+    """! Write results of all use case jobs to a JSON file.
+
+    @param jobs list of UseCaseJob
+    @param results_file path to write
+    """
+    os.makedirs(dirname(results_file), exist_ok=True)
+    with open(results_file, 'w') as file_handle:
+        json.dump([job.to_dict() for job in jobs], file_handle, indent=2)
+
+
+def _get_max_memory():
+    """! Get 80% of physical memory in MB to use as the default budget."""
+    try:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+    return total / 1024 / 1024 * 0.8
+
+
+def _get_peak_rss_mb(rusage):
+    """! Get peak RSS of process in MB from rusage. ru_maxrss is in kilobytes
+    on Linux and bytes on macOS.
+    """
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss / 1024 / 1024
+    return rusage.ru_maxrss / 1024
+
+
+def _get_next_job(pending, running, max_jobs, max_memory):
+    """! Get index of the next job that fits within the budget. Jobs are
+    considered in order so use cases that share requirements run together.
+    A job that does not fit into the memory budget is only started if
+    nothing else is running so that it cannot block the suite forever.
+
+    @param pending list of UseCaseJob that have not started
+    @param running dictionary of UseCaseJob that are running
+    @param max_jobs maximum number of jobs to run at once
+    @param max_memory maximum sum of estimated memory in MB or None
+    @returns index into pending list or None if no job can start
+    """
+    if not pending or len(running) >= max_jobs:
+        return None
+    if not running or max_memory is None:
+        return 0
+
+    used = sum(job.est_memory for job, _, _ in running.values())
+    for index, job in enumerate(pending):
+        if used + job.est_memory <= max_memory:
+            return index
+    return None
+
+
+def _wait_for_job(running):
+    """! Wait until one of the running use cases finishes. Only the processes
+    of running use cases are waited on so that other child processes of
+    this process are not reaped.
+
+    @param running dictionary of running jobs keyed by process id
+    @returns tuple of process id, exit status, and resource usage from
+     os.wait4
+    """
+    while True:
+        for pid in list(running):
+            result = os.wait4(pid, os.WNOHANG)
+            if result[0] == pid:
+                return result
+        time.sleep(POLL_SECONDS)
+
+
+def run_jobs(jobs, max_jobs, max_memory=None):
+    """! Run use case jobs in parallel within a job count and memory budget.
+    Processes are reaped with os.wait4 to obtain the peak RSS of each
+    use case, which includes the MET tools that it called.
+
+    @param jobs list of UseCaseJob to run
+    @param max_jobs maximum number of jobs to run at once
+    @param max_memory maximum sum of estimated memory in MB or None
+    """
+    # start longest running use cases first within each environment group
+    group_order = {}
+    for job in jobs:
+        group_order.setdefault(job.env_name, len(group_order))
+    pending = sorted(jobs, key=lambda job: (group_order[job.env_name],
+                                            -job.est_time))
+    running = {}
+    total = len(pending)
+    while pending or running:
+        index = _get_next_job(pending, running, max_jobs, max_memory)
+        if index is not None:
+            job = pending.pop(index)
+            os.makedirs(dirname(job.log_file), exist_ok=True)
+            log_handle = open(job.log_file, 'w')
+            print(f"Starting {job.key} ({job.env_name})")
+            process = subprocess.Popen(job.command, env=job.env,
+                                       stdout=log_handle,
+                                       stderr=subprocess.STDOUT)
+            running[process.pid] = (job, process, log_handle)
+            job.start_time = time.monotonic()
+            continue
+
+        pid, status, rusage = _wait_for_job(running)
+        job, process, log_handle = running.pop(pid)
+        log_handle.close()
+        job.returncode = os.waitstatus_to_exitcode(status)
+        process.returncode = job.returncode
+        job.wall_time = round(time.monotonic() - job.start_time, 3)
+        job.peak_rss = round(_get_peak_rss_mb(rusage), 1)
+        result = 'FAILED' if job.returncode else 'Finished'
+        done = total - len(pending) - len(running)
+        print(f"{result} {job.key} [{done}/{total}] in {job.wall_time}s "
+              f"with peak RSS {job.peak_rss} MB")
+
+
+def _compare_output(dir_a, dir_b):
+    from metplus.util.diff_util import compare_dir
+    return [list(item) for item in compare_dir(dir_a, dir_b)]
+
+
+def compare_to_baseline(jobs, output_base, baseline, max_jobs,
+                        max_slowdown=None):
+    """! Compare output of each use case that ran successfully to the
+    baseline output using diff_util and compare wall time to the baseline
+    results file.
+
+    @param jobs list of UseCaseJob that have run
+    @param output_base directory containing output of current run
+    @param baseline directory containing output of baseline run
+    @param max_jobs maximum number of comparisons to run at once
+    @param max_slowdown (optional) maximum ratio of wall time to baseline
+     wall time that is allowed
+    """
+    compare_jobs = [job for job in jobs if job.returncode == 0]
+    with ProcessPoolExecutor(max_workers=max_jobs) as executor:
+        futures = {
+            job.key: executor.submit(
+                _compare_output,
+                job.output_dir.replace(output_base, baseline, 1),
+                job.output_dir
+            )
+            for job in compare_jobs
+        }
+    for job in compare_jobs:
+        job.diffs = futures[job.key].result()
+        job.slowdown = get_slowdown(job, max_slowdown)
+
+
+def get_slowdown(job, max_slowdown):
+    """! Get how many times longer a use case took than in the baseline run
+    if it is more than allowed. Use cases that ran quickly in the baseline
+    are not checked.
+
+    @param job UseCaseJob that has run
+    @param max_slowdown maximum ratio of wall time to baseline wall time
+     that is allowed or None to skip check
+    @returns ratio rounded to 2 decimal places or None if the use case was
+     not slower than allowed
+    """
+    if not max_slowdown or not job.prev_time:
+        return None
+    if job.prev_time < MIN_SLOWDOWN_SECONDS:
+        return None
+    ratio = job.wall_time / job.prev_time
+    if ratio > max_slowdown:
+        return round(ratio, 2)
+    return None
+
+
+def print_summary(jobs):
+    """! Print use cases that failed, differ from baseline, or ran slower.
+
+    @param jobs list of UseCaseJob that have run
+    @returns True if all use cases passed, False otherwise
+    """
+    passed = True
+    for job in sorted(jobs, key=lambda job: -job.wall_time):
+        print(f"{job.wall_time:10.1f}s {job.peak_rss:10.1f} MB  {job.key}")
+
+    for job in jobs:
+        if job.returncode:
+            print(f"ERROR: Use case failed: {job.key} - see {job.log_file}")
+            passed = False
+        if job.diffs:
+            print(f"ERROR: Use case output differs from baseline: {job.key}")
+            for diff in job.diffs:
+                print(f"  {' '.join(str(item) for item in diff if item)}")
+            passed = False
+        if job.slowdown:
+            print(f"ERROR: Use case took {job.slowdown}x baseline time: "
+                  f"{job.key}")
+            passed = False
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('categories', action='store')
+    parser.add_argument('subset', action='store', nargs='?')
+    parser.add_argument('--output_base', action='store',
+                        default=os.environ.get('METPLUS_TEST_OUTPUT_BASE'))
+    parser.add_argument('--baseline', action='store', required=False,
+                        help='directory containing output of previous run')
+    parser.add_argument('--jobs', action='store', type=int,
+                        default=os.cpu_count(),
+                        help='maximum number of use cases to run at once')
+    parser.add_argument('--max_memory', action='store', type=float,
+                        default=_get_max_memory(),
+                        help='memory budget in MB for running use cases')
+    parser.add_argument('--max_slowdown', action='store', type=float,
+                        required=False,
+                        help='fail if wall time exceeds baseline by factor')
+    parser.add_argument('--env_bin_dir', action='store', required=False,
+                        help='template for bin dir of Python environments, '
+                             'i.e. /usr/local/conda/envs/{env}/bin')
+    parser.add_argument('--config', action='append', default=[],
+                        help='config file or override to add to each case')
+    args = parser.parse_args(argv)
+
+    if not args.output_base:
+        print("ERROR: Must set --output_base or METPLUS_TEST_OUTPUT_BASE")
+        return 1
+
+    config_args = list(args.config)
+    test_settings_conf = os.environ.get('METPLUS_TEST_SETTINGS_CONF')
+    if test_settings_conf:
+        config_args.insert(0, test_settings_conf)
+
+    subset = expand_int_string_to_list(args.subset) if args.subset else None
+    output_base = os.path.abspath(args.output_base)
+    jobs = get_jobs(args.categories, subset, output_base, config_args,
+                    args.env_bin_dir)
+    if not jobs:
+        print("ERROR: No use cases specified")
+        return 1
+
+    previous = {}
+    if args.baseline:
+        args.baseline = os.path.abspath(args.baseline)
+        previous = read_results(os.path.join(args.baseline, RESULTS_FILENAME))
+    for job in jobs:
+        job.set_estimates(previous.get(job.key))
+
+    print(f"Running {len(jobs)} use cases with up to {args.jobs} at once")
+    run_jobs(jobs, args.jobs, args.max_memory)
+
+    if args.baseline:
+        compare_to_baseline(jobs, output_base, args.baseline, args.jobs,
+                            args.max_slowdown)
+
+    write_results(jobs, os.path.join(output_base, RESULTS_FILENAME))
+
+    if not print_summary(jobs):
+        return 1
+
+    print("\nINFO: All use cases returned 0. Success!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,9 @@ import os
 import re
 import sys
 import logging
+import marshal
+import hashlib
+import weakref
 from datetime import datetime, timezone
 import time
 import shutil
@@ -81,6 +84,34 @@ OLD_BASE_CONFS = [
     'metplus_logging.conf'
 ]
 
+# directory to store parsed config files from PARM_BASE so they are not
+# parsed again by later runs unless they change. Set METPLUS_CONF_CACHE_DIR
+# environment variable to an empty string to disable
+CONF_CACHE_DIR = os.environ.get(
+    'METPLUS_CONF_CACHE_DIR',
+    os.path.join(os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'),
+                                             '.cache')),
+                 'metplus', 'conf')
+)
+
+# incremented if the format of the parsed config cache files changes
+_CONF_CACHE_VERSION = 1
+
+# parsed config files read by this process keyed by path
+_PARSED_CONFS = {}
+
+# index of VAR<n> config variables and field info read from them for each
+# config object, cleared when config changes
+_FIELD_INFO_CACHE = weakref.WeakKeyDictionary()
+
+# matches config variables that describe a field, i.e. FCST_GRID_STAT_VAR1_NAME
+# groups are prefix (FCST_GRID_STAT_), index (1), and suffix (NAME)
+_VAR_KEY_REGEX = re.compile(r'(.*?)VAR(\d+)_(.+)')
+
+# start of suffixes of config variables that define a field
+_VAR_NAME_SUFFIXES = ('NAME', 'INPUT_FIELD_NAME', 'FIELD_NAME')
+
 # set all loggers to use UTC
 logging.Formatter.converter = time.gmtime
 
@@ -217,24 +248,24 @@ def launch(config_list):
                datetime.now().strftime('%Y%m%d%H%M%S'))
 
     config_format_list = []
-    # Read in and parse all the conf files and overrides
+    # Read in and parse all the conf files and overrides, then merge them
+    # and set all of the values at once
+    merged_sections = {}
     for config_item in config_list:
         if isinstance(config_item, str):
             print(f"Parsing config file: {config_item}")
-            config.read(config_item)
+            sections = _read_conf_file(config_item)
             config_format_list.append(config_item)
         else:
             # set explicit config override
             section, key, value = config_item
-            if not config.has_section(section):
-                config.add_section(section)
-
             print(f"Parsing override: [{section}] {key} = {value}")
-            config.set(section, key, value)
+            sections = {section: {key: value}}
             config_format_list.append(f'{section}.{key}={value}')
 
-        # move all config variables from old sections into the [config] section
-        config._move_all_to_config_section()
+        _merge_conf_sections(merged_sections, sections)
+
+    config.read_dict(merged_sections)
 
     # save list of user configuration files in a variable
     config.set('config', 'CONFIG_INPUT', ','.join(config_format_list))
@@ -267,6 +298,146 @@ def launch(config_list):
     return config
 
 
+def _merge_conf_sections(merged_sections, sections):
+    """! Add values from a config file or override to the values from the
+    items that were processed before it. Values in sections that are no
+    longer supported, i.e. [dir], are moved into the [config] section and
+    take precedence over values in [config] from the same item.
+
+    @param merged_sections dictionary of sections with a dictionary of
+     values for each section that is modified
+    @param sections dictionary of sections to add
+    """
+    for section, values in sections.items():
+        if section in METplusConfig.OLD_SECTIONS:
+            continue
+        merged_sections.setdefault(section, {}).update(values)
+
+    for section in METplusConfig.OLD_SECTIONS:
+        if section in sections:
+            merged_sections.setdefault('config', {}).update(sections[section])
+
+
+def _read_conf_file(filepath):
+    """! Read a config file into a dictionary. The result is reused if the
+    same file is read again by this process and it has not changed. Config
+    files from PARM_BASE are also cached in CONF_CACHE_DIR so that later runs
+    do not need to parse them again.
+
+    @param filepath path to config file
+    @returns dictionary of sections with a dictionary of values for each
+     section. The dictionary should not be modified
+    """
+    stat_info = os.stat(filepath)
+    file_key = (stat_info.st_mtime_ns, stat_info.st_size)
+    cached = _PARSED_CONFS.get(filepath)
+    if cached and cached[0] == file_key:
+        return cached[1]
+
+    cache_file = _get_conf_cache_file(filepath)
+    sections = _load_conf_cache(cache_file, filepath, file_key)
+    if sections is None:
+        sections = _parse_conf_file(filepath)
+        _write_conf_cache(cache_file, filepath, file_key, sections)
+
+    _PARSED_CONFS[filepath] = (file_key, sections)
+    return sections
+
+
+def _parse_conf_file(filepath):
+    """! Parse a config file using the same settings as METplusConfig.
+
+    @param filepath path to config file
+    @returns dictionary of sections with a dictionary of values for each
+     section. Values from the [DEFAULT] section are stored under DEFAULT
+    """
+    parser = ConfigParser(strict=False,
+                          inline_comment_prefixes=(';',),
+                          interpolation=None)
+    parser.optionxform = str
+    with open(filepath, 'r') as file_handle:
+        parser.read_file(file_handle, filepath)
+
+    sections = {}
+    defaults = parser.defaults()
+    if defaults:
+        sections[parser.default_section] = dict(defaults)
+    for section in parser.sections():
+        sections[section] = {
+            key: value for key, value in parser.items(section, raw=True)
+            if defaults.get(key) != value
+        }
+    return sections
+
+
+def _get_conf_cache_file(filepath):
+    """! Get path to store the parsed contents of a config file.
+
+    @param filepath path to config file
+    @returns path to cache file or None if the config file should not be
+     cached, i.e. it is not under PARM_BASE or CONF_CACHE_DIR is not set
+    """
+    if not CONF_CACHE_DIR:
+        return None
+
+    real_path = os.path.realpath(filepath)
+    parm_base = os.path.join(os.path.realpath(PARM_BASE), '')
+    if not real_path.startswith(parm_base):
+        return None
+
+    name = hashlib.sha1(real_path.encode('utf-8')).hexdigest()
+    return os.path.join(CONF_CACHE_DIR, f'{name}.marshal')
+
+
+def _load_conf_cache(cache_file, filepath, file_key):
+    """! Read the parsed contents of a config file from the cache.
+
+    @param cache_file path to cache file or None
+    @param filepath path to config file
+    @param file_key tuple of modification time and size of the config file
+    @returns dictionary of sections or None if the cache could not be read
+     or the config file changed since the cache was written
+    """
+    if not cache_file:
+        return None
+
+    try:
+        with open(cache_file, 'rb') as file_handle:
+            version, path, cached_key, sections = marshal.load(file_handle)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if (version != _CONF_CACHE_VERSION or path != filepath or
+            tuple(cached_key) != file_key):
+        return None
+    return sections
+
+
+def _write_conf_cache(cache_file, filepath, file_key, sections):
+    """! Write the parsed contents of a config file to the cache. The file is
+    written to a temporary file that is renamed so other runs never read a
+    partial file. Errors are ignored because the cache is optional.
+
+    @param cache_file path to cache file or None
+    @param filepath path to config file
+    @param file_key tuple of modification time and size of the config file
+    @param sections dictionary of sections to write
+    """
+    if not cache_file:
+        return
+
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, 'wb') as file_handle:
+            marshal.dump((_CONF_CACHE_VERSION, filepath, file_key, sections),
+                         file_handle)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
 def _set_logvars(config):
     """!Sets and adds the LOG_METPLUS and LOG_TIMESTAMP
        to the config object. If LOG_METPLUS was already defined by the
@@ -288,6 +459,15 @@ def _set_logvars(config):
 
     log_filenametimestamp = date_t.strftime(log_timestamp_template)
 
+    # add shard to timestamp so each shard of a run writes separate
+    # log files, final conf file, and all_commands file
+    shard_suffix = None
+    if config.getint('config', 'SHARD_COUNT', 1) > 1:
+        shard_index = config.getint('config', 'SHARD_INDEX', 0)
+        shard_suffix = f'shard{shard_index}'
+        log_filenametimestamp = get_shard_log_timestamp(log_filenametimestamp,
+                                                        shard_index)
+
     # add LOG_TIMESTAMP to the final configuration file
     config.set('config', 'LOG_TIMESTAMP', log_filenametimestamp)
 
@@ -297,6 +477,10 @@ def _set_logvars(config):
         LOG_TIMESTAMP_TEMPLATE=log_filenametimestamp
     )
 
+    # add shard to log file if timestamp is not used in the filename
+    if metplus_log and shard_suffix and shard_suffix not in metplus_log:
+        metplus_log = f'{metplus_log}.{shard_suffix}'
+
     # add log directory to log file path if only filename was provided
     if metplus_log:
         if os.path.basename(metplus_log) == metplus_log:
@@ -309,6 +493,17 @@ def _set_logvars(config):
     config.set('config', 'LOG_METPLUS', metplus_log)
 
 
+def get_shard_log_timestamp(log_timestamp, shard_index):
+    """!Get log timestamp used by a shard of a run.
+
+       @param log_timestamp log timestamp of the run
+       @param shard_index index of the shard
+       @returns log timestamp with shard added
+    """
+    return '.'.join(item for item in (log_timestamp, f'shard{shard_index}')
+                    if item)
+
+
 def get_logger(config):
     """!This function will return a logger with a formatted file handler
     for writing to the LOG_METPLUS and it sets the LOG_LEVEL. If LOG_METPLUS is
@@ -448,6 +643,9 @@ class METplusConfig(ProdConfig):
         conf = ConfigParser(strict=False,
                             inline_comment_prefixes=(';',),
                             interpolation=None) if (conf is None) else conf
+        # incremented when a value changes so that
+        # values computed from the configuration can be cached
+        self.generation = 0
         super().__init__(conf)
         self._cycle = None
         self.run_id = str(uuid.uuid4())[0:8]
@@ -482,21 +680,37 @@ class METplusConfig(ProdConfig):
                 return logging.getLogger('metplus.'+sublog)
         return self._logger
 
-    def _move_all_to_config_section(self):
-        """! Move all configuration variables that are found in the
-             previously supported sections into the config section.
+    def set(self, section, key, value):
+        """! Overrides method in ProdConfig to increment generation if the
+        value of the config variable changes.
+
+        @param section config section
+        @param key config variable name
+        @param value value to set
         """
-        for section in self.OLD_SECTIONS:
-            if not self.has_section(section):
-                continue
+        section, key, value = str(section), str(key), str(value)
+        if (not self._conf.has_option(section, key) or
+                self._conf.get(section, key, raw=True) != value):
+            self.generation += 1
+        super().set(section, key, value)
 
-            all_configs = self.keys(section)
-            for key in all_configs:
-                self.set('config',
-                         key,
-                         super().getraw(section, key))
+    def read(self, source):
+        """! Overrides method in ProdConfig to increment generation.
 
-            self._conf.remove_section(section)
+        @param source the file to read
+        @returns self
+        """
+        self.generation += 1
+        return super().read(source)
+
+    def read_dict(self, dictionary):
+        """! Overrides method in ProdConfig to increment generation.
+
+        @param dictionary dictionary of sections to read
+        @returns self
+        """
+        self.generation += 1
+        return super().read_dict(dictionary)
 
     def move_runtime_configs(self):
         """! Move all config variables that are specific to the current runtime
@@ -521,6 +735,8 @@ class METplusConfig(ProdConfig):
 
             # remove conf from [config] section
             self._conf.remove_option(from_section, key)
+            self._clear_interp_cache(key)
+            self.generation += 1
 
     def remove_current_vars(self):
         """! Remove variables from [config] section that start with CURRENT
@@ -530,6 +746,8 @@ class METplusConfig(ProdConfig):
         for current_var in current_vars:
             if self.has_option('config', current_var):
                 self._conf.remove_option('config', current_var)
+                self._clear_interp_cache(current_var)
+                self.generation += 1
 
     # override get methods to perform additional error checking
     def getraw(self, sec, opt, default='', count=0, sub_vars=True):
@@ -547,16 +765,48 @@ class METplusConfig(ProdConfig):
             @returns Raw string or empty string if function calls itself too
              many times
         """
-        if count >= 10:
-            self.logger.error("Could not resolve getraw - check for circular "
-                              "references in METplus configuration variables")
-            return ''
-
         # if requested section is in the list of sections that are no longer
         # used, look in the [config] section for the variable
         if sec in self.OLD_SECTIONS:
             sec = 'config'
 
+        if not sub_vars or count:
+            return self._getraw(sec, opt, default, count, sub_vars, set())
+
+        # use value from a previous call if the variables it references
+        # have not changed since then
+        try:
+            cache_key = ('getraw', sec, opt, default)
+            value = self._interp_cache.get(cache_key)
+        except TypeError:
+            cache_key = value = None
+        if value is not None:
+            return value
+
+        deps = set()
+        with self:
+            value = self._getraw(sec, opt, default, count, sub_vars, deps)
+            # values that reference environment variables or could not be
+            # resolved are not cached
+            if cache_key is not None and None not in deps:
+                self._cache_value(cache_key, value, [opt] + list(deps))
+        return value
+
+    def _getraw(self, sec, opt, default, count, sub_vars, deps):
+        """! Implementation of getraw that does not use cached values.
+        See getraw for details.
+
+        @param deps set that names of the variables that are referenced are
+         added to. None is added if the value cannot be cached
+        @returns Raw string or empty string if function calls itself too
+         many times
+        """
+        if count >= 10:
+            self.logger.error("Could not resolve getraw - check for circular "
+                              "references in METplus configuration variables")
+            deps.add(None)
+            return ''
+
         in_template = super().getraw(sec, opt, '')
         # if default is set but variable was not, set variable to default value
         if not in_template and default:
@@ -570,13 +820,17 @@ class METplusConfig(ProdConfig):
         # get inner-most tags that could potentially be other variables
         match_list = re.findall(r'\{([^}{]*)\}', in_template)
         for var_name in match_list:
+            deps.add(var_name)
             # check if each tag is an existing METplus config variable
             if self.has_option(sec, var_name):
-                value = self.getraw(sec, var_name, default, count+1)
+                value = self._getraw(sec, var_name, default, count+1,
+                                     sub_vars, deps)
             elif self.has_option('config', var_name):
-                value = self.getraw('config', var_name, default, count+1)
+                value = self._getraw('config', var_name, default, count+1,
+                                     sub_vars, deps)
             elif var_name.startswith('ENV'):
                 # if environment variable, ENV[nameofvar], get nameofvar
+                deps.add(None)
                 value = os.environ.get(var_name[4:-1])
             else:
                 value = None
@@ -927,28 +1181,25 @@ def parse_var_list(config, time_info=None, data_type=None, met_tool=None,
     if data_type == 'BOTH':
         config.logger.error("Cannot request BOTH explicitly in parse_var_list")
         return []
-    if data_type is None and not validate_field_info_configs(config)[0]:
+    if data_type is None and not _are_field_info_configs_valid(config):
         return []
 
     # if specific data type is requested, only get that type
     # otherwise get both FCST and OBS
     data_types = [data_type] if data_type else ['FCST', 'OBS']
 
-    # get indices of VAR<n> items for data type and/or met tool
-    indices = _get_var_name_indices(config, data_types, met_tool)
-    if not indices:
+    # get config variables for each VAR<n> item for data type and/or met tool
+    all_field_configs = _get_all_field_configs(config, data_types, met_tool)
+    if not all_field_configs:
         return []
 
     # list of dictionaries that contain variable/field information
     var_list = []
 
-    # get config name prefixes for each data type to find
-    dt_search_prefixes = _get_all_field_search_prefixes(data_types, met_tool)
-
     # loop over all possible variables and add them to list
-    for index in indices:
-        field_list = _get_field_list(index, data_types, dt_search_prefixes,
-                                     config, time_info)
+    for index, dt_field_configs in all_field_configs:
+        field_list = _get_field_list(index, dt_field_configs, config,
+                                     time_info)
 
         # check that all fields types were found
         if not field_list or len(data_types) != len(field_list):
@@ -1002,6 +1253,103 @@ def parse_var_list(config, time_info=None, data_type=None, met_tool=None,
     return sorted(var_list, key=lambda x: x['index'])
 
 
+def _get_field_info_cache(config):
+    """!Get dictionary to store values computed from the VAR<n> config
+    variables of a config object. The dictionary is emptied if the config
+    has changed since the values were stored.
+
+    @param config METplusConfig object
+    @returns dictionary to store values in. If config does not keep track of
+     changes, a new empty dictionary is returned so nothing is cached
+    """
+    generation = getattr(config, 'generation', None)
+    if generation is None:
+        return {}
+
+    cache = _FIELD_INFO_CACHE.get(config)
+    if cache is None or cache['generation'] != generation:
+        cache = {'generation': generation}
+        _FIELD_INFO_CACHE[config] = cache
+    return cache
+
+
+def _are_field_info_configs_valid(config):
+    """!Check if VAR<n> config variables are valid. The result is reused
+    until the config changes so errors are only logged once.
+
+    @param config METplusConfig object to validate
+    @returns True if all are valid or False if any items are invalid
+    """
+    cache = _get_field_info_cache(config)
+    if 'valid' not in cache:
+        cache['valid'] = validate_field_info_configs(config)[0]
+    return cache['valid']
+
+
+def _get_var_key_index(config):
+    """!Get index of config variables that contain VAR<n>_ so variables for
+    a data type and wrapper can be found without searching every variable.
+
+    @param config METplusConfig object to read
+    @returns dictionary where the key is the text before VAR<n>_, i.e.
+     FCST_GRID_STAT_, and the value is a dictionary where the key is the
+     integer index <n> and the value is a list of the text after VAR<n>_
+    """
+    cache = _get_field_info_cache(config)
+    key_index = cache.get('key_index')
+    if key_index is not None:
+        return key_index
+
+    key_index = {}
+    for key in config.keys('config'):
+        match = _VAR_KEY_REGEX.match(key)
+        if not match:
+            continue
+        prefix, index, suffix = match.groups()
+        key_index.setdefault(prefix, {}).setdefault(int(index), []).append(
+            suffix
+        )
+
+    cache['key_index'] = key_index
+    return key_index
+
+
+def _get_all_field_configs(config, data_types, met_tool):
+    """!Get the config variables that define each field for data types and
+    wrapper. The result is reused until the config changes so that the
+    config is only searched once. Time information is substituted into the
+    values by _format_var_items each time they are used.
+
+    @param config METplusConfig object to read
+    @param data_types list of data types, i.e. FCST or OBS
+    @param met_tool name of wrapper to search for wrapper-specific
+    variables, e.g. *_GRID_STAT_VAR<n>_*.
+    @returns list of tuples containing the index <n> and a list of tuples
+     containing each data type and the dictionary from
+     get_field_config_variables
+    """
+    cache = _get_field_info_cache(config)
+    fields = cache.setdefault('fields', {})
+    key = (tuple(data_types), met_tool)
+    if key in fields:
+        return fields[key]
+
+    # get config name prefixes for each data type to find
+    dt_search_prefixes = _get_all_field_search_prefixes(data_types, met_tool)
+
+    all_field_configs = []
+    for index in _get_var_name_indices(config, data_types, met_tool):
+        all_field_configs.append((index, [
+            (current_type,
+             get_field_config_variables(config, index,
+                                        dt_search_prefixes[current_type]))
+            for current_type in data_types
+        ]))
+
+    fields[key] = all_field_configs
+    return all_field_configs
+
+
 def _get_var_name_indices(config, data_types, met_tool):
     """!Get list of indices of field variables from config.
     Look for wrapper-specific first. If no indices are found, look for generic
@@ -1042,45 +1390,40 @@ def _find_var_name_indices(config, data_types, met_tool=None):
     variables, e.g. *_GRID_STAT_VAR<n>_*.
     @returns list of integers for all matching config variables
     """
-    data_type_regex = f"{'|'.join(data_types)}"
+    search_types = list(data_types)
 
     # if data_types includes FCST or OBS, also search for BOTH
     if any([item for item in ['FCST', 'OBS'] if item in data_types]):
-        data_type_regex += '|BOTH'
-
-    regex_string = f"({data_type_regex})"
+        search_types.append('BOTH')
 
     # if MET tool is specified, get tool specific items
-    if met_tool:
-        regex_string += f"_{met_tool.upper()}"
-
-    regex_string += r"_VAR(\d+)_(NAME|INPUT_FIELD_NAME|FIELD_NAME)"
+    tool_string = f"_{met_tool.upper()}" if met_tool else ''
 
     # find all <data_type>_VAR<n>_NAME keys in the conf files
-    indices = find_indices_in_config_section(regex_string,
-                                             config,
-                                             index_index=2,
-                                             id_index=1).keys()
-    return [int(index) for index in indices]
+    key_index = _get_var_key_index(config)
+    indices = set()
+    for search_type in search_types:
+        prefix = f"{search_type}{tool_string}_"
+        for index, suffixes in key_index.get(prefix, {}).items():
+            if any(suffix.startswith(_VAR_NAME_SUFFIXES)
+                   for suffix in suffixes):
+                indices.add(index)
 
+    return sorted(indices)
 
-def _get_field_list(index, data_types, dt_search_prefixes, config, time_info):
+
+def _get_field_list(index, dt_field_configs, config, time_info):
     """!Get list of field information.
 
     @param index integer index for fields to search
-    @param data_types list of prefixes of config variables that describe the
-     type of data e.g. FCST or OBS
-    @param dt_search_prefixes dictionary of search strings to find variables
+    @param dt_field_configs list of tuples containing the data type, e.g.
+     FCST or OBS, and the dictionary from get_field_config_variables
     @param config METplusConfig object to query
     @param time_info dictionary containing time info for current run
     @returns list of dictionaries that contain field information
     """
     field_list = []
-    for current_type in data_types:
-        # get dictionary of existing config variables to use
-        search_prefixes = dt_search_prefixes[current_type]
-        field_configs = get_field_config_variables(config, index,
-                                                   search_prefixes)
+    for current_type, field_configs in dt_field_configs:
         field_info = _format_var_items(field_configs, time_info,
                                        config.logger)
         if not isinstance(field_info, dict):
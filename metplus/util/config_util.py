@@ -151,7 +151,7 @@ def write_final_conf(config):
         config.write(conf_file)
 
 
-def write_all_commands(all_commands, config):
+def write_all_commands(all_commands, config, append=False):
     """! Write all commands that were run to a file in the log
      directory. This includes the environment variables that
      were set before each command.
@@ -160,6 +160,8 @@ def write_all_commands(all_commands, config):
      list of environment variables that were set
     @param config METplusConfig object used to write log output
      and get the log timestamp to name the output file
+    @param append (optional) if True, add commands to the end of the file
+     if it already exists instead of overwriting it
     @returns False if no commands were provided, True otherwise
     """
     if not all_commands:
@@ -171,7 +173,7 @@ def write_all_commands(all_commands, config):
     filename = os.path.join(config.getdir('LOG_DIR'),
                             f'.all_commands.{log_timestamp}')
     config.logger.debug(f"Writing all commands and environment to {filename}")
-    with open(filename, 'w') as file_handle:
+    with open(filename, 'a' if append else 'w') as file_handle:
         for command, envs in all_commands:
             for env in envs:
                 file_handle.write(f"{env}\n")
@@ -107,6 +107,8 @@ RUNTIME_CONFS = [
     'DO_NOT_RUN_EXE',
     'SCRUB_STAGING_DIR',
     'MET_BIN_DIR',
+    'SHARD_INDEX',
+    'SHARD_COUNT',
 ]
 
 # datetime year month day (YYYYMMDD) notation
@@ -0,0 +1,248 @@
+"""
+Program Name: profile_util.py
+Contact(s): George McCabe
+Description: METplus utility to record how long each part of a run takes and
+ the resources used by the commands that were run. Spans are only recorded
+ while a profile is active, i.e. if PROFILE_FILE is set.
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+# columns of each row of the profile
+PROFILE_KEYS = (
+    'span', 'wrapper', 'count', 'total_seconds', 'mean_seconds',
+    'max_seconds', 'user_cpu_seconds', 'sys_cpu_seconds', 'max_rss_kb',
+    'read_bytes', 'write_bytes',
+)
+
+# resource usage values that are summed for each span
+_USAGE_KEYS = ('user_cpu_seconds', 'sys_cpu_seconds',
+               'read_bytes', 'write_bytes')
+
+# ru_inblock and ru_oublock are reported in 512 byte blocks
+_BLOCK_SIZE = 512
+
+_ACTIVE_PROFILE = None
+_SPAN_STATE = threading.local()
+
+
+class RunProfile:
+    """! Collect timing and resource usage of spans of a METplus run. Spans
+    with the same name and wrapper are combined. Each command that was run
+    is also kept so the most expensive commands can be found.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.commands = []
+
+    def add(self, name, wrapper, elapsed, record):
+        """! Add a span that has finished.
+
+        @param name name of span, i.e. find_data
+        @param wrapper name of wrapper that the span ran in or None
+        @param elapsed wall clock time of span in seconds
+        @param record dictionary with resource usage of child processes
+         and, for commands, the command that was run
+        """
+        with self._lock:
+            span = self.spans.get((name, wrapper))
+            if span is None:
+                span = {key: 0 for key in PROFILE_KEYS}
+                span.update({'span': name, 'wrapper': wrapper or ''})
+                self.spans[(name, wrapper)] = span
+
+            span['count'] += 1
+            span['total_seconds'] += elapsed
+            span['max_seconds'] = max(span['max_seconds'], elapsed)
+            for key in _USAGE_KEYS:
+                span[key] += record.get(key, 0)
+            span['max_rss_kb'] = max(span['max_rss_kb'],
+                                     record.get('max_rss_kb', 0))
+
+            if 'command' in record:
+                command = {'wrapper': wrapper or '', 'seconds': elapsed}
+                command.update(record)
+                self.commands.append(command)
+
+    def get_rows(self):
+        """! Get combined spans sorted by total time, longest first.
+
+        @returns list of dictionaries with keys from PROFILE_KEYS
+        """
+        with self._lock:
+            rows = [dict(span) for span in self.spans.values()]
+
+        for row in rows:
+            row['mean_seconds'] = row['total_seconds'] / row['count']
+        return sorted(rows, key=lambda row: row['total_seconds'],
+                      reverse=True)
+
+    def write(self, filename):
+        """! Write profile to a file. A CSV file containing the combined
+        spans is written if the filename ends with .csv. Otherwise a JSON
+        file is written that also contains each command that was run.
+
+        @param filename path to write
+        """
+        parent_dir = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(parent_dir, exist_ok=True)
+        rows = self.get_rows()
+        if filename.lower().endswith('.csv'):
+            with open(filename, 'w', newline='') as file_handle:
+                writer = csv.DictWriter(file_handle, fieldnames=PROFILE_KEYS)
+                writer.writeheader()
+                writer.writerows(rows)
+            return
+
+        with self._lock:
+            commands = sorted(self.commands,
+                              key=lambda command: command['seconds'],
+                              reverse=True)
+        with open(filename, 'w') as file_handle:
+            json.dump({'spans': rows, 'commands': commands}, file_handle,
+                      indent=2)
+
+    def get_summary_lines(self, max_rows=20):
+        """! Get lines of a table summarizing the spans that took the most
+        time. Times include the time of any spans that ran inside them.
+
+        @param max_rows maximum number of spans to include
+        @returns list of strings
+        """
+        lines = [f"{'Span':<16} {'Wrapper':<24} {'Count':>7} "
+                 f"{'Total(s)':>10} {'Mean(s)':>9} {'Max(s)':>9} "
+                 f"{'CPU(s)':>9} {'MaxRSS(MB)':>10}"]
+        for row in self.get_rows()[:max_rows]:
+            cpu = row['user_cpu_seconds'] + row['sys_cpu_seconds']
+            lines.append(f"{row['span']:<16} {row['wrapper']:<24} "
+                         f"{row['count']:>7} {row['total_seconds']:>10.3f} "
+                         f"{row['mean_seconds']:>9.3f} "
+                         f"{row['max_seconds']:>9.3f} {cpu:>9.3f} "
+                         f"{row['max_rss_kb'] / 1024:>10.1f}")
+        return lines
+
+
+def start_profile():
+    """! Start recording spans.
+
+    @returns RunProfile object that spans are added to
+    """
+    global _ACTIVE_PROFILE
+    _ACTIVE_PROFILE = RunProfile()
+    return _ACTIVE_PROFILE
+
+
+def stop_profile():
+    """! Stop recording spans.
+
+    @returns RunProfile object that was active or None if not profiling
+    """
+    global _ACTIVE_PROFILE
+    profile = _ACTIVE_PROFILE
+    _ACTIVE_PROFILE = None
+    return profile
+
+
+def get_profile_name(wrapper):
+    """! Get name to identify a wrapper in a profile, i.e. GridStat or
+    GridStat(my_instance).
+
+    @param wrapper CommandBuilder subclass object
+    @returns string name of wrapper
+    """
+    name = type(wrapper).__name__
+    if name.endswith('Wrapper'):
+        name = name[:-len('Wrapper')]
+    instance = getattr(wrapper, 'instance', None)
+    return f'{name}({instance})' if instance else name
+
+
+@contextmanager
+def profile_span(name, wrapper=None):
+    """! Context manager that records the time spent inside it if a profile
+    is active. If wrapper is not set, the wrapper of the span that contains
+    this span is used. If a span with the same name is already running in
+    this thread, i.e. from a recursive call, the time is only counted once.
+
+    @param name name of span
+    @param wrapper (optional) name of wrapper, see get_profile_name
+    @returns dictionary that resource usage of child processes can be added
+     to with add_rusage, or None if not profiling
+    """
+    profile = _ACTIVE_PROFILE
+    if profile is None:
+        yield None
+        return
+
+    stack = getattr(_SPAN_STATE, 'stack', None)
+    if stack is None:
+        stack = _SPAN_STATE.stack = []
+
+    for span_name, _, record in stack:
+        if span_name == name:
+            yield record
+            return
+
+    if wrapper is None and stack:
+        wrapper = stack[-1][1]
+
+    record = {}
+    stack.append((name, wrapper, record))
+    start_time = time.perf_counter()
+    try:
+        yield record
+    finally:
+        elapsed = time.perf_counter() - start_time
+        stack.pop()
+        profile.add(name, wrapper, elapsed, record)
+
+
+def profiled(name, method=False):
+    """! Decorator to record calls to a function as spans. The function is
+    called directly if a profile is not active.
+
+    @param name name of span
+    @param method if True, the function is a wrapper method and the wrapper
+     name is read from the first argument
+    @returns decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            if _ACTIVE_PROFILE is None:
+                return func(*args, **kwargs)
+
+            wrapper = get_profile_name(args[0]) if method else None
+            with profile_span(name, wrapper):
+                return func(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def add_rusage(record, rusage_list):
+    """! Add resource usage of child processes to a span record.
+
+    @param record dictionary yielded by profile_span. Nothing is done if None
+    @param rusage_list list of resource.struct_rusage objects from os.wait4
+    """
+    if record is None:
+        return
+
+    for usage in rusage_list:
+        record['user_cpu_seconds'] = (record.get('user_cpu_seconds', 0) +
+                                      usage.ru_utime)
+        record['sys_cpu_seconds'] = (record.get('sys_cpu_seconds', 0) +
+                                     usage.ru_stime)
+        record['read_bytes'] = (record.get('read_bytes', 0) +
+                                usage.ru_inblock * _BLOCK_SIZE)
+        record['write_bytes'] = (record.get('write_bytes', 0) +
+                                 usage.ru_oublock * _BLOCK_SIZE)
+        record['max_rss_kb'] = max(record.get('max_rss_kb', 0),
+                                   usage.ru_maxrss)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Program Name: py_embed_cache.py
+Contact(s): George McCabe
+Description: Cache the output of Python Embedding scripts so that a script
+ called with the same arguments is only run once. This file is also run as a
+ script, both to write the cache and by the MET tools to read it, so it must
+ not import anything from the metplus package.
+Usage:
+  Write cache: py_embed_cache.py --write <cache_prefix> <script> [args...]
+  Read cache (called by MET): py_embed_cache.py <cache_prefix>
+"""
+
+import os
+import re
+import sys
+import json
+import shlex
+import hashlib
+import runpy
+
+WRITE_FLAG = '--write'
+
+DATA_EXTENSION = '.npy'
+ATTRS_EXTENSION = '.json'
+
+
+def split_script_command(command):
+    """! Split Python Embedding command into the script path and arguments.
+
+    @param command string containing a python script followed by arguments
+    @returns tuple of script path and list of arguments, or (None, None) if
+     no python script was found
+    """
+    items = shlex.split(command)
+    for index, item in enumerate(items):
+        if item.endswith('.py'):
+            return item, items[index+1:]
+    return None, None
+
+
+def get_dependency_files(script, args):
+    """! Get files that the output of a Python Embedding script may depend
+    on. This includes the script, any arguments that are files, and the
+    Python files in the directory of the script and its parent directory,
+    where scripts often import shared modules from. Arguments are also split
+    on colons and commas, i.e. path:OBTYPE:var, to find files that are
+    passed as part of a single argument. Modules imported from any other
+    directory are not included.
+
+    @param script path to Python Embedding script
+    @param args list of arguments passed to the script
+    @returns list of paths to existing files
+    """
+    paths = [script]
+    for arg in args:
+        paths.append(arg)
+        paths.extend(re.split(r'[:,]', arg))
+
+    script_dir = os.path.dirname(os.path.abspath(script))
+    for module_dir in (script_dir, os.path.dirname(script_dir)):
+        try:
+            paths.extend(sorted(os.path.join(module_dir, name)
+                                for name in os.listdir(module_dir)
+                                if name.endswith('.py')))
+        except OSError:
+            continue
+
+    files = []
+    for path in paths:
+        if path and path not in files and os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+def get_cache_key(command, data_type):
+    """! Get a key that uniquely identifies the output of a Python Embedding
+    command. The modification time and size of each file found by
+    get_dependency_files are included so changes invalidate the cache.
+
+    @param command Python Embedding command, i.e. script and arguments
+    @param data_type Python Embedding type, i.e. PYTHON_NUMPY
+    @returns hexadecimal hash string
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f'{data_type}\n{command}\n'.encode('utf-8'))
+    script, args = split_script_command(command)
+    if not script:
+        return hasher.hexdigest()
+
+    for path in get_dependency_files(script, args):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        hasher.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}\n'
+                      .encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def is_cached(cache_prefix):
+    """! Check if cache files exist. The attributes file is written last, so
+    if it exists, the data file is complete.
+
+    @param cache_prefix path to cache files without extension
+    @returns True if cache files exist
+    """
+    return (os.path.exists(f'{cache_prefix}{ATTRS_EXTENSION}') and
+            os.path.exists(f'{cache_prefix}{DATA_EXTENSION}'))
+
+
+def _to_json(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def write_cache(cache_prefix, script, args):
+    """! Run a Python Embedding script and write met_data and attrs to
+    cache files. The data is written to a numpy file that can be memory
+    mapped and the attributes are written to a JSON file.
+
+    @param cache_prefix path to cache files without extension
+    @param script path to Python Embedding script
+    @param args list of arguments to pass to the script
+    """
+    import numpy as np
+
+    saved_argv = sys.argv
+    sys.argv = [script] + list(args)
+    try:
+        namespace = runpy.run_path(script, run_name='__main__')
+    finally:
+        sys.argv = saved_argv
+
+    met_data = namespace['met_data']
+    data_type = 'numpy'
+    attrs = namespace.get('attrs')
+    if hasattr(met_data, 'dims') and hasattr(met_data, 'attrs'):
+        data_type = 'xarray'
+        attrs = dict(met_data.attrs)
+        met_data = met_data.values
+
+    if np.ma.isMaskedArray(met_data):
+        met_data = np.ma.filled(met_data.astype(float), np.nan)
+
+    os.makedirs(os.path.dirname(os.path.abspath(cache_prefix)), exist_ok=True)
+
+    # write to temporary files then rename them so other processes never
+    # read partially written files
+    pid = os.getpid()
+    tmp_data = f'{cache_prefix}.{pid}.tmp{DATA_EXTENSION}'
+    np.save(tmp_data, np.asarray(met_data))
+    os.replace(tmp_data, f'{cache_prefix}{DATA_EXTENSION}')
+
+    tmp_attrs = f'{cache_prefix}.{pid}.tmp{ATTRS_EXTENSION}'
+    with open(tmp_attrs, 'w') as file_handle:
+        json.dump({'type': data_type, 'attrs': _to_json(attrs)}, file_handle)
+    os.replace(tmp_attrs, f'{cache_prefix}{ATTRS_EXTENSION}')
+
+
+def read_cache(cache_prefix):
+    """! Read met_data and attrs from cache files. The data is memory mapped
+    so it is only read from disk when it is accessed.
+
+    @param cache_prefix path to cache files without extension
+    @returns tuple of met_data and attrs. met_data is an xarray DataArray if
+     the original script provided one, otherwise a numpy array
+    """
+    import numpy as np
+
+    with open(f'{cache_prefix}{ATTRS_EXTENSION}', 'r') as file_handle:
+        info = json.load(file_handle)
+
+    met_data = np.load(f'{cache_prefix}{DATA_EXTENSION}', mmap_mode='r')
+    attrs = info['attrs']
+    if info['type'] == 'xarray':
+        import xarray as xr
+        met_data = xr.DataArray(np.asarray(met_data), attrs=attrs)
+
+    return met_data, attrs
+
+
+# only run when called as a script, not when imported from metplus.util
+if not __package__ and len(sys.argv) > 1:
+    if sys.argv[1] == WRITE_FLAG:
+        write_cache(sys.argv[2], sys.argv[3], sys.argv[4:])
+    else:
+        met_data, attrs = read_cache(sys.argv[1])
@@ -0,0 +1,607 @@
+"""
+Program Name: realtime.py
+Contact(s): George McCabe
+Description: METplus utility to run as a daemon that watches the input
+ directories of each wrapper, maps each new file to a run time using the
+ wrapper's filename templates, and runs the wrapper for a run time as soon
+ as all of its input files for that time have been written.
+"""
+
+import os
+import re
+import glob
+import time
+from datetime import datetime, timedelta
+
+from produtil.fileop import check_file
+from produtil.filewatch import DirectoryWatcher
+
+from .constants import COMPRESSION_EXTENSIONS
+from .string_manip import getlist
+from .time_util import ti_calculate, get_seconds_from_string
+from .string_template_substitution import do_string_sub, get_time_from_file
+from .string_template_substitution import get_template_tag_names
+from .time_looping import time_generator, get_time_prefix, get_lead_sequence
+from .time_looping import get_start_and_end_times, skip_time
+from .time_looping import run_process_at_time
+
+# time information tags that can be used to find the run time of a file
+_RUN_TIME_TAGS = frozenset(('init', 'valid', 'lead', 'da_init', 'offset'))
+
+# characters that make a template path component match many paths
+_MAGIC_CHARS = re.compile('[{*?[]')
+
+
+class RealtimeTrigger:
+    """! Input files of one wrapper that are watched to find the run times
+    that are ready to process. Inputs are read from the wrapper's
+    <type>INPUT_DIR and <type>INPUT_TEMPLATE settings, i.e. FCST_INPUT_DIR.
+    Inputs read with Python Embedding or found using a file window are not
+    required to exist because their paths cannot be computed from the run
+    time. They are found by the wrapper when it runs.
+    """
+    def __init__(self, config, process, min_age=0):
+        """! Find the inputs of a wrapper.
+
+        @param config METplusConfig object
+        @param process CommandBuilder subclass object (Wrapper)
+        @param min_age number of seconds that an input file must not have
+         been modified before it is considered complete
+        """
+        self.config = config
+        self.process = process
+        self.min_age = min_age
+        self.done = set()
+        # forecast leads used to find the run times of files that only
+        # contain one of init or valid time. Read when first needed
+        self._leads = None
+        # list of tuples of directory to watch, number of path components
+        # below it to watch, and template relative to the directory
+        self.inputs = []
+        for key, value in process.c_dict.items():
+            if not key.endswith('INPUT_TEMPLATE') or not value:
+                continue
+            data_type = key[:-len('INPUT_TEMPLATE')]
+            if (data_type and not data_type.endswith('_') or
+                    'PYTHON' in process.c_dict.get(
+                        f'{data_type}INPUT_DATATYPE', '') or
+                    process.c_dict.get(f'{data_type}FILE_WINDOW_BEGIN', 0) or
+                    process.c_dict.get(f'{data_type}FILE_WINDOW_END', 0)):
+                continue
+
+            input_dir = process.c_dict.get(f'{data_type}INPUT_DIR', '')
+            for template in getlist(value):
+                full_template = os.path.join(input_dir, template)
+                if os.path.sep not in full_template:
+                    continue
+                self.inputs.append(_split_template(full_template))
+
+    @property
+    def has_time_inputs(self):
+        """! True if any input template can be used to find a run time."""
+        return any(get_template_tag_names(template) & _RUN_TIME_TAGS
+                   for _, _, template in self.inputs)
+
+    def watch(self, watcher):
+        """! Watch the top directory of each input.
+
+        @param watcher produtil.filewatch.DirectoryWatcher object
+        """
+        for top_dir, _, _ in self.inputs:
+            watcher.watch(top_dir)
+
+    def find_files(self, path, watcher):
+        """! Find the files under a directory that may be inputs. Each
+        directory that inputs may be written to is also watched.
+
+        @param path directory to search
+        @param watcher produtil.filewatch.DirectoryWatcher object
+        @returns list of file paths
+        """
+        files = []
+        for top_dir, depth, _ in self.inputs:
+            if path != top_dir and not path.startswith(top_dir + os.sep):
+                continue
+            start_depth = _get_depth(top_dir, path)
+            for root, dirs, names in os.walk(path):
+                watcher.watch(root)
+                root_depth = start_depth + _get_depth(path, root)
+                if root_depth + 1 >= depth:
+                    dirs[:] = []
+                if root_depth + 1 == depth:
+                    files.extend(os.path.join(root, name) for name in names)
+        return files
+
+    def get_run_times(self, path, prefix):
+        """! Get the run times that a file may be an input for. If the
+        template of the file only contains the time that is not looped over,
+        e.g. an observation file with only the valid time when looping by
+        init, the file is an input for the run time of each forecast lead.
+
+        @param path file path
+        @param prefix INIT or VALID
+        @returns set of datetime objects
+        """
+        run_times = set()
+        loop_by = prefix.lower()
+        other = 'valid' if loop_by == 'init' else 'init'
+        for top_dir, _, template in self.inputs:
+            if not path.startswith(top_dir + os.sep):
+                continue
+            tags = get_template_tag_names(template)
+            if not tags & _RUN_TIME_TAGS:
+                continue
+            time_info = get_time_from_file(path, os.path.join(top_dir,
+                                                              template),
+                                           self.config.logger)
+            if not time_info:
+                continue
+
+            # run time cannot be read directly from the file, so get the
+            # run time of each forecast lead from the other time
+            if (loop_by not in tags and 'lead' not in tags and
+                    other in tags and time_info.get(other, '*') != '*'):
+                run_times.update(self._get_run_times_from_leads(time_info,
+                                                                other,
+                                                                loop_by))
+                continue
+
+            if time_info.get(loop_by, '*') != '*':
+                run_times.add(time_info[loop_by])
+        return run_times
+
+    def _get_run_times_from_leads(self, time_info, other, loop_by):
+        """! Get the run time for each forecast lead from a time that is not
+        looped over, i.e. init = valid - lead.
+
+        @param time_info time dictionary read from a file
+        @param other init or valid, the time that was read from the file
+        @param loop_by init or valid, the time of the run times
+        @returns set of datetime objects
+        """
+        if self._leads is None:
+            self._leads = []
+            # INIT_SEQ leads depend on the valid time, which is not known
+            if not self.config.getstr('config', 'INIT_SEQ', ''):
+                leads = get_lead_sequence(self.config) or []
+                if '*' not in leads:
+                    self._leads = leads
+
+        return {ti_calculate({other: time_info[other], 'lead': lead})[loop_by]
+                for lead in self._leads}
+
+    def check(self, time_input):
+        """! Check if all inputs exist for every forecast lead of a run time.
+
+        @param time_input dictionary containing the run time
+        @returns True if all inputs exist, the time in seconds since the epoch
+         that the newest input file will be old enough, or False if an input
+         is missing
+        """
+        skip_times = self.process.c_dict.get('SKIP_TIMES', {})
+        ready = True
+        for lead in get_lead_sequence(self.config, time_input):
+            time_info = ti_calculate(dict(time_input, lead=lead))
+            if skip_time(time_info, skip_times):
+                continue
+            for top_dir, _, template in self.inputs:
+                path = do_string_sub(os.path.join(top_dir, template),
+                                     skip_missing_tags=True, **time_info)
+                # skip inputs that use tags other than time information
+                if '{' in path:
+                    continue
+                status = self._check_path(path)
+                if status is False:
+                    return False
+                if status is not True:
+                    ready = status if ready is True else max(ready, status)
+        return ready
+
+    def _check_path(self, path):
+        """! Check if an input file or a compressed copy exists.
+
+        @param path path to input file, which may include wildcards
+        @returns True if the file exists and is old enough, the time that it
+         will be old enough, or False if it does not exist
+        """
+        if _MAGIC_CHARS.search(path):
+            candidates = glob.glob(path)
+            if not candidates:
+                return False
+        else:
+            candidates = [path] + [f'{path}{ext}'
+                                   for ext in COMPRESSION_EXTENSIONS]
+
+        min_age = self.min_age or None
+        ready = False
+        for candidate in candidates:
+            if check_file(candidate, min_size=1, min_mtime_age=min_age):
+                return True
+            try:
+                mtime = os.stat(candidate).st_mtime
+            except OSError:
+                continue
+            ready = mtime + self.min_age + 1
+        return ready
+
+
+def _split_template(full_template):
+    """! Split an input template into the directory that does not depend on
+    the run time and the part of the template below it.
+
+    @param full_template template including the input directory
+    @returns tuple of directory, number of path components below the
+     directory, and template relative to the directory
+    """
+    components = os.path.abspath(full_template).split(os.sep)
+    index = 1
+    while (index < len(components) - 1 and
+           not _MAGIC_CHARS.search(components[index])):
+        index += 1
+    top_dir = os.sep.join(components[:index]) or os.sep
+    return top_dir, len(components) - index, os.sep.join(components[index:])
+
+
+def _get_depth(top_dir, path):
+    """! Get the number of path components from one directory to another.
+
+    @param top_dir directory at the top
+    @param path directory under top_dir
+    @returns integer depth, 0 if the paths are the same
+    """
+    rel_path = os.path.relpath(path, top_dir)
+    return 0 if rel_path == os.curdir else len(rel_path.split(os.sep))
+
+
+class RealtimeRunTimes:
+    """! Run times that the daemon should process. Times before
+    <INIT/VALID>_BEG are ignored. If <INIT/VALID>_END or <INIT/VALID>_LIST is
+    set, only those times are processed and the daemon stops when all of them
+    have been processed. Otherwise new run times are processed until the
+    daemon is stopped.
+    """
+    def __init__(self, config):
+        """! Read the run time settings.
+
+        @param config METplusConfig object
+        """
+        self.prefix = get_time_prefix(config)
+        self.clock_dt = None
+        self.start = None
+        self.increment = None
+        self.expected = None
+        if not self.prefix:
+            return
+
+        time_inputs = []
+        if (config.has_option('config', f'{self.prefix}_LIST') or
+                config.has_option('config', f'{self.prefix}_END')):
+            time_inputs = list(time_generator(config))
+            if None in time_inputs:
+                self.prefix = None
+                return
+            self.expected = {item[self.prefix.lower()]
+                             for item in time_inputs}
+            if config.has_option('config', f'{self.prefix}_LIST'):
+                return
+
+        self.start, _ = get_start_and_end_times(config)
+        if self.start is None:
+            self.prefix = None
+            return
+        self.increment = get_seconds_from_string(
+            config.getstr('config', f'{self.prefix}_INCREMENT', '60')
+        )
+
+    def is_valid(self, run_time):
+        """! Check if a run time should be processed.
+
+        @param run_time datetime object
+        @returns True if run time should be processed
+        """
+        if self.expected is not None:
+            return run_time in self.expected
+
+        if run_time < self.start:
+            return False
+
+        # skip alignment check for increments in months or years
+        if not self.increment:
+            return True
+        offset = (run_time - self.start).total_seconds()
+        return offset % self.increment == 0
+
+    def get_time_input(self, run_time, clock_dt):
+        """! Get the input dictionary for a run time, i.e. as created by
+        time_generator.
+
+        @param run_time datetime object
+        @param clock_dt datetime object of the time the run started
+        @returns dictionary
+        """
+        return {
+            'loop_by': self.prefix.lower(),
+            self.prefix.lower(): run_time,
+            'now': clock_dt,
+            'today': clock_dt.strftime('%Y%m%d'),
+        }
+
+
+def run_realtime_daemon(config, processes):
+    """! Run wrappers for each run time as soon as all of their input files
+    for that time have been written. Input directories are watched with
+    inotify if it is available. All input directories are also scanned every
+    REALTIME_DAEMON_SCAN_TIME seconds to find files written by other hosts.
+    The daemon stops when all run times have been processed if the run
+    times are bounded, after REALTIME_DAEMON_MAX_RUN_TIME seconds if it is
+    set, or when it is interrupted. If the run times are not bounded, run
+    times that are more than REALTIME_DAEMON_HORIZON older than the newest
+    run time that was processed are forgotten and ignored from then on.
+
+    @param config METplusConfig object
+    @param processes list of CommandBuilder subclass objects (Wrappers) in
+     the order that they should be run for each run time
+    @returns list of tuples with all commands that were run and the
+     environment variables that were set for each, or None if the daemon
+     could not be started
+    """
+    logger = config.logger
+    run_times = RealtimeRunTimes(config)
+    if not run_times.prefix:
+        logger.error('Could not read run times for realtime daemon')
+        return None
+
+    min_age = config.getseconds('config', 'REALTIME_DAEMON_MIN_AGE', 0)
+    triggers = []
+    for process in processes:
+        runtime_freq = process.c_dict.get('RUNTIME_FREQ')
+        if runtime_freq and runtime_freq != 'RUN_ONCE_FOR_EACH':
+            logger.error(f'{process.get_wrapper_instance_name()}: '
+                         f'RUNTIME_FREQ {runtime_freq} is not supported by '
+                         'the realtime daemon. Use RUN_ONCE_FOR_EACH')
+            return None
+        trigger = RealtimeTrigger(config, process, min_age)
+        if not trigger.has_time_inputs:
+            logger.error(f'{process.get_wrapper_instance_name()}: no input '
+                         'templates contain time information to watch')
+            return None
+        triggers.append(trigger)
+
+    scan_time = config.getseconds('config', 'REALTIME_DAEMON_SCAN_TIME', 60)
+    max_run_time = config.getseconds('config', 'REALTIME_DAEMON_MAX_RUN_TIME',
+                                     0)
+    horizon = config.getseconds('config', 'REALTIME_DAEMON_HORIZON', 86400)
+    clock_dt = datetime.strptime(config.getstr('config', 'CLOCK_TIME'),
+                                 '%Y%m%d%H%M%S')
+    all_commands = []
+    with DirectoryWatcher(logger=logger) as watcher:
+        if not watcher.active:
+            logger.info('inotify is not available. Checking input '
+                        f'directories every {scan_time} seconds')
+        for trigger in triggers:
+            trigger.watch(watcher)
+
+        daemon = _RealtimeDaemon(config, triggers, run_times, watcher,
+                                 clock_dt, all_commands, horizon)
+        try:
+            daemon.run(scan_time, max_run_time)
+        except KeyboardInterrupt:
+            logger.info('Realtime daemon was interrupted. Stopping')
+
+    return all_commands
+
+
+class _RealtimeDaemon:
+    """! Event loop of the realtime daemon. See run_realtime_daemon."""
+    def __init__(self, config, triggers, run_times, watcher, clock_dt,
+                 all_commands, horizon=0):
+        self.config = config
+        self.logger = config.logger
+        self.triggers = triggers
+        self.run_times = run_times
+        self.watcher = watcher
+        self.clock_dt = clock_dt
+        self.all_commands = all_commands
+        # seconds before the newest processed run time to keep track of
+        self.horizon = horizon
+        # run times before this time are forgotten and ignored
+        self.cutoff = None
+        # files that were already mapped to run times. Only files that
+        # still existed at the last scan are kept
+        self.seen = set()
+        # key is (trigger index, run time), value is time to check again
+        self.retry_at = {}
+        # (trigger index, run time) that are missing input files. They are
+        # checked again at each scan in case a file that was written could
+        # not be mapped to the run time
+        self.incomplete = set()
+
+    def run(self, scan_time, max_run_time):
+        """! Process run times until all are done or the daemon is stopped.
+
+        @param scan_time seconds between scans of all input directories
+        @param max_run_time seconds to run before stopping, 0 for no limit
+        """
+        start = time.time()
+        last_scan = start
+        changed = None
+        while True:
+            now = time.time()
+            if changed is None:
+                last_scan = now
+                paths = []
+                for trigger in self.triggers:
+                    for top_dir, _, _ in trigger.inputs:
+                        paths.extend(trigger.find_files(top_dir,
+                                                        self.watcher))
+                # only files that changed are reported between scans, so
+                # files that were already mapped do not need to be parsed.
+                # Forget files that were removed
+                self.seen.intersection_update(paths)
+                paths = [path for path in paths if path not in self.seen]
+            else:
+                paths = self._get_changed_files(changed)
+
+            self._process(self._get_candidates(paths, now,
+                                               full_scan=changed is None))
+            self._forget_old_run_times()
+            if self._is_done():
+                self.logger.info('All run times have been processed')
+                return
+
+            now = time.time()
+            timeout = scan_time - (now - last_scan)
+            if self.retry_at:
+                timeout = min(timeout, min(self.retry_at.values()) - now)
+            if max_run_time:
+                remaining = start + max_run_time - now
+                if remaining <= 0:
+                    self.logger.info('Reached REALTIME_DAEMON_MAX_RUN_TIME. '
+                                     'Stopping')
+                    return
+                timeout = min(timeout, remaining)
+
+            changed = self.watcher.wait(max(0, timeout))
+            if time.time() - last_scan >= scan_time:
+                changed = None
+
+    def _get_changed_files(self, changed):
+        """! Get files to check from the paths that the watcher reported.
+        New directories are searched and watched.
+
+        @param changed set of paths that were created or changed
+        @returns list of file paths
+        """
+        paths = []
+        for path in changed:
+            if not os.path.isdir(path):
+                paths.append(path)
+                continue
+            for trigger in self.triggers:
+                paths.extend(trigger.find_files(path, self.watcher))
+        return paths
+
+    def _get_candidates(self, paths, now, full_scan=False):
+        """! Get run times that may be ready for each wrapper.
+
+        @param paths list of file paths that are new or changed
+        @param now current time in seconds since the epoch
+        @param full_scan (optional) if True, also get the run times that were
+         missing input files when they were last checked
+        @returns set of tuples of trigger index and run time
+        """
+        candidates = set()
+        for path in paths:
+            self.seen.add(path)
+            for index, trigger in enumerate(self.triggers):
+                for run_time in trigger.get_run_times(path,
+                                                      self.run_times.prefix):
+                    if (run_time not in trigger.done and
+                            (self.cutoff is None or
+                             run_time >= self.cutoff) and
+                            self.run_times.is_valid(run_time)):
+                        candidates.add((index, run_time))
+
+        for key, retry_time in list(self.retry_at.items()):
+            if retry_time <= now:
+                candidates.add(key)
+
+        if full_scan:
+            candidates.update(self.incomplete)
+        return candidates
+
+    def _process(self, candidates):
+        """! Run each wrapper for each run time that has all of its inputs.
+        Run times are processed in order. Wrappers are run in the order of
+        the process list so that a wrapper that reads the output of an
+        earlier wrapper is checked after the earlier wrapper runs.
+
+        @param candidates set of tuples of trigger index and run time
+        """
+        pending = sorted(candidates, key=lambda item: (item[1], item[0]))
+        while pending:
+            index, run_time = pending.pop(0)
+            trigger = self.triggers[index]
+            if run_time in trigger.done:
+                continue
+
+            time_input = self.run_times.get_time_input(run_time,
+                                                       self.clock_dt)
+            status = trigger.check(time_input)
+            if status is False:
+                self.retry_at.pop((index, run_time), None)
+                self.incomplete.add((index, run_time))
+                continue
+            self.incomplete.discard((index, run_time))
+            if status is not True:
+                self.retry_at[(index, run_time)] = status
+                continue
+
+            self.retry_at.pop((index, run_time), None)
+            trigger.done.add(run_time)
+            self._run(trigger.process, time_input)
+
+            # check later wrappers that may read the output of this one
+            for later in range(index + 1, len(self.triggers)):
+                if run_time not in self.triggers[later].done:
+                    pending.append((later, run_time))
+            pending.sort(key=lambda item: (item[1], item[0]))
+
+    def _run(self, process, time_input):
+        """! Run a wrapper for a run time for each custom loop string.
+
+        @param process CommandBuilder subclass object (Wrapper)
+        @param time_input dictionary containing the run time
+        """
+        # wrappers that run once per time loop over custom strings in
+        # run_all_times instead of run_at_time
+        custom_list = [None]
+        if 'RUNTIME_FREQ' in process.c_dict:
+            custom_list = process.c_dict['CUSTOM_LOOP_LIST']
+
+        for custom in custom_list:
+            if custom:
+                self.logger.info(f"Processing custom string: {custom}")
+            self.all_commands.extend(
+                run_process_at_time(self.config, process, dict(time_input),
+                                    custom)
+            )
+
+    def _forget_old_run_times(self):
+        """! Stop keeping track of run times that are more than the horizon
+        older than the newest run time that was processed so the run times
+        that are kept do not grow without limit. Run times that are waiting
+        for input files to be old enough are kept. Nothing is forgotten if
+        the run times are bounded because all of them must be processed.
+        """
+        if self.run_times.expected is not None or not self.horizon:
+            return
+
+        done_times = [max(trigger.done) for trigger in self.triggers
+                      if trigger.done]
+        if not done_times:
+            return
+
+        cutoff = max(done_times) - timedelta(seconds=self.horizon)
+        if self.retry_at:
+            cutoff = min([cutoff] + [run_time for _, run_time
+                                     in self.retry_at])
+        if self.cutoff is not None and cutoff <= self.cutoff:
+            return
+
+        self.cutoff = cutoff
+        for trigger in self.triggers:
+            trigger.done = {run_time for run_time in trigger.done
+                            if run_time >= cutoff}
+        self.incomplete = {key for key in self.incomplete
+                           if key[1] >= cutoff}
+
+    def _is_done(self):
+        """! Check if every wrapper has processed every run time.
+
+        @returns True if run times are bounded and all have been processed
+        """
+        expected = self.run_times.expected
+        if expected is None:
+            return False
+        return all(expected <= trigger.done for trigger in self.triggers)
@@ -0,0 +1,366 @@
+"""
+Program Name: regrid_util.py
+Contact(s): George McCabe
+Description: METplus utility to compute, cache, and apply regridding weights
+ for Python embedding scripts. Weights are stored as sparse matrices on disk
+ keyed by a hash of the source and target grids so that repeated calls for
+ the same grids skip the kd-tree or triangulation build. Targets that
+ change on every call, such as observation locations, should pass
+ cache=False to skip hashing the grids and writing weights that are never
+ read again. A kd-tree of the source grid from build_source_tree can be
+ reused for each of those targets.
+ This module is not imported by metplus.util because it requires numpy and
+ scipy, which are optional dependencies of METplus.
+"""
+
+import os
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree, Delaunay
+
+REGRID_METHODS = ('nearest', 'linear', 'gauss')
+
+# environment variable used to override the weight cache directory
+REGRID_CACHE_DIR_ENV = 'METPLUS_REGRID_WEIGHTS_DIR'
+
+# earth radius in meters used to convert lat/lon to cartesian coordinates
+EARTH_RADIUS = 6370997.0
+
+# maximum number of weight files kept in the cache directory. The least
+# recently used files are removed when a new file is written
+MAX_CACHE_FILES = 64
+
+# maximum number of weights kept in memory by each process
+MAX_MEMORY_WEIGHTS = 8
+
+# in-memory weights keyed by grid hash to avoid reading the same file twice,
+# ordered from least to most recently used
+_WEIGHTS_CACHE = OrderedDict()
+
+
+def get_regrid_cache_dir(cache_dir=None):
+    """! Get directory to store regridding weight files. Uses the value of
+    the METPLUS_REGRID_WEIGHTS_DIR environment variable if set, otherwise a
+    metplus_regrid_weights directory in the system temporary directory.
+
+    @param cache_dir (optional) directory to use instead of the default
+    @returns path to cache directory
+    """
+    if cache_dir:
+        return cache_dir
+    env_dir = os.environ.get(REGRID_CACHE_DIR_ENV)
+    if env_dir:
+        return env_dir
+    return os.path.join(tempfile.gettempdir(), 'metplus_regrid_weights')
+
+
+def get_grid_hash(src_lon, src_lat, dst_lon, dst_lat, method, **kwargs):
+    """! Compute a hash that uniquely identifies a set of regridding weights.
+
+    @param src_lon longitude values of the source grid
+    @param src_lat latitude values of the source grid
+    @param dst_lon longitude values of the target grid
+    @param dst_lat latitude values of the target grid
+    @param method regridding method
+    @param kwargs additional settings that affect the weights
+    @returns hexadecimal hash string
+    """
+    hasher = hashlib.sha256()
+    hasher.update(method.encode('utf-8'))
+    hasher.update(repr(sorted(kwargs.items())).encode('utf-8'))
+    for coords in (src_lon, src_lat, dst_lon, dst_lat):
+        coords = np.ascontiguousarray(coords, dtype=np.float64)
+        hasher.update(repr(coords.shape).encode('utf-8'))
+        hasher.update(coords.tobytes())
+    return hasher.hexdigest()
+
+
+def _lonlat_to_xyz(lon, lat):
+    lon = np.radians(np.ravel(lon).astype(np.float64))
+    lat = np.radians(np.ravel(lat).astype(np.float64))
+    return np.column_stack((EARTH_RADIUS * np.cos(lat) * np.cos(lon),
+                            EARTH_RADIUS * np.cos(lat) * np.sin(lon),
+                            EARTH_RADIUS * np.sin(lat)))
+
+
+def build_source_tree(src_lon, src_lat, method='nearest'):
+    """! Build a kd-tree of the source grid points that can be passed to
+    compute_regrid_weights or regrid to regrid the same source grid to many
+    different targets without rebuilding the tree.
+
+    @param src_lon longitude values of the source grid
+    @param src_lat latitude values of the source grid
+    @param method regridding method the tree will be used for: nearest or
+     gauss. The linear method does not use a kd-tree
+    @returns scipy.spatial.cKDTree object
+    @throws ValueError if method does not use a kd-tree
+    """
+    if method == 'gauss':
+        return cKDTree(_lonlat_to_xyz(src_lon, src_lat))
+    if method == 'nearest':
+        return cKDTree(np.column_stack((np.ravel(src_lon),
+                                        np.ravel(src_lat))))
+    raise ValueError(f'Regrid method {method} does not use a kd-tree')
+
+
+def _nearest_weights(src_points, dst_points, tree=None):
+    if tree is None:
+        tree = cKDTree(src_points)
+    _, index = tree.query(dst_points, k=1)
+    rows = np.arange(dst_points.shape[0])
+    return rows, index, np.ones(rows.size)
+
+
+def _linear_weights(src_points, dst_points):
+    triangles = Delaunay(src_points)
+    simplex = triangles.find_simplex(dst_points)
+    inside = simplex >= 0
+    transform = triangles.transform[simplex[inside]]
+    delta = dst_points[inside] - transform[:, 2]
+    bary = np.einsum('ijk,ik->ij', transform[:, :2], delta)
+    bary = np.column_stack((bary, 1 - bary.sum(axis=1)))
+
+    rows = np.repeat(np.nonzero(inside)[0], 3)
+    cols = triangles.simplices[simplex[inside]].ravel()
+    return rows, cols, bary.ravel()
+
+
+def _gauss_weights(src_points, dst_points, radius, sigma, neighbours,
+                   tree=None):
+    if tree is None:
+        tree = cKDTree(src_points)
+    num_src = tree.n
+    distance, index = tree.query(
+        dst_points, k=neighbours, distance_upper_bound=radius
+    )
+    distance = distance.reshape(dst_points.shape[0], -1)
+    index = index.reshape(dst_points.shape[0], -1)
+    found = index < num_src
+    rows = np.broadcast_to(np.arange(index.shape[0])[:, None], index.shape)
+    weights = np.exp(-distance[found] ** 2 / sigma ** 2)
+    return rows[found], index[found], weights
+
+
+def compute_regrid_weights(src_lon, src_lat, dst_lon, dst_lat,
+                           method='nearest', radius=50000, sigma=25000,
+                           neighbours=8, tree=None):
+    """! Compute sparse weights to regrid data from a source grid to a
+    target grid. The nearest and linear methods operate on lon/lat values
+    directly to match scipy NearestNDInterpolator and LinearNDInterpolator.
+    The gauss method uses distances on the sphere to match pyresample
+    kd_tree.resample_gauss.
+
+    @param src_lon longitude values of the source grid
+    @param src_lat latitude values of the source grid (same shape as src_lon)
+    @param dst_lon longitude values of the target grid
+    @param dst_lat latitude values of the target grid (same shape as dst_lon)
+    @param method regridding method: nearest, linear, or gauss
+    @param radius radius of influence in meters (gauss only)
+    @param sigma e-folding distance of weights in meters (gauss only)
+    @param neighbours max number of source points per target (gauss only)
+    @param tree (optional) kd-tree of the source grid from build_source_tree
+     built for the same method. Ignored by the linear method
+    @returns scipy.sparse CSR matrix with shape (target size, source size)
+    @throws ValueError if method is not supported
+    """
+    num_src = np.size(src_lon)
+    num_dst = np.size(dst_lon)
+    if method == 'gauss':
+        src_points = None if tree else _lonlat_to_xyz(src_lon, src_lat)
+        rows, cols, weights = _gauss_weights(src_points,
+                                             _lonlat_to_xyz(dst_lon, dst_lat),
+                                             radius, sigma, neighbours,
+                                             tree=tree)
+    elif method in ('nearest', 'linear'):
+        dst_points = np.column_stack((np.ravel(dst_lon), np.ravel(dst_lat)))
+        if method == 'nearest' and tree is not None:
+            rows, cols, weights = _nearest_weights(None, dst_points,
+                                                   tree=tree)
+        elif method == 'nearest':
+            src_points = np.column_stack((np.ravel(src_lon),
+                                          np.ravel(src_lat)))
+            rows, cols, weights = _nearest_weights(src_points, dst_points)
+        else:
+            src_points = np.column_stack((np.ravel(src_lon),
+                                          np.ravel(src_lat)))
+            rows, cols, weights = _linear_weights(src_points, dst_points)
+    else:
+        raise ValueError(f'Invalid regrid method: {method}. '
+                         f'Options are {", ".join(REGRID_METHODS)}')
+
+    return sparse.csr_matrix((weights, (rows, cols)),
+                             shape=(num_dst, num_src))
+
+
+def get_regrid_weights(src_lon, src_lat, dst_lon, dst_lat, method='nearest',
+                       cache_dir=None, **kwargs):
+    """! Get regridding weights, reading them from the cache directory if
+    they were already computed for the same grids. Newly computed weights
+    are written to the cache directory so other processes can reuse them.
+    Only the MAX_MEMORY_WEIGHTS most recently used weights are kept in
+    memory and only the MAX_CACHE_FILES most recently used files are kept
+    in the cache directory.
+
+    @param src_lon longitude values of the source grid
+    @param src_lat latitude values of the source grid
+    @param dst_lon longitude values of the target grid
+    @param dst_lat latitude values of the target grid
+    @param method regridding method: nearest, linear, or gauss
+    @param cache_dir (optional) directory to store weight files. See
+     get_regrid_cache_dir for default
+    @param kwargs additional arguments passed to compute_regrid_weights
+    @returns scipy.sparse CSR matrix with shape (target size, source size)
+    """
+    # a kd-tree only speeds up computing weights and does not change them
+    hash_kwargs = {key: value for key, value in kwargs.items()
+                   if key != 'tree'}
+    grid_hash = get_grid_hash(src_lon, src_lat, dst_lon, dst_lat, method,
+                              **hash_kwargs)
+    if grid_hash in _WEIGHTS_CACHE:
+        _WEIGHTS_CACHE.move_to_end(grid_hash)
+        return _WEIGHTS_CACHE[grid_hash]
+
+    cache_dir = get_regrid_cache_dir(cache_dir)
+    weights_file = os.path.join(cache_dir, f'regrid_weights_{grid_hash}.npz')
+    weights = None
+    if os.path.exists(weights_file):
+        try:
+            weights = sparse.load_npz(weights_file).tocsr()
+            # update modification time so file is kept as recently used
+            os.utime(weights_file)
+        except (OSError, ValueError):
+            weights = None
+
+    if weights is None:
+        weights = compute_regrid_weights(src_lon, src_lat, dst_lon, dst_lat,
+                                         method=method, **kwargs)
+        _write_weights(weights, cache_dir, weights_file)
+
+    _WEIGHTS_CACHE[grid_hash] = weights
+    while len(_WEIGHTS_CACHE) > MAX_MEMORY_WEIGHTS:
+        _WEIGHTS_CACHE.popitem(last=False)
+    return weights
+
+
+def _write_weights(weights, cache_dir, weights_file):
+    """! Write weights to a temporary file then move it into place so that
+    concurrent readers never see a partially written file. Failing to write
+    the cache is not an error because the weights can be recomputed.
+    """
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.npz')
+        with os.fdopen(fd, 'wb') as file_handle:
+            sparse.save_npz(file_handle, weights)
+        os.replace(tmp_file, weights_file)
+    except OSError:
+        return
+
+    _prune_cache_dir(cache_dir)
+
+
+def _prune_cache_dir(cache_dir):
+    """! Remove the least recently used weight files so that at most
+    MAX_CACHE_FILES are kept in the cache directory. Files that are removed
+    by another process first are skipped.
+    """
+    weight_files = []
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if not (entry.name.startswith('regrid_weights_') and
+                        entry.name.endswith('.npz')):
+                    continue
+                try:
+                    weight_files.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return
+
+    weight_files.sort()
+    for _, weight_file in weight_files[:-MAX_CACHE_FILES]:
+        try:
+            os.remove(weight_file)
+        except OSError:
+            pass
+
+
+def apply_regrid_weights(weights, data, dst_shape=None, fill_value=None):
+    """! Apply regridding weights to data with a sparse matrix-vector product.
+    Masked or NaN source values are excluded and the weights of the remaining
+    values are renormalized. Target points without any valid source values
+    are masked or set to fill_value.
+
+    @param weights sparse matrix from get_regrid_weights
+    @param data array whose leading dimensions match the source grid. Any
+     trailing dimensions are regridded independently
+    @param dst_shape (optional) shape of target grid. Defaults to 1D
+    @param fill_value (optional) value to set where there is no valid data.
+     If None, a masked array is returned
+    @returns regridded array
+    """
+    num_dst, num_src = weights.shape
+    values = np.ma.masked_invalid(np.ma.asarray(data, dtype=np.float64))
+    extra_shape = values.shape[_num_grid_dims(values.shape, num_src):]
+    values = values.reshape(num_src, -1)
+    valid = ~np.ma.getmaskarray(values)
+
+    numerator = weights @ np.where(valid, values.filled(0.0), 0.0)
+    denominator = weights @ valid.astype(np.float64)
+    has_data = denominator > 0
+    result = np.divide(numerator, denominator, out=np.zeros_like(numerator),
+                       where=has_data)
+
+    out_shape = (tuple(dst_shape) if dst_shape else (num_dst,)) + extra_shape
+    result = np.ma.masked_array(result, mask=~has_data).reshape(out_shape)
+    if fill_value is not None:
+        return result.filled(fill_value)
+    return result
+
+
+def _num_grid_dims(shape, num_src):
+    """! Get number of leading dimensions of data that make up the grid."""
+    size = 1
+    for index, dim in enumerate(shape):
+        size *= dim
+        if size == num_src:
+            return index + 1
+    raise ValueError(f'Data shape {shape} does not match source grid '
+                     f'with {num_src} points')
+
+
+def regrid(src_lon, src_lat, data, dst_lon, dst_lat, method='nearest',
+           fill_value=None, cache_dir=None, cache=True, **kwargs):
+    """! Regrid data from a source grid to a target grid using cached
+    weights. Set cache to False if the source or target grid changes on
+    every call, e.g. observation locations, to compute the weights without
+    hashing the grids or writing them to the cache directory.
+
+    @param src_lon longitude values of the source grid
+    @param src_lat latitude values of the source grid
+    @param data array whose leading dimensions match the source grid
+    @param dst_lon longitude values of the target grid
+    @param dst_lat latitude values of the target grid
+    @param method regridding method: nearest, linear, or gauss
+    @param fill_value (optional) value to set where there is no valid data.
+     If None, a masked array is returned
+    @param cache_dir (optional) directory to store weight files
+    @param cache (optional) if False, do not read or write cached weights
+    @param kwargs additional arguments passed to compute_regrid_weights,
+     i.e. tree from build_source_tree if cache is False
+    @returns regridded array with the shape of dst_lon
+    """
+    if cache:
+        weights = get_regrid_weights(src_lon, src_lat, dst_lon, dst_lat,
+                                     method=method, cache_dir=cache_dir,
+                                     **kwargs)
+    else:
+        weights = compute_regrid_weights(src_lon, src_lat, dst_lon, dst_lat,
+                                         method=method, **kwargs)
+    return apply_regrid_weights(weights, data, dst_shape=np.shape(dst_lon),
+                                fill_value=fill_value)
@@ -2,6 +2,7 @@ import sys
 import os
 import shutil
 import logging
+import subprocess
 from datetime import datetime
 from importlib import import_module
 
@@ -12,7 +13,11 @@ from .config_util import get_process_list, handle_env_var_config
 from .config_util import handle_tmp_dir, write_final_conf, write_all_commands
 from .config_validate import validate_config_variables
 from .. import get_metplus_version
-from .config_metplus import setup
+from .config_metplus import setup, get_shard_log_timestamp
+from .time_looping import get_shard
+from .profile_util import start_profile, stop_profile, profile_span
+from .profile_util import get_profile_name
+from .realtime import run_realtime_daemon
 from . import camel_to_underscore
 
 
@@ -80,6 +85,22 @@ def pre_run_setup(config_inputs):
     # handle dir to write temporary files
     handle_tmp_dir(config)
 
+    shard_index, shard_count = get_shard(config)
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        logger.error(f'Invalid shard {shard_index} of {shard_count}. '
+                     'SHARD_INDEX must be at least 0 and less than '
+                     'SHARD_COUNT')
+        sys.exit(1)
+
+    # remove plan file from a previous run because records are appended.
+    # if running in shards, the file is removed by the process that
+    # launched the shards
+    plan_file = config.getstr('config', 'PLAN_FILE', '')
+    if plan_file and shard_count == 1:
+        logger.info(f"Writing plan to {plan_file} instead of running commands")
+        if os.path.exists(plan_file):
+            os.remove(plan_file)
+
     # handle OMP_NUM_THREADS environment variable
     handle_env_var_config(config,
                           env_var_name='OMP_NUM_THREADS',
@@ -87,16 +108,22 @@ def pre_run_setup(config_inputs):
 
     config.env = os.environ.copy()
 
+    # record time spent in each part of the run if requested
+    if config.getstr('config', 'PROFILE_FILE', ''):
+        start_profile()
+
     return config
 
 
-def run_metplus(config):
+def run_metplus(config, after_shards=False):
     """!Load all wrapper instances, check for initialization errors, run all
     wrappers, write list of commands to file if any were executed, check
     for wrapper runtime errors.
 
     @param config METplusConfig object to parse process list, pass to wrapper
     constructors, and log any messages.
+    @param after_shards (optional) if True, only run the wrappers that must
+     run after all shards of the run have finished. See get_shard_split
     @returns integer number of errors that occurred
     """
     # Use config object to get the list of processes to call
@@ -119,14 +146,30 @@ def run_metplus(config):
         if init_errors:
             return init_errors
 
+        # run each wrapper as soon as its input files are written
+        if config.getbool('config', 'REALTIME_DAEMON', False):
+            return _run_realtime_daemon(config, processes)
+
+        # shards only run the wrappers that process each run time separately
+        split = get_shard_split(processes)
+        if after_shards:
+            processes = processes[split:]
+            if not processes:
+                return 0
+        elif get_shard(config)[1] > 1 and split < len(processes):
+            _log_after_shards(config, processes[split:])
+            processes = processes[:split]
+
         all_commands = []
         for process in processes:
-            new_commands = process.run_all_times()
+            with profile_span('run_all_times', get_profile_name(process)):
+                new_commands = process.run_all_times()
             if new_commands:
                 all_commands.extend(new_commands)
 
         # write out all commands and environment variables to file
-        write_all_commands(all_commands, config)
+        # add to the commands that were merged from the shards
+        write_all_commands(all_commands, config, append=after_shards)
 
         # compute total number of errors that occurred and output results
         return _check_wrapper_run_errors(processes, config.logger)
@@ -137,6 +180,209 @@ def run_metplus(config):
         return 1
 
 
+def get_shard_split(processes):
+    """!Get the number of wrappers at the start of the process list that can
+    be run in shards. Shards split the run times, so only wrappers that
+    process each run time separately can run in shards. Wrappers that
+    process many run times at once, e.g. RUN_ONCE or RUN_ONCE_PER_LEAD, need
+    the output of all shards, so they and all of the wrappers after them
+    must run after all shards have finished.
+
+    @param processes list of wrapper instances
+    @returns index of the first wrapper that must run after the shards
+    """
+    for index, process in enumerate(processes):
+        if not process.runs_per_run_time():
+            return index
+    return len(processes)
+
+
+def _log_after_shards(config, processes):
+    """!Log the wrappers that are not run by a shard because they must run
+    after all shards have finished.
+
+    @param config METplusConfig object for the run
+    @param processes list of wrapper instances that are not run
+    """
+    names = ', '.join(process.get_wrapper_instance_name()
+                      for process in processes)
+    config.logger.warning(
+        f"Not running {names} in this shard because the wrapper(s) must "
+        "process the output of all shards. They are run after all shards "
+        "finish if --shards is used. Otherwise run them separately after "
+        "all shards have finished"
+    )
+
+
+def _run_realtime_daemon(config, processes):
+    """!Run the wrappers as a daemon that processes each run time when its
+    input files have been written. See run_realtime_daemon.
+
+    @param config METplusConfig object for the run
+    @param processes list of wrapper instances to run
+    @returns integer number of errors that occurred
+    """
+    if get_shard(config)[1] > 1:
+        config.logger.error('REALTIME_DAEMON cannot be used with shards')
+        return 1
+
+    all_commands = run_realtime_daemon(config, processes)
+    if all_commands is None:
+        return 1
+
+    write_all_commands(all_commands, config)
+    return _check_wrapper_run_errors(processes, config.logger)
+
+
+def run_metplus_shards(config, config_inputs, num_shards, script):
+    """!Run METplus in separate processes that each handle a shard of the
+    run times, then merge the all_commands files that each shard wrote.
+    See _launch_shards for how the shards are launched. Wrappers that must
+    process the output of all shards (see get_shard_split) are run by this
+    process after all shards have finished successfully.
+
+    @param config METplusConfig object for the run
+    @param config_inputs list of config files and overrides to pass to each
+     shard
+    @param num_shards number of shards to split the run into
+    @param script path to run_metplus.py
+    @returns integer number of shards that failed
+    """
+    # use the same log timestamp for each shard so they can be merged
+    log_timestamp = config.getstr('config', 'LOG_TIMESTAMP')
+    commands = []
+    for shard_index in range(num_shards):
+        commands.append(
+            [sys.executable, script] + list(config_inputs) +
+            [f'config.LOG_TIMESTAMP_TEMPLATE={log_timestamp}',
+             'config.LOG_TIMESTAMP_USE_DATATIME=False',
+             '--shard', f'{shard_index}/{num_shards}']
+        )
+
+    log_dir = config.getdir('LOG_DIR')
+    config.logger.info(f"Running {num_shards} shards. Logs for each shard "
+                       f"are in {log_dir} and include shard<n> in the name")
+    for command in commands:
+        config.logger.debug(f"Shard command: {' '.join(command)}")
+
+    failed = _launch_shards(commands, config.logger)
+
+    merge_all_commands(config, num_shards)
+    if failed:
+        config.logger.error("Skipping any wrappers that run after all shards "
+                            "because a shard failed")
+        return failed
+
+    return run_metplus(config, after_shards=True)
+
+
+def _launch_shards(commands, logger):
+    """!Run commands concurrently. If an MPI implementation is detected by
+    produtil, i.e. inside a batch allocation, the commands are launched as
+    serial (non-MPI) ranks of one job using mpiserial so they can be spread
+    across the nodes of the allocation. Otherwise they are run as
+    subprocesses on the current node.
+
+    @param commands list of commands, each a list of arguments
+    @param logger log object to write logs
+    @returns integer number of commands that failed
+    """
+    import produtil.run
+    from produtil.mpi_impl.mpi_impl_base import MPISerialMissing
+
+    mpiimpl = produtil.run.detect_mpi()
+    if mpiimpl.can_run_mpi():
+        try:
+            mpiimpl.getmpiserial_path()
+        except MPISerialMissing:
+            logger.warning(f"Cannot find mpiserial program needed to run "
+                           f"shards with {mpiimpl.name()}")
+        else:
+            logger.info(f"Launching shards with {mpiimpl.name()}")
+            program = None
+            for command in commands:
+                exe = produtil.run.exe(command[0], mpiimpl=mpiimpl)
+                rank = produtil.run.mpiserial(exe[command[1:]])
+                program = rank if program is None else program + rank
+
+            ret = produtil.run.run(
+                produtil.run.mpirun(program, mpiimpl=mpiimpl), logger=logger
+            )
+            return 0 if ret == 0 else 1
+
+    logger.info("Running shards on this node")
+    procs = [subprocess.Popen(command) for command in commands]
+    failed = 0
+    for shard_index, proc in enumerate(procs):
+        if proc.wait() != 0:
+            logger.error(f"Shard {shard_index} failed with return code "
+                         f"{proc.returncode}")
+            failed += 1
+    return failed
+
+
+def merge_all_commands(config, num_shards):
+    """!Combine the all_commands files written by each shard of a run into
+    one file that is named as if the run was not split into shards.
+
+    @param config METplusConfig object for the run
+    @param num_shards number of shards the run was split into
+    @returns path to merged file or None if no shard files were found
+    """
+    log_timestamp = config.getstr('config', 'LOG_TIMESTAMP')
+    log_dir = config.getdir('LOG_DIR')
+    filename = os.path.join(log_dir, f'.all_commands.{log_timestamp}')
+    shard_files = [
+        os.path.join(log_dir, '.all_commands.' +
+                     get_shard_log_timestamp(log_timestamp, shard_index))
+        for shard_index in range(num_shards)
+    ]
+    shard_files = [item for item in shard_files if os.path.exists(item)]
+    if not shard_files:
+        config.logger.info("No commands were run by any shard. "
+                           "Skip writing all_commands file")
+        return None
+
+    config.logger.debug(f"Merging all commands from shards to {filename}")
+    with open(filename, 'w') as file_handle:
+        for shard_file in shard_files:
+            with open(shard_file, 'r') as shard_handle:
+                shutil.copyfileobj(shard_handle, file_handle)
+
+    return filename
+
+
+def _write_profile(config):
+    """!Write timing and resource usage that was recorded during the run to
+    PROFILE_FILE and log a summary of the spans that took the most time.
+    If the run is split into shards, the shard is added to the filename.
+
+    @param config METplusConfig object for the run
+    """
+    profile = stop_profile()
+    if profile is None:
+        return
+
+    profile_file = config.getstr('config', 'PROFILE_FILE')
+    shard_index, shard_count = get_shard(config)
+    if shard_count > 1:
+        base, ext = os.path.splitext(profile_file)
+        profile_file = f'{base}.shard{shard_index}{ext}'
+
+    try:
+        profile.write(profile_file)
+    except OSError as err:
+        config.logger.warning(f"Could not write profile {profile_file}: "
+                              f"{err}")
+    else:
+        config.logger.info(f"Wrote profile to {profile_file}")
+
+    config.logger.info("Time spent in each part of the run. Times include "
+                       "time spent in any parts that ran inside them:")
+    for line in profile.get_summary_lines():
+        config.logger.info(line)
+
+
 def _get_wrapper_instance(config, process, instance=None):
     """!Initialize METplus wrapper instance.
 
@@ -251,6 +497,9 @@ def post_run_cleanup(config, app_name, total_errors):
     start_clock_time = datetime.strptime(config.getstr('config', 'CLOCK_TIME'),
                                          '%Y%m%d%H%M%S')
 
+    # write profile of run if requested
+    _write_profile(config)
+
     # rewrite final conf so it contains all of the default values used
     write_final_conf(config)
 
@@ -11,6 +11,7 @@ from csv import reader
 import random
 import string
 import logging
+import weakref
 
 try:
     from .constants import VALID_COMPARISONS, LOWER_TO_WRAPPER_NAME
@@ -18,6 +19,9 @@ except ImportError:
     sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
     from constants import VALID_COMPARISONS, LOWER_TO_WRAPPER_NAME
 
+# results of find_indices_in_config_section for each config object,
+# cleared when config changes
+_CONFIG_INDICES_CACHE = weakref.WeakKeyDictionary()
 
 def get_wrapper_name(process_name):
     """! Determine name of wrapper from string that may not contain the correct
@@ -547,6 +551,19 @@ def find_indices_in_config_section(regex, config, sec='config',
     @returns dictionary where keys are the index number and the value is a
      list of identifiers (if id_index=None) or a list containing None
     """
+    # reuse result if the same search was done and config has not changed
+    generation = getattr(config, 'generation', None)
+    key = (regex, sec, index_index, id_index)
+    cache = None
+    if generation is not None:
+        cache = _CONFIG_INDICES_CACHE.get(config)
+        if cache is None or cache['generation'] != generation:
+            cache = {'generation': generation, 'indices': {}}
+            _CONFIG_INDICES_CACHE[config] = cache
+        if key in cache['indices']:
+            return {index: list(identifiers)
+                    for index, identifiers in cache['indices'][key].items()}
+
     # regex expression must have 2 () items and the 2nd item must be the index
     all_conf = config.keys(sec)
     indices = {}
@@ -567,6 +584,9 @@ def find_indices_in_config_section(regex, config, sec='config',
         else:
             indices[index].append(identifier)
 
+    if cache is not None:
+        cache['indices'][key] = {index: list(identifiers)
+                                 for index, identifiers in indices.items()}
     return indices
 
 
@@ -15,10 +15,12 @@ Condition codes: Varies
 import os
 import re
 import datetime
+import functools
 from dateutil.relativedelta import relativedelta
 
 from . import time_util
 from .constants import COMPRESSION_EXTENSIONS
+from .profile_util import profiled
 
 TEMPLATE_IDENTIFIER_BEGIN = "{"
 TEMPLATE_IDENTIFIER_END = "}"
@@ -298,6 +300,22 @@ def handle_format_delimiter(split_string, idx, shift_seconds, truncate_seconds,
 
     return None
 
+@functools.lru_cache(maxsize=4096)
+def get_template_tag_names(tmpl):
+    """! Get names of the tags in a template that do_string_sub could
+    substitute, i.e. valid from {valid?fmt=%Y%m%d}. The result is cached so
+    a template that is used many times, i.e. a MET config environment
+    variable value, is only searched once. If none of the names are passed
+    to do_string_sub with skip_missing_tags=True, the template is unchanged.
+
+        @param tmpl template to search
+        @returns frozenset of tag names
+    """
+    return frozenset(match.split(FORMATTING_DELIMITER)[0]
+                     for match in re.findall(r'\{([^}{]*)}', tmpl))
+
+
+@profiled('do_string_sub')
 def do_string_sub(tmpl,
                   skip_missing_tags=False,
                   recurse=False,
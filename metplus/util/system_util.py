@@ -6,14 +6,25 @@ Description: METplus utility to handle OS/system calls
 
 import os
 import re
+import fnmatch
 from pathlib import Path
 import getpass
 import gzip
 import bz2
 import zipfile
 import struct
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from produtil.fileop import FileWaiter
 
 from .constants import PYTHON_EMBEDDING_TYPES, COMPRESSION_EXTENSIONS
+from .profile_util import profiled
+
+# size of chunks read when uncompressing input files to the staging dir
+_COPY_BUFFER_SIZE = 1024 * 1024
 
 
 def mkdir_p(path):
@@ -65,10 +76,22 @@ def write_list_to_file(filename, output_list):
             f.write(f"{line}\n")
 
 
+# maximum number of parsed storm files kept in _STORMS_CACHE
+STORMS_CACHE_SIZE = 32
+
+# parsed storm files keyed by path, modification time, size, and sort column
+# so that each file is only read once per run by any wrapper. The least
+# recently used files are removed when the cache is full so it does not grow
+# without limit in a long running process, i.e. the realtime daemon
+_STORMS_CACHE = OrderedDict()
+
+
 def get_storms(filter_filename, id_only=False, sort_column='STORM_ID'):
     """! Get each storm as identified by a column in the input file.
          Create dictionary storm ID as the key and a list of lines for that
-         storm as the value.
+         storm as the value. Results are cached by the file path,
+         modification time, and size so the file is only read again if it
+         has changed.
 
          @param filter_filename name of tcst file to read and extract storm id
          @param sort_column column to use to sort and group storms. Default
@@ -77,9 +100,56 @@ def get_storms(filter_filename, id_only=False, sort_column='STORM_ID'):
           is list of relevant lines from tcst file, 2) header line from tcst
            file. Item with key 'header' contains the header of the tcst file
     """
+    try:
+        stat = os.stat(filter_filename)
+    except OSError:
+        if id_only:
+            return []
+        return {}
+
+    cache_key = (os.path.abspath(filter_filename), stat.st_mtime_ns,
+                 stat.st_size, sort_column)
+    cached = _STORMS_CACHE.get(cache_key)
+    if cached is None:
+        cached = _read_storms(filter_filename, sort_column)
+        _STORMS_CACHE[cache_key] = cached
+        while len(_STORMS_CACHE) > STORMS_CACHE_SIZE:
+            _STORMS_CACHE.popitem(last=False)
+    else:
+        _STORMS_CACHE.move_to_end(cache_key)
+    if id_only:
+        return list(cached['storm_ids'])
+
+    if not cached['storm_ids']:
+        return {}
+
+    # group lines by storm the first time the full dictionary is requested
+    if cached['storm_dict'] is None:
+        storm_dict = {'header': cached['header']}
+        # for each storm, get all lines for that storm
+        for storm in cached['storm_ids']:
+            storm_dict[storm] = [line for line in cached['lines']
+                                 if storm in line]
+        cached['storm_dict'] = storm_dict
+
+    # copy lists so changes made by the caller do not modify the cache
+    return {key: value if key == 'header' else list(value)
+            for key, value in cached['storm_dict'].items()}
+
+
+def _read_storms(filter_filename, sort_column):
+    """! Read storm file and get the sorted list of unique storm IDs.
+
+         @param filter_filename name of tcst file to read
+         @param sort_column column to use to sort and group storms
+         @returns dictionary containing header line, list of other lines,
+          sorted list of storm IDs (empty if file could not be read), and
+          storm_dict set to None to be filled in by get_storms
+    """
     # Initialize a set because we want unique storm ids.
     storm_id_list = set()
-
+    header = None
+    lines = []
     try:
         with open(filter_filename, "r") as file_handle:
             header, *lines = file_handle.readlines()
@@ -88,25 +158,16 @@ def get_storms(filter_filename, id_only=False, sort_column='STORM_ID'):
         for line in lines:
             storm_id_list.add(line.split()[storm_id_column])
     except (ValueError, FileNotFoundError):
-        if id_only:
-            return []
-        return {}
+        storm_id_list = set()
 
     # sort the unique storm ids, copy the original
     # set by using sorted rather than sort.
-    sorted_storms = sorted(storm_id_list)
-    if id_only:
-        return sorted_storms
-
-    if not sorted_storms:
-        return {}
-
-    storm_dict = {'header': header}
-    # for each storm, get all lines for that storm
-    for storm in sorted_storms:
-        storm_dict[storm] = [line for line in lines if storm in line]
-
-    return storm_dict
+    return {
+        'header': header,
+        'lines': lines,
+        'storm_ids': sorted(storm_id_list),
+        'storm_dict': None,
+    }
 
 
 def prune_empty(output_dir, logger):
@@ -170,6 +231,206 @@ def get_files(filedir, filename_regex):
     return sorted(file_paths)
 
 
+class DirectoryListing:
+    """! Cache of directory contents used to find many files without
+    repeatedly querying the file system. Each directory is listed once, then
+    wildcard patterns and file existence checks are resolved from the cached
+    listing. The cache should only be used while files are not expected to
+    be added or removed, e.g. while finding all input files for a run.
+    """
+    MAGIC_CHARS = re.compile('[*?[]')
+
+    def __init__(self):
+        # key is directory path, value is dict of name: True if directory
+        self._listings = {}
+        # storage for values derived from the listings, e.g. parsed times
+        self.memo = {}
+
+    def listdir(self, path):
+        """! Get contents of a directory, reading it the first time only.
+
+        @param path directory to list
+        @returns dictionary where key is the name of each item in the
+         directory and value is True if the item is a directory. Empty if
+         the directory does not exist
+        """
+        path = path or os.curdir
+        listing = self._listings.get(path)
+        if listing is not None:
+            return listing
+
+        listing = {}
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        listing[entry.name] = entry.is_dir()
+                    except OSError:
+                        listing[entry.name] = False
+        except OSError:
+            pass
+
+        self._listings[path] = listing
+        return listing
+
+    def forget(self, path):
+        """! Discard the cached listing of a directory and any values derived
+        from the listings so that it is read again, e.g. after waiting for
+        files to be written to it.
+
+        @param path directory that may have changed
+        """
+        self._listings.pop(path or os.curdir, None)
+        self.memo.clear()
+
+    def exists(self, path):
+        """! Check if a file or directory exists in the cached listing.
+
+        @param path file path to check
+        @returns True if path exists
+        """
+        dir_name, base_name = os.path.split(path)
+        if not base_name:
+            return os.path.exists(path)
+        return base_name in self.listdir(dir_name)
+
+    def isdir(self, path):
+        """! Check if path is a directory in the cached listing.
+
+        @param path path to check
+        @returns True if path is a directory
+        """
+        dir_name, base_name = os.path.split(path)
+        if not base_name:
+            return os.path.isdir(path)
+        return self.listdir(dir_name).get(base_name, False)
+
+    def glob(self, pattern):
+        """! Get files that match a wildcard pattern. Equivalent to
+        sorted(glob.glob(pattern)) but each directory is only listed once.
+
+        @param pattern path that may contain wildcard characters (*, ?, [])
+        @returns sorted list of paths that match the pattern
+        """
+        if not self.MAGIC_CHARS.search(pattern):
+            return [pattern] if self.exists(pattern) else []
+
+        dir_name, base_name = os.path.split(pattern)
+        if not base_name:
+            return [os.path.join(path, '') for path in self.glob(dir_name)
+                    if self.isdir(path)]
+
+        if self.MAGIC_CHARS.search(dir_name):
+            dirs = [path for path in self.glob(dir_name) if self.isdir(path)]
+        else:
+            dirs = [dir_name]
+
+        matches = []
+        for current_dir in dirs:
+            names = self.listdir(current_dir)
+            # hidden files only match if pattern starts with a dot
+            if not base_name.startswith('.'):
+                names = [name for name in names if not name.startswith('.')]
+            matches.extend(os.path.join(current_dir, name)
+                           for name in fnmatch.filter(names, base_name))
+        return sorted(matches)
+
+    def may_preprocess(self, filename, data_type, config):
+        """! Check if preprocess_file could find a file using the cached
+        listings. This is used to skip the checks in preprocess_file for
+        files that clearly do not exist.
+
+        @param filename path to file as passed to preprocess_file
+        @param data_type input data type as passed to preprocess_file
+        @param config METplusConfig object
+        @returns False if the file, its compressed or Gempak equivalents, and
+         its staged copy do not exist, True otherwise
+        """
+        if not filename or os.path.sep not in filename:
+            return True
+
+        if data_type and 'PYTHON' in data_type:
+            return True
+
+        if any(filename.startswith(py_embed_type) or
+               os.path.basename(filename) == py_embed_type
+               for py_embed_type in PYTHON_EMBEDDING_TYPES):
+            return True
+
+        candidates = [filename, f'{filename[:-2]}grd']
+        candidates.extend(f'{filename}{ext}' for ext in COMPRESSION_EXTENSIONS)
+        if any(self.exists(candidate) for candidate in candidates):
+            return True
+
+        return self.exists(config.getdir('STAGING_DIR') + filename)
+
+
+class InputFileWaiter(FileWaiter):
+    """! Wait for input files to be written. A file is ready if it or a
+    compressed copy that preprocess_file can uncompress exists and meets the
+    size and age requirements. Directories are watched with inotify if it is
+    available so files are found as soon as they are written.
+    """
+    def candidates(self, filename):
+        """! Get the paths that preprocess_file accepts for a file.
+
+        @param filename path to input file
+        @returns list of the path and its compressed equivalents
+        """
+        return [filename] + [f'{filename}{ext}'
+                             for ext in COMPRESSION_EXTENSIONS]
+
+    def check(self, filename, logger=None):
+        """! Check if the file or a compressed copy is ready.
+
+        @param filename path to input file
+        @param logger (optional) logger to log each file that is checked
+        @returns True if a candidate meets the requirements
+        """
+        check = super().check
+        return any(check(path, logger) for path in self.candidates(filename))
+
+    def ready_time(self, filename):
+        """! Get the earliest time that the file or a compressed copy will
+        be old enough.
+
+        @param filename path to input file
+        @returns time in seconds since the epoch or None if no candidate
+         exists
+        """
+        ready_time = super().ready_time
+        times = [ready_time(path) for path in self.candidates(filename)]
+        times = [ready for ready in times if ready is not None]
+        return min(times) if times else None
+
+
+@profiled('wait_for_input_files')
+def wait_for_input_files(file_paths, wait_time, logger, sleep_time=20,
+                         min_age=0):
+    """! Wait for input files to exist. Returns immediately if all of the
+    files exist already.
+
+    @param file_paths list of paths to input files
+    @param wait_time maximum number of seconds to wait
+    @param logger logger to log status
+    @param sleep_time maximum number of seconds between checks of all files
+    @param min_age number of seconds that a file must not have been modified
+     before it is considered complete
+    @returns True if all files were found, False if wait_time was reached
+    """
+    waiter = InputFileWaiter(min_size=1, min_mtime_age=min_age or None)
+    missing = [path for path in file_paths if not waiter.check(path)]
+    if not missing:
+        return True
+
+    logger.info(f'Waiting up to {wait_time} seconds for {len(missing)} '
+                'input files to be written')
+    waiter.add(missing)
+    return waiter.checkfiles(maxwait=wait_time, sleeptime=sleep_time,
+                             logger=logger, log_each_file=False)
+
+
+@profiled('preprocess_file')
 def preprocess_file(filename, data_type, config, allow_dir=False):
     """ Decompress gzip, bzip, or zip files or convert Gempak files to NetCDF
         Args:
@@ -253,31 +514,17 @@ def preprocess_file(filename, data_type, config, allow_dir=False):
         mkdir_p(os.path.dirname(outpath))
 
     # uncompress gz, bz2, or zip file
-    if os.path.isfile(filename+".gz"):
+    for ext, open_func in (
+            ('.gz', lambda path: gzip.open(path, 'rb')),
+            ('.bz2', lambda path: bz2.open(path, 'rb')),
+            ('.zip', lambda path: _open_zip_member(path, filename))):
+        if not os.path.isfile(filename+ext):
+            continue
         if config.logger:
-            config.logger.debug("Uncompressing gz file to {}".format(outpath))
-        with gzip.open(filename+".gz", 'rb') as infile:
-            with open(outpath, 'wb') as outfile:
-                outfile.write(infile.read())
-                infile.close()
-                outfile.close()
-                return outpath
-    elif os.path.isfile(filename+".bz2"):
-        if config.logger:
-            config.logger.debug("Uncompressing bz2 file to {}".format(outpath))
-        with open(filename+".bz2", 'rb') as infile:
-            with open(outpath, 'wb') as outfile:
-                outfile.write(bz2.decompress(infile.read()))
-                infile.close()
-                outfile.close()
-                return outpath
-    elif os.path.isfile(filename+".zip"):
-        if config.logger:
-            config.logger.debug("Uncompressing zip file to {}".format(outpath))
-        with zipfile.ZipFile(filename+".zip") as z:
-            with open(outpath, 'wb') as f:
-                f.write(z.read(os.path.basename(filename)))
-                return outpath
+            config.logger.debug(f"Uncompressing {ext[1:]} file to {outpath}")
+        with open_func(filename+ext) as infile:
+            _write_staged_file(infile, outpath)
+        return outpath
 
     # if input doesn't need to exist, return filename
     if not config.getbool('config', 'INPUT_MUST_EXIST', True):
@@ -286,6 +533,39 @@ def preprocess_file(filename, data_type, config, allow_dir=False):
     return None
 
 
+@contextmanager
+def _open_zip_member(zip_path, filename):
+    """! Open the file inside a zip archive that has the same name as the
+    file without the .zip extension.
+
+    @param zip_path path to zip file
+    @param filename path to file without the .zip extension
+    @returns file object to read the uncompressed data
+    """
+    with zipfile.ZipFile(zip_path) as zip_file:
+        with zip_file.open(os.path.basename(filename)) as infile:
+            yield infile
+
+
+def _write_staged_file(infile, outpath):
+    """! Write uncompressed data to the staging directory. The data is
+    streamed to a temporary file that is renamed when it is complete so that
+    a partially written file is never used if staging is interrupted or if
+    the same file is staged by more than one thread or process.
+
+    @param infile file object to read uncompressed data from
+    @param outpath path of staged file to write
+    """
+    tmp_path = f'{outpath}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as outfile:
+            shutil.copyfileobj(infile, outfile, _COPY_BUFFER_SIZE)
+        os.replace(tmp_path, outpath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def netcdf_has_var(file_path, name, level):
     """! Check if name is a variable in the NetCDF file. If not, check if
          {name}_{level} (with level prefix letter removed, i.e. 06 from A06)
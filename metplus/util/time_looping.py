@@ -1,5 +1,7 @@
 import re
+import weakref
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
 
 from .string_manip import getlist, getlistint
 from .time_util import get_relativedelta, add_to_time_input
@@ -8,6 +10,9 @@ from .time_util import ti_get_seconds_from_relativedelta
 from .string_template_substitution import do_string_sub
 from .config_util import log_runtime_banner
 
+# lead sequences for each config object, cleared when config changes
+_LEAD_SEQ_CACHE = weakref.WeakKeyDictionary()
+
 
 def time_generator(config):
     """! Generator used to read METplusConfig variables for time looping
@@ -127,6 +132,187 @@ def get_start_and_end_times(config):
     return start_dt, end_dt
 
 
+def get_run_time_arrays(config, skip_times=None, offsets=None):
+    """! Get all run times and forecast leads as NumPy arrays instead of
+    looping over time_generator and get_lead_sequence. There is one item
+    in each array for each combination of run time, forecast lead, and
+    offset. Combinations with a valid time that should be skipped are
+    removed. Runs that use a fixed increment and forecast leads without
+    months or years are computed without looping over each time.
+    Requires NumPy.
+
+    @param config METplusConfig object to read
+    @param skip_times (optional) dictionary of times to skip, i.e. from
+     get_skip_times. If not set, SKIP_TIMES is read from config
+    @param offsets (optional) list of time offsets in seconds. Defaults to 0
+    @returns dictionary with keys init, valid, and da_init containing
+     datetime64 arrays and lead and offset containing timedelta64 arrays,
+     or None if something went wrong
+    """
+    import numpy as np
+
+    prefix = get_time_prefix(config)
+    if not prefix:
+        return None
+
+    run_times = _get_run_times_array(config, prefix)
+    if run_times is None:
+        return None
+
+    # INIT_SEQ uses the valid hour to compute forecast leads,
+    # so get lead sequence for each unique hour
+    hours = run_times.astype('datetime64[h]').astype('int64') % 24
+    loop_key = prefix.lower()
+    runs = []
+    leads = []
+    run_indices = []
+    for hour in np.unique(hours):
+        hour_indices = np.nonzero(hours == hour)[0]
+        hour_runs = run_times[hour_indices]
+        input_dict = {loop_key: hour_runs[0].astype(datetime)}
+        lead_seq = get_lead_sequence(config, input_dict)
+        if not lead_seq or '*' in lead_seq:
+            config.logger.error('Could not get forecast leads for run times')
+            return None
+
+        # lead sequence is [0] if no leads are set
+        lead_seq = [lead if isinstance(lead, relativedelta)
+                    else relativedelta(seconds=lead) for lead in lead_seq]
+
+        hour_runs, hour_leads = _get_runs_and_leads(hour_runs, lead_seq,
+                                                    prefix)
+        runs.append(hour_runs)
+        leads.append(hour_leads)
+        run_indices.append(np.repeat(hour_indices, len(lead_seq)))
+
+    # put items back in the order of the run times
+    runs = np.concatenate(runs)
+    leads = np.concatenate(leads)
+    order = np.argsort(np.concatenate(run_indices), kind='stable')
+    runs = runs[order]
+    leads = leads[order]
+    if prefix == 'INIT':
+        init = runs
+        valid = runs + leads
+    else:
+        valid = runs
+        init = runs - leads
+
+    if offsets is None:
+        offsets = [0]
+    offsets = np.asarray(offsets, dtype='int64').astype('timedelta64[s]')
+    num_offsets = len(offsets)
+    init = np.repeat(init, num_offsets)
+    valid = np.repeat(valid, num_offsets)
+    leads = np.repeat(leads, num_offsets)
+    offsets = np.tile(offsets, len(runs))
+
+    if skip_times is None:
+        skip_times = get_skip_times(config)
+    keep = ~get_skip_time_mask(valid, skip_times)
+
+    return {
+        'init': init[keep],
+        'valid': valid[keep],
+        'lead': leads[keep],
+        'offset': offsets[keep],
+        'da_init': valid[keep] + offsets[keep],
+    }
+
+
+def _get_run_times_array(config, prefix):
+    """! Get all run times as a datetime64 array. Use NumPy to compute times
+    if _BEG, _END, and _INCREMENT are used and the increment does not
+    contain months or years, otherwise use time_generator.
+
+    @param config METplusConfig object to read
+    @param prefix INIT or VALID
+    @returns datetime64 array or None if something went wrong
+    """
+    import numpy as np
+
+    interval = None
+    if not config.has_option('config', f'{prefix}_LIST'):
+        interval = get_relativedelta(
+            config.getstr('config', f'{prefix}_INCREMENT', '60')
+        )
+    interval_seconds = ti_get_seconds_from_relativedelta(interval)
+
+    if not interval_seconds or interval_seconds < 60:
+        run_times = []
+        for time_info in time_generator(config):
+            if time_info is None:
+                return None
+            run_times.append(time_info[prefix.lower()])
+        return np.array(run_times, dtype='datetime64[s]')
+
+    start_dt, end_dt = get_start_and_end_times(config)
+    if start_dt is None or end_dt is None:
+        return None
+
+    start = np.datetime64(start_dt, 's')
+    end = np.datetime64(end_dt, 's')
+    return np.arange(start, end + np.timedelta64(1, 's'),
+                     np.timedelta64(interval_seconds, 's'))
+
+
+def _get_runs_and_leads(run_times, lead_seq, prefix):
+    """! Pair each run time with each forecast lead. Leads that contain
+    months or years are computed separately for each run time.
+
+    @param run_times datetime64 array of run times
+    @param lead_seq list of relativedelta forecast leads
+    @param prefix INIT or VALID
+    @returns tuple of datetime64 array of run times and timedelta64 array
+     of forecast leads, each with one item per run time/lead pair
+    """
+    import numpy as np
+
+    lead_seconds = [ti_get_seconds_from_relativedelta(lead)
+                    for lead in lead_seq]
+    if None not in lead_seconds:
+        leads = np.asarray(lead_seconds, dtype='int64')
+        return (np.repeat(run_times, len(leads)),
+                np.tile(leads.astype('timedelta64[s]'), len(run_times)))
+
+    runs = np.repeat(run_times, len(lead_seq))
+    leads = []
+    for run_dt in run_times.astype(datetime):
+        for lead in lead_seq:
+            if prefix == 'INIT':
+                leads.append((run_dt + lead) - run_dt)
+            else:
+                leads.append(run_dt - (run_dt - lead))
+    return runs, np.array(leads, dtype='timedelta64[s]')
+
+
+def get_shard(config):
+    """! Get the shard of the run that this process should handle. Runs can
+    be split into SHARD_COUNT shards that are run separately, i.e. by
+    run_metplus.py --shard, so that each process handles a different set of
+    run times.
+
+    @param config METplusConfig object to read
+    @returns tuple of shard index (starting at 0) and number of shards
+    """
+    return (config.getint('config', 'SHARD_INDEX', 0),
+            config.getint('config', 'SHARD_COUNT', 1))
+
+
+def is_in_shard(shard, item_index):
+    """! Check if an item should be processed by a shard. Items are assigned
+    to shards in turn, so shard i of N handles item i, i+N, i+2N, etc. This
+    keeps the work of each shard similar if the cost of each run time varies
+    over the run, e.g. fewer forecast leads at the end of the run.
+
+    @param shard tuple of shard index and number of shards from get_shard
+    @param item_index index of item, i.e. run time, in the list of all items
+    @returns True if the item should be processed, False if not
+    """
+    shard_index, shard_count = shard
+    return shard_count <= 1 or item_index % shard_count == shard_index
+
+
 def loop_over_times_and_call(config, processes, custom=None):
     """! Loop over all run times and call wrappers listed in config
 
@@ -138,30 +324,50 @@ def loop_over_times_and_call(config, processes, custom=None):
     """
     # keep track of commands that were run
     all_commands = []
-    for time_input in time_generator(config):
+    shard = get_shard(config)
+    for index, time_input in enumerate(time_generator(config)):
         if not isinstance(processes, list):
             processes = [processes]
 
+        if time_input is not None and not is_in_shard(shard, index):
+            continue
+
         for process in processes:
             # if time could not be read, increment errors for each process
             if time_input is None:
                 process.errors += 1
                 continue
 
-            log_runtime_banner(config, time_input, process)
-            add_to_time_input(time_input,
-                              instance=process.instance,
-                              custom=custom)
-
-            process.clear()
-            process.run_at_time(time_input)
-            if process.all_commands:
-                all_commands.extend(process.all_commands)
-            process.all_commands.clear()
+            all_commands.extend(
+                run_process_at_time(config, process, time_input, custom)
+            )
 
     return all_commands
 
 
+def run_process_at_time(config, process, time_input, custom=None):
+    """! Call a wrapper for a single run time
+
+    @param config METplusConfig object
+    @param process CommandBuilder subclass object (Wrapper) to call
+    @param time_input dictionary containing the run time, i.e. from
+     time_generator
+    @param custom (optional) custom loop string value
+    @returns list of tuples with the commands that were run and the
+     environment variables that were set for each
+    """
+    log_runtime_banner(config, time_input, process)
+    add_to_time_input(time_input,
+                      instance=process.instance,
+                      custom=custom)
+
+    process.clear()
+    process.run_at_time(time_input)
+    commands = list(process.all_commands)
+    process.all_commands.clear()
+    return commands
+
+
 def _validate_time_values(start_dt, end_dt, time_interval, prefix, logger):
     if not start_dt:
         logger.error(f"Could not read {prefix}_BEG")
@@ -251,6 +457,33 @@ def _get_current_dt(time_string, time_format, clock_dt, logger):
     return current_dt
 
 
+class SkipTimes(dict):
+    """! Dictionary of times to skip where the key is a datetime format and
+    the value is a list of times in that format, i.e. {'%d': ['30', '31']}.
+    The values are also converted to sets of integers the first time they
+    are used so that checking a run time only requires formatting the time
+    once per format and a set lookup. The contents should not be modified
+    after the first call to get_int_sets.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._int_sets = None
+
+    def get_int_sets(self):
+        """! Get times to skip for each format as sets of integers
+
+        @returns list of tuples containing format and set of integers
+        """
+        if self._int_sets is None:
+            self._int_sets = _get_skip_int_sets(self)
+        return self._int_sets
+
+
+def _get_skip_int_sets(skip_times):
+    return [(time_format, {int(item) for item in skip_time_list})
+            for time_format, skip_time_list in skip_times.items()]
+
+
 def get_skip_times(config, wrapper_name=None):
     """! Read SKIP_TIMES config variable and populate dictionary of times that should be skipped.
          SKIP_TIMES should be in the format: "%m:begin_end_incr(3,11,1)", "%d:30,31", "%Y%m%d:20201031"
@@ -298,7 +531,7 @@ def get_skip_times(config, wrapper_name=None):
             config.logger.error(f"SKIP_TIMES item does not match format: {skip_item}")
             return None
 
-    return skip_times_dict
+    return SkipTimes(skip_times_dict)
 
 
 def skip_time(time_info, skip_times):
@@ -311,23 +544,103 @@ def skip_time(time_info, skip_times):
     if not skip_times:
         return False
 
-    for time_format, skip_time_list in skip_times.items():
-        # extract time information from valid time based on skip time format
-        run_time_value = time_info.get('valid')
-        if not run_time_value:
-            return False
+    # extract time information from valid time based on skip time format
+    run_time_value = time_info.get('valid')
+    if not run_time_value:
+        return False
 
-        run_time_value = run_time_value.strftime(time_format)
+    if isinstance(skip_times, SkipTimes):
+        skip_int_sets = skip_times.get_int_sets()
+    else:
+        skip_int_sets = _get_skip_int_sets(skip_times)
 
-        # loop over times to skip for this format and check if it matches
-        for skip_time in skip_time_list:
-            if int(run_time_value) == int(skip_time):
-                return True
+    for time_format, skip_int_set in skip_int_sets:
+        if int(run_time_value.strftime(time_format)) in skip_int_set:
+            return True
 
     # if skip time never matches, return False
     return False
 
 
+# width of each datetime format directive that can be computed with NumPy
+_SKIP_FORMAT_WIDTHS = {
+    'Y': 4,
+    'm': 2,
+    'd': 2,
+    'H': 2,
+    'M': 2,
+    'S': 2,
+    'j': 3,
+}
+
+
+def get_skip_time_mask(valid_times, skip_times):
+    """! Check an array of valid times against times to skip. This performs
+    the same check as skip_time for many times at once. Formats that only
+    contain %Y, %m, %d, %H, %M, %S, and %j are computed with NumPy. Other
+    formats are handled by calling strftime for each time. Requires NumPy.
+
+    @param valid_times datetime64 array of valid times
+    @param skip_times dictionary of times to skip, i.e. from get_skip_times
+    @returns boolean array that is True for each time that should be skipped
+    """
+    import numpy as np
+
+    valid_times = np.asarray(valid_times, dtype='datetime64[s]')
+    mask = np.zeros(valid_times.shape, dtype=bool)
+    if not skip_times:
+        return mask
+
+    if isinstance(skip_times, SkipTimes):
+        skip_int_sets = skip_times.get_int_sets()
+    else:
+        skip_int_sets = _get_skip_int_sets(skip_times)
+
+    for time_format, skip_int_set in skip_int_sets:
+        values = _get_time_format_ints(valid_times, time_format)
+        mask |= np.isin(values, list(skip_int_set))
+
+    return mask
+
+
+def _get_time_format_ints(times, time_format):
+    """! Get integer value of each time formatted with a datetime format,
+    i.e. %Y%m%d gives 20201031 for 2020-10-31.
+
+    @param times datetime64 array
+    @param time_format datetime format string
+    @returns array of integers
+    """
+    import numpy as np
+
+    directives = re.findall(r'%(.)', time_format)
+    if (re.sub(r'%.', '', time_format) or
+            any(item not in _SKIP_FORMAT_WIDTHS for item in directives)):
+        return np.array([int(time_dt.strftime(time_format))
+                         for time_dt in times.astype(datetime)],
+                        dtype='int64')
+
+    years = times.astype('datetime64[Y]')
+    months = times.astype('datetime64[M]')
+    days = times.astype('datetime64[D]')
+    hours = times.astype('datetime64[h]')
+    minutes = times.astype('datetime64[m]')
+    fields = {
+        'Y': years.astype('int64') + 1970,
+        'm': months.astype('int64') % 12 + 1,
+        'd': (days - months).astype('int64') + 1,
+        'H': (hours - days).astype('int64'),
+        'M': (minutes - hours).astype('int64'),
+        'S': (times - minutes).astype('int64'),
+        'j': (days - years).astype('int64') + 1,
+    }
+    values = np.zeros(times.shape, dtype='int64')
+    for directive in directives:
+        values = (values * 10 ** _SKIP_FORMAT_WIDTHS[directive] +
+                  fields[directive])
+    return values
+
+
 def get_lead_sequence(config, input_dict=None, wildcard_if_empty=False):
     """!Get forecast lead list from LEAD_SEQ or compute it from INIT_SEQ.
         Restrict list by LEAD_SEQ_[MIN/MAX] if set. Now returns list of relativedelta objects
@@ -339,6 +652,34 @@ def get_lead_sequence(config, input_dict=None, wildcard_if_empty=False):
              list with '*' if this is True, otherwise return a list with 0
             @returns list of relativedelta objects or a list containing 0 if none are found
     """
+    generation = getattr(config, 'generation', None)
+    if generation is None:
+        return _get_lead_sequence(config, input_dict, wildcard_if_empty)
+
+    # INIT_SEQ is the only setting that uses the run time and it only
+    # depends on the valid hour, so use it in the key instead of the time
+    valid = None if input_dict is None else input_dict.get('valid')
+    key = (input_dict is None, wildcard_if_empty,
+           getattr(valid, 'hour', valid))
+
+    cache = _LEAD_SEQ_CACHE.get(config)
+    if cache is None or cache['generation'] != generation:
+        cache = None
+    elif key in cache['leads']:
+        leads = cache['leads'][key]
+        return None if leads is None else list(leads)
+
+    leads = _get_lead_sequence(config, input_dict, wildcard_if_empty)
+
+    # reading config may set defaults, so use generation after reading
+    if cache is None or cache['generation'] != config.generation:
+        cache = {'generation': config.generation, 'leads': {}}
+        _LEAD_SEQ_CACHE[config] = cache
+    cache['leads'][key] = None if leads is None else tuple(leads)
+    return leads
+
+
+def _get_lead_sequence(config, input_dict, wildcard_if_empty):
 
     out_leads = []
     lead_min, lead_max, no_max = _get_lead_min_max(config)
@@ -12,7 +12,11 @@ Output Files: N/A
 import os
 import sys
 import glob
+import json
+import threading
 from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABCMeta
 from inspect import getframeinfo, stack
 
@@ -21,6 +25,7 @@ from .command_runner import CommandRunner
 from ..util.constants import PYTHON_EMBEDDING_TYPES, COMPRESSION_EXTENSIONS
 from ..util import getlist, preprocess_file, loop_over_times_and_call
 from ..util import do_string_sub, ti_calculate, get_seconds_from_string
+from ..util import get_template_tag_names
 from ..util import get_time_from_file, shift_time_seconds, seconds_to_met_time
 from ..util import replace_config_from_section
 from ..util import METConfig
@@ -31,7 +36,14 @@ from ..util import remove_quotes, split_level
 from ..util import get_field_info, format_field_info
 from ..util import get_wrapper_name, is_python_script
 from ..util.met_config import add_met_config_dict, handle_climo_dict
-from ..util import mkdir_p, get_skip_times
+from ..util import mkdir_p, get_skip_times, DirectoryListing
+from ..util import wait_for_input_files
+from ..util import py_embed_cache
+from ..util import profile_span, profiled, get_profile_name
+
+# used to prevent commands prepared in different threads from writing to the
+# plan file at the same time
+_PLAN_FILE_LOCK = threading.Lock()
 
 # pylint:disable=pointless-string-statement
 '''!@namespace CommandBuilder
@@ -65,6 +77,12 @@ class CommandBuilder:
         self.param = ""
         self.all_commands = []
 
+        # cached directory contents used while finding many input files
+        self._dir_listing = None
+
+        # time info of the current run, used to write the plan file
+        self._current_time_info = None
+
         # store values to set in environment variables for each command
         self.env_var_dict = {}
 
@@ -89,7 +107,8 @@ class CommandBuilder:
         self.env = config.env if hasattr(config, 'env') else os.environ.copy()
 
         # populate c_dict dictionary
-        self.c_dict = self.create_c_dict()
+        with profile_span('create_c_dict', get_profile_name(self)):
+            self.c_dict = self.create_c_dict()
 
         # if wrapper has a config file, read MET config overrides variable
         if 'CONFIG_FILE' in self.c_dict:
@@ -190,6 +209,19 @@ class CommandBuilder:
                                                          'INPUT_MUST_EXIST',
                                                          True)
 
+        # option to wait for input files to be written instead of
+        # reporting them as missing, e.g. for real-time processing
+        c_dict['INPUT_WAIT_TIME'] = self.config.getseconds('config',
+                                                           'INPUT_WAIT_TIME',
+                                                           0)
+        if c_dict['INPUT_WAIT_TIME'] > 0:
+            c_dict['INPUT_WAIT_SLEEP_TIME'] = (
+                self.config.getseconds('config', 'INPUT_WAIT_SLEEP_TIME', 20)
+            )
+            c_dict['INPUT_WAIT_MIN_AGE'] = (
+                self.config.getseconds('config', 'INPUT_WAIT_MIN_AGE', 0)
+            )
+
         c_dict['USER_SHELL'] = self.config.getstr('config',
                                                   'USER_SHELL',
                                                   'bash')
@@ -198,6 +230,33 @@ class CommandBuilder:
                                                        'DO_NOT_RUN_EXE',
                                                        False)
 
+        # option to write each command that would be run, its input and
+        # output files, and the size of its input to a JSON Lines file
+        # instead of running the commands
+        c_dict['PLAN_FILE'] = self.config.getstr('config', 'PLAN_FILE', '')
+        if c_dict['PLAN_FILE']:
+            c_dict['DO_NOT_RUN_EXE'] = True
+            c_dict['PLAN_WRAPPERS'] = [
+                get_wrapper_name(item) or item for item in
+                getlist(self.config.getstr('config', 'PLAN_WRAPPERS', ''))
+            ]
+            for edge in ('BEG', 'END'):
+                c_dict[f'PLAN_TIME_{edge}'] = (
+                    self.config.getstr('config', f'PLAN_TIME_{edge}', '')
+                )
+
+        # option to run each Python Embedding script once per unique set of
+        # arguments and have the MET tools read the cached output instead
+        c_dict['PYTHON_EMBEDDING_CACHE'] = (
+            self.config.getbool('config', 'PYTHON_EMBEDDING_CACHE', False)
+        )
+        if c_dict['PYTHON_EMBEDDING_CACHE']:
+            c_dict['PYTHON_EMBEDDING_CACHE_DIR'] = self.config.getdir(
+                'PYTHON_EMBEDDING_CACHE_DIR',
+                os.path.join(self.config.getdir('STAGING_DIR'),
+                             'python_embedding_cache')
+            )
+
         return c_dict
 
     def clear(self):
@@ -218,6 +277,9 @@ class CommandBuilder:
             Reformat as needed. Print list of variables that were set and their values.
             Args:
               @param time_info dictionary containing timing info from current run"""
+        if time_info is not None:
+            self._current_time_info = time_info
+
         if time_info is None:
             clock_time_fmt = (
                 datetime.strptime(self.config.getstr('config', 'CLOCK_TIME'),
@@ -229,9 +291,12 @@ class CommandBuilder:
         # wrapper, apply time info substitution if available, and
         # set environment variable setting empty string if key is not set in
         # the env_var_dict dictionary
+        # only values that contain tags for the time info are substituted,
+        # i.e. MET config dictionaries without tags are used as they are
         for key in self.env_var_keys:
             value = self.env_var_dict.get(key, '')
-            if time_info:
+            if (time_info and
+                    not get_template_tag_names(value).isdisjoint(time_info)):
                 value = do_string_sub(value,
                                       skip_missing_tags=True,
                                       **time_info)
@@ -260,8 +325,10 @@ class CommandBuilder:
         for env_var in self.config.keys('user_env_vars'):
             # perform string substitution on each variable
             raw_env_var_value = self.config.getraw('user_env_vars', env_var)
-            env_var_value = do_string_sub(raw_env_var_value,
-                                          **time_info)
+            env_var_value = raw_env_var_value
+            if get_template_tag_names(raw_env_var_value):
+                env_var_value = do_string_sub(raw_env_var_value,
+                                              **time_info)
             self.add_env_var(env_var, env_var_value)
 
     def print_all_envs(self, print_copyable=True, print_each_item=True):
@@ -486,6 +553,7 @@ class CommandBuilder:
 
         return None, time_info
 
+    @profiled('find_data', method=True)
     def find_data(self, time_info, data_type='', mandatory=True,
                   return_list=False, allow_dir=False):
         """! Finds the data file to compare
@@ -658,7 +726,10 @@ class CommandBuilder:
                 continue
 
             # if wildcard expression, get all files that match
-            wildcard_files = sorted(glob.glob(full_path))
+            if self._dir_listing is not None:
+                wildcard_files = self._dir_listing.glob(full_path)
+            else:
+                wildcard_files = sorted(glob.glob(full_path))
             self.logger.debug(f'Wildcard file pattern: {full_path}')
             self.logger.debug(f'{str(len(wildcard_files))} files '
                               'match pattern')
@@ -675,14 +746,12 @@ class CommandBuilder:
         if not input_must_exist:
             return [value for value, _ in check_file_list]
 
+        self._wait_for_input_files(check_file_list, data_type)
+        processed_paths = self._preprocess_input_files(check_file_list,
+                                                       data_type, allow_dir)
         found_file_list = []
-        for file_path, template in check_file_list:
-            input_data_type = self.c_dict.get(f'{data_type}INPUT_DATATYPE', '')
-            processed_path = preprocess_file(file_path,
-                                             input_data_type,
-                                             self.config,
-                                             allow_dir=allow_dir)
-
+        for (file_path, template), processed_path in zip(check_file_list,
+                                                         processed_paths):
             # report error if file path could not be found
             if not processed_path:
                 msg = (f"Could not find {data_type}INPUT file {file_path} "
@@ -705,6 +774,107 @@ class CommandBuilder:
 
         return found_file_list
 
+    def _wait_for_input_files(self, check_file_list, data_type):
+        """! Wait up to INPUT_WAIT_TIME seconds for input files that do not
+        exist yet. Nothing is done if INPUT_WAIT_TIME is not set or the input
+        is read with Python Embedding. Any cached directory listings of the
+        input directories are discarded after waiting so new files are found.
+
+        @param check_file_list list of tuples containing the file path and
+         the template that was used to find it
+        @param data_type type of data, i.e. FCST_, OBS_, or empty string
+        """
+        wait_time = self.c_dict.get('INPUT_WAIT_TIME', 0)
+        if wait_time <= 0:
+            return
+
+        input_data_type = self.c_dict.get(f'{data_type}INPUT_DATATYPE', '')
+        if 'PYTHON' in input_data_type:
+            return
+
+        file_paths = [file_path for file_path, _ in check_file_list
+                      if os.path.sep in file_path and
+                      not is_python_script(file_path)]
+        if not file_paths:
+            return
+
+        if not wait_for_input_files(file_paths, wait_time, self.logger,
+                                    self.c_dict['INPUT_WAIT_SLEEP_TIME'],
+                                    self.c_dict['INPUT_WAIT_MIN_AGE']):
+            self.logger.warning(f"Waited {wait_time} seconds for "
+                                f"{data_type}INPUT files to be written")
+
+        if self._dir_listing is not None:
+            for file_path in file_paths:
+                self._dir_listing.forget(os.path.dirname(file_path))
+
+    def _preprocess_input_files(self, check_file_list, data_type, allow_dir):
+        """! Stage input files, i.e. uncompress or convert them if needed.
+        Files are staged in parallel using a pool of threads if
+        PREPROCESS_NUM_PROCESSES is greater than 1. If
+        {data_type}STAGE_COMPRESSED_INPUT is False, gzip compressed files are
+        passed to the MET tools instead of being uncompressed.
+
+        @param check_file_list list of tuples containing the file path and
+         the template that was used to find it
+        @param data_type type of data, i.e. FCST_, OBS_, or empty string
+        @param allow_dir if True, directories are also valid inputs
+        @returns list of paths to read for each file, or None for each file
+         that was not found, in the same order as check_file_list
+        """
+        input_data_type = self.c_dict.get(f'{data_type}INPUT_DATATYPE', '')
+        stage_compressed = self.c_dict.get(f'{data_type}STAGE_COMPRESSED_INPUT',
+                                           True)
+        dir_listing = self._dir_listing
+
+        def _preprocess(item):
+            file_path = item[0]
+            # skip file system checks if file is not in cached listing
+            if (dir_listing is not None and
+                    not dir_listing.may_preprocess(file_path, input_data_type,
+                                                   self.config)):
+                return None
+            if not stage_compressed:
+                compressed_path = self._get_gzip_input(file_path)
+                if compressed_path:
+                    return compressed_path
+            return preprocess_file(file_path, input_data_type, self.config,
+                                   allow_dir=allow_dir)
+
+        num_processes = self.c_dict.get('PREPROCESS_NUM_PROCESSES', 1)
+        total = len(check_file_list)
+        if num_processes <= 1 or total <= 1:
+            return [_preprocess(item) for item in check_file_list]
+
+        self.logger.info(f"Preprocessing {total} {data_type}INPUT files "
+                         f"using {num_processes} threads")
+        report_every = max(1, total // 10)
+        processed_paths = []
+        with ThreadPoolExecutor(max_workers=num_processes) as executor:
+            for index, processed_path in enumerate(
+                    executor.map(_preprocess, check_file_list), start=1):
+                processed_paths.append(processed_path)
+                if index % report_every == 0 or index == total:
+                    self.logger.info(f"Preprocessed {index}/{total} "
+                                     f"{data_type}INPUT files")
+
+        return processed_paths
+
+    @staticmethod
+    def _get_gzip_input(file_path):
+        """! Get path to a gzip compressed input file that can be read by the
+        MET tools without staging an uncompressed copy.
+
+        @param file_path path to input file with or without .gz extension
+        @returns path to gzip file or None if file is not gzip compressed
+        """
+        if file_path.endswith('.gz'):
+            return file_path if os.path.isfile(file_path) else None
+
+        if os.path.exists(file_path) or not os.path.isfile(f'{file_path}.gz'):
+            return None
+        return f'{file_path}.gz'
+
     def _find_file_in_window(self, data_type, time_info, mandatory=True,
                              return_list=False):
         template = self.c_dict[f'{data_type}INPUT_TEMPLATE']
@@ -782,6 +952,42 @@ class CommandBuilder:
         upper_limit = int(datetime.strptime(shift_time_seconds(valid_time, valid_range_upper),
                                             "%Y%m%d%H%M%S").strftime("%s"))
 
+        for fullpath, file_valid_seconds in self._get_file_valid_times(
+                data_dir, template):
+            # skip if outside time range
+            if file_valid_seconds < lower_limit or file_valid_seconds > upper_limit:
+                continue
+
+            # if multiple files are allowed, get all files within range
+            if self.c_dict.get('ALLOW_MULTIPLE_FILES', False):
+                closest_files.append(fullpath)
+                continue
+
+            # if only 1 file is allowed, check if file is
+            # closer to desired valid time than previous match
+            diff = abs(valid_seconds - file_valid_seconds)
+            if diff < closest_time:
+                closest_time = diff
+                del closest_files[:]
+                closest_files.append(fullpath)
+
+        return closest_files
+
+    def _get_file_valid_times(self, data_dir, template):
+        """! Get all files under the input directory and the valid time of
+        each file that is extracted from the relative path using the template.
+        If a directory listing cache is active, the directory is only walked
+        and the files are only parsed once for each directory and template.
+
+        @param data_dir input directory to search
+        @param template filename template relative to data_dir
+        @returns list of tuples of full path and valid time in unix seconds
+        """
+        key = ('file_valid_times', data_dir, template)
+        if self._dir_listing is not None and key in self._dir_listing.memo:
+            return self._dir_listing.memo[key]
+
+        file_times = []
         # step through all files under input directory in sorted order
         for dirpath, _, all_files in os.walk(data_dir):
             for filename in sorted(all_files):
@@ -801,25 +1007,30 @@ class CommandBuilder:
                 if not file_valid_time:
                     continue
                 file_valid_dt = datetime.strptime(file_valid_time, "%Y%m%d%H%M%S")
-                file_valid_seconds = int(file_valid_dt.strftime("%s"))
-                # skip if outside time range
-                if file_valid_seconds < lower_limit or file_valid_seconds > upper_limit:
-                    continue
+                file_times.append((fullpath, int(file_valid_dt.strftime("%s"))))
 
-                # if multiple files are allowed, get all files within range
-                if self.c_dict.get('ALLOW_MULTIPLE_FILES', False):
-                    closest_files.append(fullpath)
-                    continue
+        if self._dir_listing is not None:
+            self._dir_listing.memo[key] = file_times
 
-                # if only 1 file is allowed, check if file is
-                # closer to desired valid time than previous match
-                diff = abs(valid_seconds - file_valid_seconds)
-                if diff < closest_time:
-                    closest_time = diff
-                    del closest_files[:]
-                    closest_files.append(fullpath)
+        return file_times
 
-        return closest_files
+    @contextmanager
+    def cached_directory_listing(self):
+        """! Context manager to cache directory contents while finding many
+        input files, e.g. for all run times and forecast leads. Each input
+        directory is then listed once instead of checking each possible file
+        path and wildcard pattern separately. Nested calls reuse the
+        outermost cache.
+        """
+        if self._dir_listing is not None:
+            yield self._dir_listing
+            return
+
+        self._dir_listing = DirectoryListing()
+        try:
+            yield self._dir_listing
+        finally:
+            self._dir_listing = None
 
     def find_input_files_ensemble(self, time_info, fill_missing=True):
         """! Get a list of all input files and optional control file.
@@ -952,11 +1163,10 @@ class CommandBuilder:
         mkdir_p(list_dir)
 
         self.logger.debug("Writing list of filenames...")
+        self.logger.debug("Adding files to list:\n" + '\n'.join(file_list))
         with open(list_path, 'w') as file_handle:
             file_handle.write('file_list\n')
-            for f_path in file_list:
-                self.logger.debug(f"Adding file to list: {f_path}")
-                file_handle.write(f_path + '\n')
+            file_handle.writelines(f'{f_path}\n' for f_path in file_list)
 
         self.logger.debug(f"Wrote list of filenames to {list_path}")
         return list_path
@@ -1160,6 +1370,58 @@ class CommandBuilder:
         self.env_var_dict[f'METPLUS_{input_type}_FILE_TYPE'] = file_type
         return file_ext
 
+    def get_python_embedding_cache_name(self, name, data_type):
+        """! If PYTHON_EMBEDDING_CACHE is enabled and the field name is a
+        Python Embedding command that returns gridded data, run the command
+        once and write met_data and attrs to files in the cache directory.
+        Other fields or wrappers that call the same command with the same
+        arguments read the cached files instead of running the script again.
+        Commands that reference MET_PYTHON_INPUT_ARG are not cached because
+        the MET tool substitutes a different input file for each call.
+
+            @param name field name to check
+            @param data_type type of data, i.e. FCST or OBS
+            @returns command to read the cached output, or name unchanged if
+             caching is disabled or not possible
+        """
+        if (not self.c_dict.get('PYTHON_EMBEDDING_CACHE') or
+                not is_python_script(name) or
+                'MET_PYTHON_INPUT_ARG' in name):
+            return name
+
+        input_type = (self.c_dict.get(f'{data_type}_INPUT_DATATYPE') or
+                      self.c_dict.get('BOTH_INPUT_DATATYPE', ''))
+        if input_type not in ('PYTHON_NUMPY', 'PYTHON_XARRAY'):
+            return name
+
+        cache_key = py_embed_cache.get_cache_key(name, input_type)
+        cache_prefix = os.path.join(self.c_dict['PYTHON_EMBEDDING_CACHE_DIR'],
+                                    cache_key)
+        cache_script = os.path.abspath(py_embed_cache.__file__)
+        if py_embed_cache.is_cached(cache_prefix):
+            self.logger.debug(f'Using cached Python Embedding output: {name}')
+            return f'{cache_script} {cache_prefix}'
+
+        # cannot create cache if commands are not run
+        if self.c_dict.get('DO_NOT_RUN_EXE', False):
+            return name
+
+        python_exe = sys.executable
+        if self.config.has_option('user_env_vars', 'MET_PYTHON_EXE'):
+            python_exe = self.config.getraw('user_env_vars', 'MET_PYTHON_EXE')
+
+        self.logger.info(f'Caching Python Embedding output: {name}')
+        cmd = (f'{python_exe} {cache_script} {py_embed_cache.WRITE_FLAG} '
+               f'{cache_prefix} {name}')
+        ret, _ = self.cmdrunner.run_cmd(cmd, env=self.env,
+                                        log_name='python_embedding_cache')
+        if ret != 0 or not py_embed_cache.is_cached(cache_prefix):
+            self.logger.warning('Could not cache Python Embedding output. '
+                                f'Running script from MET instead: {name}')
+            return name
+
+        return f'{cache_script} {cache_prefix}'
+
     def get_field_info(self, d_type='', v_name='', v_level='', v_thresh=None,
                        v_extra='', add_curly_braces=True):
         """! Format field information into format expected by MET config file.
@@ -1176,6 +1438,7 @@ class CommandBuilder:
             @rtype string
             @return Returns formatted field information or None on error
         """
+        v_name = self.get_python_embedding_cache_name(v_name, d_type)
         fields = get_field_info(c_dict=self.c_dict,
                                 data_type=d_type,
                                 v_name=v_name,
@@ -1205,6 +1468,14 @@ class CommandBuilder:
             @rtype string
             @return Returns formatted field information or None on error
         """
+        name_key = f'{data_type.lower()}_name'
+        if name_key in var_info:
+            var_info = var_info.copy()
+            var_info[name_key] = (
+                self.get_python_embedding_cache_name(var_info[name_key],
+                                                     data_type)
+            )
+
         fields = format_field_info(c_dict=self.c_dict,
                                    var_info=var_info,
                                    data_type=data_type,
@@ -1285,22 +1556,202 @@ class CommandBuilder:
         @param cmd_name optional command name to use in the log filename
         @returns True on success, False otherwise
         """
+        cmd_item = self.prepare_command(cmd, cmd_name=cmd_name)
+        return self._check_command_result(self._run_command_item(cmd_item),
+                                          cmd_item)
+
+    def prepare_command(self, cmd, cmd_name=None):
+        """! Add command to list of all commands run and capture the
+        environment and log name that are needed to run it. This allows a
+        command to be built for the current run time and run later, e.g.
+        concurrently with commands from other run times.
+
+        @param cmd command to run
+        @param cmd_name optional command name to use in the log filename
+        @returns tuple of command, environment dictionary, log name, and
+         copyable environment string to pass to run_command_groups
+        """
         # add command to list of all commands run
         self.all_commands.append((cmd,
                                   self.print_all_envs(print_copyable=True)))
 
+        if self.c_dict.get('PLAN_FILE'):
+            self._write_plan_record(cmd)
+
         log_name = cmd_name if cmd_name else self.log_name
 
         if self.instance:
             log_name = f"{log_name}.{self.instance}"
 
-        ret, out_cmd = self.cmdrunner.run_cmd(cmd,
-                                              env=self.env,
-                                              log_name=log_name,
-                                              copyable_env=self.get_env_copy())
+        return cmd, self.env.copy(), log_name, self.get_env_copy()
+
+    def _write_plan_record(self, cmd):
+        """! Write a line to the plan file containing a JSON object with the
+        command, the wrapper and run time that created it, its input and
+        output files, and the total size of the input files in bytes. Input
+        files are read from self.infiles and any arguments of the command
+        that are existing files. Files listed in a file list file are also
+        included. Records that do not match PLAN_WRAPPERS or
+        PLAN_TIME_BEG/END are not written.
+
+        @param cmd command to write
+        """
+        record = {
+            'wrapper': self.__class__.__name__.replace('Wrapper', ''),
+            'instance': self.instance if self.instance else '',
+        }
+        time_info = self._current_time_info or {}
+        for key in ('init', 'valid'):
+            if isinstance(time_info.get(key), datetime):
+                record[key] = time_info[key].strftime('%Y%m%d%H%M%S')
+        if 'lead_seconds' in time_info:
+            record['lead_seconds'] = time_info['lead_seconds']
+
+        if not self._is_plan_record_requested(record):
+            return
+
+        output_path = None
+        if self.outfile:
+            output_path = self.get_output_path()
+        elif self.outdir:
+            output_path = self.outdir
+
+        inputs = []
+        args = [remove_quotes(item) for item in cmd.split()]
+        for path in self.infiles + args:
+            if (path in inputs or path == output_path or
+                    not os.path.isfile(path)):
+                continue
+            inputs.append(path)
+            inputs.extend(item for item in self._read_file_list(path)
+                          if item not in inputs)
+
+        record['command'] = cmd
+        record['inputs'] = inputs
+        record['outputs'] = [output_path] if output_path else []
+        record['input_bytes'] = sum(os.path.getsize(path) for path in inputs
+                                    if os.path.isfile(path))
+
+        plan_file = self.c_dict['PLAN_FILE']
+        with _PLAN_FILE_LOCK:
+            mkdir_p(os.path.dirname(os.path.abspath(plan_file)))
+            with open(plan_file, 'a') as file_handle:
+                file_handle.write(f'{json.dumps(record)}\n')
+
+    def _is_plan_record_requested(self, record):
+        """! Check if a plan record matches the wrappers and times that were
+        requested with PLAN_WRAPPERS and PLAN_TIME_BEG/END. Times can be
+        set to any number of leading digits of YYYYMMDDHHMMSS and are
+        compared to the valid time, or init time if valid is not set.
+
+        @param record dictionary with wrapper and time info to check
+        @returns True if the record should be written, False otherwise
+        """
+        wrappers = self.c_dict.get('PLAN_WRAPPERS')
+        if wrappers and record['wrapper'] not in wrappers:
+            return False
+
+        beg = self.c_dict.get('PLAN_TIME_BEG')
+        end = self.c_dict.get('PLAN_TIME_END')
+        if not beg and not end:
+            return True
+
+        run_time = record.get('valid', record.get('init'))
+        if not run_time:
+            return False
+        if beg and run_time[:len(beg)] < beg:
+            return False
+        if end and run_time[:len(end)] > end:
+            return False
+        return True
+
+    @staticmethod
+    def _read_file_list(path):
+        """! Read paths from a file list file, i.e. a text file with
+        file_list on the first line followed by one file path per line.
+
+        @param path file to read
+        @returns list of file paths or an empty list if path is not a file
+         list file
+        """
+        try:
+            with open(path, 'r') as file_handle:
+                # limit read so large data files are not read
+                if file_handle.readline(16).strip() != 'file_list':
+                    return []
+                return [line.strip() for line in file_handle if line.strip()]
+        except (OSError, UnicodeDecodeError):
+            return []
+
+    def run_command_groups(self, command_groups, num_processes=1,
+                           after_group=None):
+        """! Run groups of commands that were created with prepare_command.
+        Commands in a group are run in order and the rest of the group is
+        skipped if one of them fails. Groups do not depend on each other, so
+        they are run concurrently if num_processes is greater than 1.
+
+        @param command_groups list of lists of prepared commands
+        @param num_processes maximum number of groups to run at once
+        @param after_group (optional) function that is called with the index
+         of each group after all of its commands have run
+        @returns True if all commands ran successfully, False otherwise
+        """
+        def run_group(index):
+            results = []
+            for cmd_item in command_groups[index]:
+                ret = self._run_command_item(cmd_item)
+                results.append((cmd_item, ret))
+                if ret:
+                    break
+
+            if after_group:
+                after_group(index)
+            return results
+
+        indices = range(len(command_groups))
+        if num_processes > 1 and len(command_groups) > 1:
+            self.logger.debug(f"Running {len(command_groups)} groups of "
+                              f"commands using {num_processes} processes")
+            with ThreadPoolExecutor(max_workers=num_processes) as executor:
+                all_results = list(executor.map(run_group, indices))
+        else:
+            all_results = [run_group(index) for index in indices]
+
+        # check results after all commands have finished so errors are
+        # counted and logged from the main thread
+        success = True
+        for results in all_results:
+            for cmd_item, ret in results:
+                if not self._check_command_result(ret, cmd_item):
+                    success = False
+
+        return success
+
+    @profiled('run_cmd', method=True)
+    def _run_command_item(self, cmd_item):
+        """! Run a command that was created with prepare_command.
+
+        @param cmd_item tuple returned from prepare_command
+        @returns return code of the command
+        """
+        cmd, env, log_name, copyable_env = cmd_item
+        ret, _ = self.cmdrunner.run_cmd(cmd,
+                                        env=env,
+                                        log_name=log_name,
+                                        copyable_env=copyable_env)
+        return ret
+
+    def _check_command_result(self, ret, cmd_item):
+        """! Report an error if a command returned a non-zero return code.
+
+        @param ret return code of the command
+        @param cmd_item tuple returned from prepare_command
+        @returns True if the command succeeded, False otherwise
+        """
         if not ret:
             return True
 
+        cmd, _, log_name, _ = cmd_item
         self.log_error(f"Command returned a non-zero return code: {cmd}")
 
         logfile_path = self.config.getstr('config', 'LOG_METPLUS')
@@ -1323,6 +1774,15 @@ class CommandBuilder:
         """
         return loop_over_times_and_call(self.config, self, custom=custom)
 
+    def runs_per_run_time(self):
+        """! Check if the wrapper processes each run time separately so that
+        the run times can be split into shards of a run. Wrappers that
+        process many run times at once should override this to return False.
+
+        @returns True if each run time is processed separately
+        """
+        return True
+
     @staticmethod
     def format_met_config_dict(c_dict, name, keys=None):
         """! Return formatted dictionary named <name> with any <items> if they
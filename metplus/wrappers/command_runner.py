@@ -38,6 +38,8 @@ from produtil.run import exe, run
 import shlex
 from datetime import datetime, timezone
 
+from ..util.profile_util import profile_span, add_rusage
+
 
 class CommandRunner(object):
     """! Class for Creating and Running External Programs
@@ -122,17 +124,23 @@ class CommandRunner(object):
         # get current time to calculate total time to run command
         start_cmd_time = datetime.now()
 
-        # run command
-        try:
-            ret = run(cmd_exe, **kwargs)
-        except Exception:
-            ret = -1
-        else:
-            # calculate time to run
-            end_cmd_time = datetime.now()
-            total_cmd_time = end_cmd_time - start_cmd_time
-            self.logger.info(f'Finished running {the_exe} '
-                             f'- took {total_cmd_time}')
+        # run command and record resource usage if profiling
+        with profile_span('run_cmd') as span:
+            rusage = [] if span is not None else None
+            try:
+                ret = run(cmd_exe, rusage=rusage, **kwargs)
+            except Exception:
+                ret = -1
+            else:
+                # calculate time to run
+                end_cmd_time = datetime.now()
+                total_cmd_time = end_cmd_time - start_cmd_time
+                self.logger.info(f'Finished running {the_exe} '
+                                 f'- took {total_cmd_time}')
+
+            if span is not None:
+                add_rusage(span, rusage)
+                span.update({'command': cmd, 'return_code': ret})
 
         return ret, cmd
 
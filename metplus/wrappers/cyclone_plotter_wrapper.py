@@ -167,6 +167,13 @@ class CyclonePlotterWrapper(CommandBuilder):
         self.logger.debug(f"extent region: {self.extent_region}")
 
 
+    def runs_per_run_time(self):
+        """! This wrapper processes all run times at once.
+
+        @returns False
+        """
+        return False
+
     def run_all_times(self):
         """! Calls the defs needed to create the cyclone plots
              run_all_times() is required by CommandBuilder.
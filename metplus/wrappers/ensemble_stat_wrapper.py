@@ -153,6 +153,15 @@ class EnsembleStatWrapper(CompareGriddedWrapper):
             self.config.getint('config', 'ENSEMBLE_STAT_N_MEMBERS')
         )
 
+        # number of threads used to stage ensemble member files and whether
+        # to uncompress gzip files or pass them to MET
+        c_dict['PREPROCESS_NUM_PROCESSES'] = (
+            self.config.getint('config', 'ENSEMBLE_STAT_PREPROCESS_NUM_PROCESSES', 1)
+        )
+        c_dict['FCST_STAGE_COMPRESSED_INPUT'] = (
+            self.config.getbool('config', 'ENSEMBLE_STAT_STAGE_COMPRESSED_INPUT', True)
+        )
+
         # allow multiple files in CommandBuilder.find_data logic
         c_dict['ALLOW_MULTIPLE_FILES'] = True
 
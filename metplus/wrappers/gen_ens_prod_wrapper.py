@@ -94,6 +94,15 @@ class GenEnsProdWrapper(LoopTimesWrapper):
             self.config.getint('config', 'GEN_ENS_PROD_N_MEMBERS')
         )
 
+        # number of threads used to stage ensemble member files and whether
+        # to uncompress gzip files or pass them to MET
+        c_dict['PREPROCESS_NUM_PROCESSES'] = (
+            self.config.getint('config', 'GEN_ENS_PROD_PREPROCESS_NUM_PROCESSES', 1)
+        )
+        c_dict['FCST_STAGE_COMPRESSED_INPUT'] = (
+            self.config.getbool('config', 'GEN_ENS_PROD_STAGE_COMPRESSED_INPUT', True)
+        )
+
         # get ctrl (control) template/dir - optional
         c_dict['CTRL_INPUT_TEMPLATE'] = self.config.getraw(
             'config',
@@ -13,6 +13,7 @@ Condition codes: 0 for success, 1 for failure
 import os
 
 from ..util import getlist, get_lead_sequence, skip_time, ti_calculate, mkdir_p
+from ..util import get_shard
 from . import CommandBuilder
 from ..util import do_string_sub
 
@@ -21,6 +22,9 @@ from ..util import do_string_sub
 @endcode
 '''
 
+# memory-backed file system used to write intermediate files if available
+TMPFS_DIR = '/dev/shm'
+
 
 class GenVxMaskWrapper(CommandBuilder):
 
@@ -30,6 +34,15 @@ class GenVxMaskWrapper(CommandBuilder):
                                      self.app_name)
         super().__init__(config, instance=instance)
 
+        # chains of commands for each run time that are run concurrently
+        # after all run times have been processed. Each item is a tuple of
+        # the chain, the reused intermediate files that the chain reads, and
+        # the intermediate files to remove after the chain runs
+        self._chains = []
+
+        # intermediate files that can be reused by other run times
+        self._shared_temp_files = {}
+
     def create_c_dict(self):
         c_dict = super().create_c_dict()
         c_dict['VERBOSITY'] = self.config.getstr('config',
@@ -93,8 +106,51 @@ class GenVxMaskWrapper(CommandBuilder):
         c_dict['MASK_FILE_WINDOW_BEGIN'] = c_dict['FILE_WINDOW_BEGIN']
         c_dict['MASK_FILE_WINDOW_END'] = c_dict['FILE_WINDOW_END']
 
+        # handle intermediate files written when chaining multiple masks
+        c_dict['NUM_PROCESSES'] = self.config.getint('config',
+                                                     'GEN_VX_MASK_NUM_PROCESSES',
+                                                     1)
+        c_dict['REUSE_INTERMEDIATE_FILES'] = (
+            self.config.getbool('config',
+                                'GEN_VX_MASK_REUSE_INTERMEDIATE_FILES',
+                                False)
+        )
+        c_dict['UNIQUE_TEMP_FILES'] = (
+            self.config.getbool('config', 'GEN_VX_MASK_UNIQUE_TEMP_FILES',
+                                False)
+        )
+
+        # intermediate files must have unique names if chains are run
+        # concurrently, files are reused across run times, or other shards
+        # of the run may write intermediate files at the same time
+        if (c_dict['NUM_PROCESSES'] > 1 or
+                c_dict['REUSE_INTERMEDIATE_FILES'] or
+                get_shard(self.config)[1] > 1):
+            c_dict['UNIQUE_TEMP_FILES'] = True
+
+        c_dict['TEMP_DIR'] = self.config.getdir('GEN_VX_MASK_TEMP_DIR', '')
+        if not c_dict['TEMP_DIR']:
+            c_dict['TEMP_DIR'] = self._get_default_temp_dir(
+                c_dict['UNIQUE_TEMP_FILES']
+            )
+
         return c_dict
 
+    def _get_default_temp_dir(self, unique_temp_files):
+        """! Get directory to write intermediate files. Unique files are
+        written to tmpfs if it is available to avoid disk I/O. Otherwise
+        write them to the staging directory.
+
+        @param unique_temp_files True if intermediate files are unique for
+         each run time, which allows them to be removed after they are used
+        @returns path to directory
+        """
+        if unique_temp_files and os.access(TMPFS_DIR, os.W_OK):
+            return os.path.join(TMPFS_DIR,
+                                f'metplus_gen_vx_mask_{self.config.run_id}')
+
+        return os.path.join(self.config.getdir('STAGING_DIR'), 'gen_vx_mask')
+
     def get_command(self):
         cmd = self.app_path
 
@@ -149,6 +205,32 @@ class GenVxMaskWrapper(CommandBuilder):
 
                 self.run_at_time_all(time_info)
 
+    def run_all_times(self, custom=None):
+        """! Loop over all run times and call GenVxMask for each. If running
+        chains of masks concurrently, the chains are collected for all run
+        times, then run together and their intermediate files are removed.
+
+        @param custom (optional) custom loop string value
+        @returns list of all commands that were run
+        """
+        all_commands = super().run_all_times(custom=custom)
+
+        if self._chains:
+            self._run_chains()
+            self._chains.clear()
+
+        # remove intermediate files that were shared between run times
+        self._remove_temp_files(self._shared_temp_files.values())
+        self._shared_temp_files.clear()
+
+        # remove directory for unique intermediate files if it is empty
+        temp_dir = self.c_dict['TEMP_DIR']
+        if (self.c_dict['UNIQUE_TEMP_FILES'] and os.path.isdir(temp_dir) and
+                not os.listdir(temp_dir)):
+            os.rmdir(temp_dir)
+
+        return all_commands
+
     def run_at_time_all(self, time_info):
         """!Loop over list of mask templates and call GenVxMask for each, adding the
             corresponding command line arguments for each call
@@ -160,6 +242,20 @@ class GenVxMaskWrapper(CommandBuilder):
         # there is no config file, so using CommandBuilder implementation
         self.set_environment_variables(time_info)
 
+        # skip the chain before building any of its commands if the final
+        # output already exists
+        if not self.find_and_check_output_file(time_info):
+            return
+
+        # build chain of commands that must be run in order. Each item is a
+        # tuple of the command and the reusable intermediate file it creates
+        cmd_chain = []
+        temp_files = []
+        # reusable intermediate files created by this chain and reused
+        # files that were created by the chain of an earlier run time
+        new_shared_files = {}
+        reused_files = set()
+
         # loop over mask templates and command line args,
         temp_file = ''
         for index, (mask_template, cmd_args) in enumerate(zip(self.c_dict['MASK_INPUT_TEMPLATES'],
@@ -178,22 +274,136 @@ class GenVxMaskWrapper(CommandBuilder):
             if index+1 == len(self.c_dict['MASK_INPUT_TEMPLATES']):
                 break
 
+            # reuse intermediate file if the same inputs and arguments
+            # were already processed for another run time
+            reuse_key = (tuple(self.infiles), self.args)
+            if reuse_key in self._shared_temp_files:
+                temp_file = self._shared_temp_files[reuse_key]
+                self.logger.debug(f"Reusing intermediate file: {temp_file}")
+                reused_files.add(temp_file)
+                continue
+
             # if not the last iteration, write to temporary file
-            temp_file = os.path.join(self.config.getdir('STAGING_DIR'),
-                                     'gen_vx_mask',
-                                     f'temp_{index}.nc')
+            temp_file = self._get_temp_file_path(time_info, index)
             self.find_and_check_output_file(time_info,
                                             output_path_template=temp_file)
-
-            # run GenVxMask
-            self.build()
+            shared_file = None
+            if self.c_dict['REUSE_INTERMEDIATE_FILES']:
+                new_shared_files[reuse_key] = temp_file
+                shared_file = temp_file
+            elif self.c_dict['UNIQUE_TEMP_FILES']:
+                temp_files.append(temp_file)
+
+            cmd = self.get_command()
+            if cmd is None:
+                self.log_error("Could not generate command")
+                return
+            cmd_chain.append((self.prepare_command(cmd), shared_file))
 
         # use final output path for last (or only) run
         if not self.find_and_check_output_file(time_info):
             return
 
-        # run GenVxMask
-        self.build()
+        cmd = self.get_command()
+        if cmd is None:
+            self.log_error("Could not generate command")
+            return
+        cmd_chain.append((self.prepare_command(cmd), None))
+
+        # run chain now unless chains are run concurrently after all
+        # run times have been processed
+        if self.c_dict['NUM_PROCESSES'] <= 1:
+            success = self.run_command_groups([[cmd for cmd, _ in cmd_chain]])
+            self._remove_temp_files(temp_files)
+            # only allow other run times to reuse files that were created
+            if not success:
+                self._remove_temp_files(new_shared_files.values())
+                return
+            self._shared_temp_files.update(new_shared_files)
+            return
+
+        # intermediate files can be reused once the chain will be run
+        self._shared_temp_files.update(new_shared_files)
+        self._chains.append((cmd_chain, reused_files, temp_files))
+
+    def _run_chains(self):
+        """! Run the chains of commands collected for all run times
+        concurrently. Intermediate files that are reused by other run times
+        are created first. The rest of each chain is then run independently
+        of the other chains.
+        """
+        reused_files = set()
+        for _, chain_reused_files, _ in self._chains:
+            reused_files.update(chain_reused_files)
+
+        # commands that create reused files are run first. A command that
+        # reads a reused file created by another chain is added to the group
+        # that creates that file so that they run in order
+        setup_groups = []
+        setup_group_indices = {}
+        command_groups = []
+        group_temp_files = []
+        for cmd_chain, chain_reused_files, temp_files in self._chains:
+            setup = [item for item in cmd_chain if item[1] in reused_files]
+            if setup:
+                group_index = next((setup_group_indices[path]
+                                    for path in chain_reused_files
+                                    if path in setup_group_indices), None)
+                if group_index is None:
+                    group_index = len(setup_groups)
+                    setup_groups.append([])
+                setup_groups[group_index].extend(cmd for cmd, _ in setup)
+                for _, shared_file in setup:
+                    setup_group_indices[shared_file] = group_index
+
+            command_groups.append([cmd for cmd, shared_file in cmd_chain
+                                   if shared_file not in reused_files])
+            group_temp_files.append(temp_files)
+
+        num_processes = self.c_dict['NUM_PROCESSES']
+        if setup_groups:
+            self.run_command_groups(setup_groups, num_processes=num_processes)
+
+        self.run_command_groups(
+            command_groups, num_processes=num_processes,
+            after_group=lambda index: self._remove_temp_files(
+                group_temp_files[index]
+            )
+        )
+
+    def _get_temp_file_path(self, time_info, index):
+        """! Get path to intermediate file to write for a step of the chain.
+        If UNIQUE_TEMP_FILES is set, the filename includes the run ID,
+        instance, and run time so that concurrent chains do not collide.
+
+        @param time_info time dictionary for current runtime
+        @param index index of mask in the chain
+        @returns path to intermediate file
+        """
+        if not self.c_dict['UNIQUE_TEMP_FILES']:
+            return os.path.join(self.c_dict['TEMP_DIR'], f'temp_{index}.nc')
+
+        identifiers = [self.config.run_id]
+        if self.instance:
+            identifiers.append(self.instance)
+        identifiers.append(time_info['valid'].strftime('%Y%m%d%H%M%S'))
+        identifiers.append(str(time_info['lead_seconds']))
+        if time_info.get('custom'):
+            identifiers.append(time_info['custom'])
+        identifiers.append(str(index))
+        filename = '_'.join(identifiers).replace(os.path.sep, '_')
+        return os.path.join(self.c_dict['TEMP_DIR'], f'temp_{filename}.nc')
+
+    def _remove_temp_files(self, temp_files):
+        """! Remove intermediate files that are no longer needed.
+
+        @param temp_files list of paths to remove
+        """
+        for temp_file in temp_files:
+            if not os.path.exists(temp_file):
+                continue
+            self.logger.debug(f"Removing intermediate file: {temp_file}")
+            os.remove(temp_file)
 
     def find_input_files(self, time_info, temp_file):
         """!Handle setting of input file list.
@@ -12,7 +12,7 @@ from ..util import get_seconds_from_string, ti_get_lead_string, ti_calculate
 from ..util import get_relativedelta, ti_get_seconds_from_relativedelta
 from ..util import time_string_to_met_time, seconds_to_met_time
 from ..util import parse_var_list, template_to_regex, split_level
-from ..util import add_field_info_to_time_info
+from ..util import add_field_info_to_time_info, mkdir_p
 from . import ReformatGriddedWrapper
 
 '''!@namespace PCPCombineWrapper
@@ -26,10 +26,15 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
     # valid values for [FCST/OBS]_PCP_COMBINE_METHOD
     valid_run_methods = ['ADD', 'SUM', 'SUBTRACT', 'DERIVE', 'USER_DEFINED']
 
+    # valid values for [FCST/OBS]_PCP_COMBINE_INPUT_SELECTION
+    valid_input_selections = ['ORDER', 'FEWEST_FILES', 'SMALLEST_SIZE']
+
     def __init__(self, config, instance=None):
         self.app_name = 'pcp_combine'
         self.app_path = os.path.join(config.getdir('MET_BIN_DIR', ''),
                                      self.app_name)
+        # command to run before pcp_combine when using rolling accumulation
+        self._rolling_cmd = None
         super().__init__(config, instance=instance)
 
     def create_c_dict(self):
@@ -118,6 +123,18 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                f'{d_type}_PCP_COMBINE_INPUT_ACCUMS', '')
         )
 
+        c_dict[f'{d_type}_INPUT_SELECTION'] = self.config.getstr(
+            'config',
+            f'{d_type}_PCP_COMBINE_INPUT_SELECTION', 'ORDER'
+        ).upper()
+        if (c_dict[f'{d_type}_INPUT_SELECTION'] not in
+                self.valid_input_selections):
+            self.log_error(f"Invalid value for "
+                           f"{d_type}_PCP_COMBINE_INPUT_SELECTION: "
+                           f"{c_dict[f'{d_type}_INPUT_SELECTION']}. Valid "
+                           f"options are "
+                           f"{','.join(self.valid_input_selections)}.")
+
         c_dict[f'{d_type}_NAMES'] = getlist(
             self.config.getraw('config',
                                f'{d_type}_PCP_COMBINE_INPUT_NAMES', '')
@@ -192,6 +209,13 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
             f'{d_type}_PCP_COMBINE_USE_ZERO_ACCUM', False
         )
 
+        c_dict[f'{d_type}_USE_ROLLING_ACCUM'] = self.config.getbool(
+            'config',
+            f'{d_type}_PCP_COMBINE_USE_ROLLING_ACCUM', False
+        )
+        if c_dict[f'{d_type}_USE_ROLLING_ACCUM']:
+            self._check_rolling_accum(c_dict, d_type)
+
         if run_method == 'DERIVE' and not c_dict[f'{d_type}_STAT_LIST']:
             self.log_error('Statistic list is empty. Must set '
                            f'{d_type}_PCP_COMBINE_STAT_LIST if running '
@@ -226,6 +250,29 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
 
         return c_dict
 
+    def _check_rolling_accum(self, c_dict, d_type):
+        """! Check that settings needed to build accumulations from the
+        previous output are set. The previous output is read using the output
+        name, so a single output name must be set.
+
+            @param c_dict config dictionary to check
+            @param d_type data type (FCST or OBS)
+        """
+        if c_dict[f'{d_type}_RUN_METHOD'] not in ('ADD', 'SUM'):
+            self.log_error(f'{d_type}_PCP_COMBINE_USE_ROLLING_ACCUM can only '
+                           'be used with ADD or SUM method')
+
+        if not c_dict[f'{d_type}_ACCUMS']:
+            self.log_error(f'{d_type}_PCP_COMBINE_INPUT_ACCUMS must be set to '
+                           f'use {d_type}_PCP_COMBINE_USE_ROLLING_ACCUM')
+
+        output_name = c_dict[f'{d_type}_OUTPUT_NAME']
+        if (not output_name or ',' in output_name or
+                c_dict[f'{d_type}_EXTRA_NAMES']):
+            self.log_error(f'{d_type}_PCP_COMBINE_OUTPUT_NAME must be set to '
+                           'a single name and extra fields cannot be used '
+                           f'with {d_type}_PCP_COMBINE_USE_ROLLING_ACCUM')
+
     def run_at_time_once(self, time_info, var_list, data_src):
 
         if not var_list:
@@ -237,6 +284,7 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
     def run_at_time_one_field(self, time_info, var_info, data_src):
 
         self.clear()
+        self._rolling_cmd = None
 
         method = self.c_dict[data_src+'_RUN_METHOD']
 
@@ -255,9 +303,19 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         time_info['level'] = lookback_seconds
         add_field_info_to_time_info(time_info, var_info)
 
+        # build from previous output if requested and possible, otherwise
+        # find all input files using the run method
+        rolling_files = None
+        if self.c_dict.get(f'{data_src}_USE_ROLLING_ACCUM'):
+            rolling_files = self.setup_rolling_method(time_info,
+                                                      lookback_seconds,
+                                                      data_src)
+
         # if method is not USER_DEFINED or DERIVE,
         # check that field information is set
-        if method == "USER_DEFINED":
+        if rolling_files:
+            can_run = rolling_files
+        elif method == "USER_DEFINED":
             can_run = self.setup_user_method(time_info, data_src)
         elif method == "DERIVE":
             can_run = self.setup_derive_method(time_info, lookback_seconds,
@@ -302,6 +360,14 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         # set user environment variables if needed and print all envs
         self.set_environment_variables(time_info)
 
+        # subtract the oldest input from the previous output first
+        if self._rolling_cmd:
+            rolling_cmd, partial_file = self._rolling_cmd
+            mkdir_p(os.path.dirname(partial_file))
+            if not self.run_command(rolling_cmd,
+                                    cmd_name=f'{self.app_name}_rolling'):
+                return False
+
         return self.build()
 
     def setup_user_method(self, time_info, data_src):
@@ -498,6 +564,123 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
 
         return files_found
 
+    def setup_rolling_method(self, time_info, lookback, data_src):
+        """! Setup pcp_combine to build desired accumulation from the output
+        of the previous run time instead of adding every input file. The
+        oldest input is subtracted from the previous output and the result is
+        added to the newest input. The smallest input accumulation is used as
+        the offset between run times. For forecast leads, the previous output
+        is from the same initialization time at the lead that is one offset
+        earlier, so LEAD_SEQ must include that lead. For lead 0, the previous
+        output is from the valid time that is one offset earlier. Nothing is
+        set if the previous output or either input file is not found.
+
+          @param time_info dictionary containing timing information
+          @param lookback accumulation amount to compute in seconds
+          @param data_src data type (FCST or OBS)
+          @returns list of tuples of file path and field info for -add or
+           None if the accumulation cannot be built from the previous output
+        """
+        self._build_input_accum_list(data_src, time_info)
+        accum_dicts = [accum_dict for accum_dict
+                       in self.c_dict['ACCUM_DICT_LIST']
+                       if accum_dict['template'] is None]
+        if not accum_dicts:
+            return None
+
+        accum_dict = min(accum_dicts, key=lambda item: item['amount'])
+        step = accum_dict['amount']
+        if not step or lookback <= step:
+            return None
+
+        # previous output is valid one input accumulation earlier, i.e.
+        # valid time - 1 hour for 1 hour inputs. Forecast outputs are read
+        # from the same model run at the earlier lead so runs are not mixed.
+        # Analyses and observations (lead 0) are read from the earlier time
+        lead_seconds = time_info.get('lead_seconds') or 0
+        prev_time_info = time_info.copy()
+        if lead_seconds:
+            # previous output and oldest input must both be from this run
+            if lead_seconds < lookback + step:
+                self.logger.debug('Previous output would start before the '
+                                  'initialization time. Finding all input '
+                                  'files')
+                return None
+
+            prev_time_info.update(ti_calculate({
+                'init': time_info['init'],
+                'lead': lead_seconds - step,
+            }))
+        else:
+            prev_time_info.update(ti_calculate({
+                'valid': time_info['valid'] - timedelta(seconds=step),
+                'lead': 0,
+            }))
+        prev_time_info['level'] = lookback
+        prev_output = do_string_sub(
+            os.path.join(self.c_dict[f'{data_src}_OUTPUT_DIR'],
+                         self.c_dict[f'{data_src}_OUTPUT_TEMPLATE']),
+            **prev_time_info
+        )
+        if not os.path.exists(prev_output):
+            self.logger.info(f'Previous output not found: {prev_output}. '
+                             'Finding all input files')
+            return None
+
+        # find newest input and oldest input of previous output
+        valid_times = (time_info['valid'],
+                       time_info['valid'] - timedelta(seconds=lookback))
+        inputs = []
+        for valid_time in valid_times:
+            input_file, lead = self.find_input_file(time_info['init'],
+                                                    valid_time, step,
+                                                    data_src)
+            if not input_file:
+                self.logger.debug('Could not find input valid at '
+                                  f'{valid_time} to build accumulation '
+                                  'from previous output. Finding all input '
+                                  'files')
+                return None
+
+            field_info = self.get_field_string(
+                time_info={'valid': valid_time, 'lead': lead},
+                search_accum=time_string_to_met_time(step),
+                name=accum_dict['name'],
+                level=accum_dict['level'],
+                extra=accum_dict['extra']
+            )
+            inputs.append((input_file, field_info))
+
+        (newest_file, newest_field), (oldest_file, oldest_field) = inputs
+
+        output_name = self.c_dict[f'{data_src}_OUTPUT_NAME']
+        output_field = self.get_field_string(name=output_name,
+                                             level='"(*,*)"')
+
+        instance = f'_{self.instance}' if self.instance else ''
+        partial_file = os.path.join(
+            self.config.getdir('STAGING_DIR'), 'pcp_combine_rolling',
+            f"{data_src.lower()}{instance}_"
+            f"{time_info['valid'].strftime('%Y%m%d%H%M%S')}_"
+            f"{lookback - step}s.nc"
+        )
+
+        self.logger.debug(
+            f"Building {ti_get_lead_string(lookback, False)} accumulation "
+            f"from previous output {prev_output} by subtracting "
+            f"{oldest_file} and adding {newest_file}"
+        )
+        self._rolling_cmd = (
+            f"{self.app_path} -v {self.c_dict['VERBOSITY']} -subtract "
+            f"{prev_output} {output_field} {oldest_file} {oldest_field} "
+            f'-name "{output_name}" {partial_file}',
+            partial_file
+        )
+
+        self.args.extend(['-add', partial_file, output_field,
+                          newest_file, newest_field])
+        return [(partial_file, output_field), (newest_file, newest_field)]
+
     def setup_derive_method(self, time_info, lookback, data_src):
         """! Setup pcp_combine to derive stats
 
@@ -626,32 +809,22 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
 
     def get_accumulation(self, time_info, accum, data_src,
                          field_info_after_file=True):
-        """! Find files to combine to build the desired accumulation
+        """! Find files to combine to build the desired accumulation. The
+        input files that could be used are found first, then the set of files
+        that covers the accumulation is chosen based on
+        [FCST/OBS]_PCP_COMBINE_INPUT_SELECTION. This finds a set of files
+        whenever one exists, even if using the first accumulation in the list
+        at each step would not.
 
           @param time_info dictionary containing time information
           @param accum desired accumulation to build in seconds
           @param data_src type of data (FCST or OBS)
-          @rtype bool
-          @return True if full set of files to build accumulation is found
+          @param field_info_after_file if True, add field info after each
+           file in the command arguments
+          @returns list of tuples of file path and field info or None if
+           a full set of files to build accumulation was not found
         """
-        search_time = time_info['valid']
-        # last time to search is the output accumulation subtracted from the
-        # valid time, then add back the smallest accumulation that is available
-        # in the input. This is done because data contains an accumulation from
-        # the file/field time backwards in time
-        # If building 6 hour accumulation from 1 hour accumulation files,
-        # last time to process is valid - 6 + 1
         accum_relative = get_relativedelta(accum, 'S')
-        # using 1 hour for now
-        smallest_input_accum = min(
-            [lev['amount'] for lev in self.c_dict['ACCUM_DICT_LIST']]
-        )
-        if smallest_input_accum == 9999999:
-            smallest_input_accum = 3600
-
-        last_time = (time_info['valid'] - accum_relative +
-                     timedelta(seconds=smallest_input_accum))
-
         total_accum = ti_get_seconds_from_relativedelta(accum_relative,
                                                         time_info['valid'])
 
@@ -669,30 +842,71 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                           "accumulation using "
                           f"{' or '.join(search_accum_list)} input data")
 
-        files_found = []
+        if not total_accum:
+            return None
+
+        with self.cached_directory_listing():
+            inputs = self._get_accum_inputs(time_info, total_accum, data_src)
+
+        files_found = self._select_accum_inputs(
+            inputs, time_info['valid'],
+            self.c_dict.get(f'{data_src}_INPUT_SELECTION', 'ORDER')
+        )
+        if not files_found:
+            return None
 
-        # loop backwards in time until you have a full set of accum
-        while last_time <= search_time:
-            found = False
+        for search_file, field_info in files_found:
+            # add file to input list
+            self.args.append(search_file)
+            if field_info_after_file:
+                self.args.append(field_info)
 
-            if total_accum == 0:
-                break
+            self.logger.debug(f"Adding input file: {search_file} "
+                              f"with {field_info}")
+
+        return files_found
 
-            # look for biggest accum that fits search
+    def _get_accum_inputs(self, time_info, total_accum, data_src):
+        """! Find all input files that could be used to build an
+        accumulation. Starting at the valid time, look for a file for each
+        input accumulation, then continue from the start of the accumulation
+        of each file that was found until the full accumulation is covered.
+        Each file path is only checked once.
+
+          @param time_info dictionary containing time information
+          @param total_accum desired accumulation in seconds
+          @param data_src type of data (FCST or OBS)
+          @returns dictionary where the key is a search time and the value is
+           a list of tuples of file path, field info, accumulation in seconds,
+           and file size in bytes for each file that ends at that time, in
+           the order of the input accumulation list
+        """
+        start_time = time_info['valid'] - timedelta(seconds=total_accum)
+        inputs = {}
+        found_files = {}
+        search_times = [time_info['valid']]
+        while search_times:
+            search_time = search_times.pop()
+            if search_time in inputs:
+                continue
+
+            inputs[search_time] = []
+            remaining = (search_time - start_time).total_seconds()
             for accum_dict in self.c_dict['ACCUM_DICT_LIST']:
-                if (accum_dict['amount'] > total_accum and
+                if (accum_dict['amount'] > remaining and
                         accum_dict['template'] is None):
                     continue
 
-                search_file, lead = self.find_input_file(time_info['init'],
-                                                         search_time,
-                                                         accum_dict['amount'],
-                                                         data_src)
-
+                key = (search_time, accum_dict['amount'])
+                if key not in found_files:
+                    found_files[key] = self.find_input_file(
+                        time_info['init'], search_time,
+                        accum_dict['amount'], data_src
+                    )
+                search_file, lead = found_files[key]
                 if not search_file:
                     continue
 
-                # if found a file, add it to input list with info
                 # if template is used in accum, find value and
                 # apply bucket interval is set
                 if accum_dict['template'] is not None:
@@ -700,7 +914,7 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                                            search_time,
                                                            lead,
                                                            data_src)
-                    if accum_amount > total_accum:
+                    if accum_amount > remaining or accum_amount <= 0:
                         self.logger.debug("Accumulation amount is bigger "
                                           "than remaining accumulation.")
                         continue
@@ -718,32 +932,69 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                     level=accum_dict['level'],
                     extra=accum_dict['extra']
                 )
-                # add file to input list and step back to find more data
-                self.args.append(search_file)
-                if field_info_after_file:
-                    self.args.append(field_info)
-
-                files_found.append((search_file, field_info))
-                self.logger.debug(f"Adding input file: {search_file} "
-                                  f"with {field_info}")
-                search_time -= timedelta(seconds=accum_amount)
-                total_accum -= accum_amount
-                found = True
-                break
-
-            # if we don't need any more accumulation, break out of loop and run
-            if not total_accum:
-                break
-
-            # if we still need to find more accum but we couldn't find it, fail
-            if not found:
-                return None
-
-        # fail if no files were found or if we didn't find
-        #  the entire accumulation needed
-        if not files_found or total_accum:
+                file_size = (os.path.getsize(search_file)
+                             if os.path.isfile(search_file) else 0)
+                inputs[search_time].append((search_file, field_info,
+                                            accum_amount, file_size))
+                if accum_amount < remaining:
+                    search_times.append(search_time -
+                                        timedelta(seconds=accum_amount))
+
+        return inputs
+
+    @staticmethod
+    def _select_accum_inputs(inputs, valid_time, selection):
+        """! Choose the set of input files that covers the accumulation. The
+        best set of files that covers the accumulation from each search time
+        is computed from the earliest search time to the valid time, so each
+        search time is only evaluated once.
+
+          @param inputs dictionary from _get_accum_inputs
+          @param valid_time valid time of the accumulation
+          @param selection ORDER to prefer accumulations in the order they
+           are listed, FEWEST_FILES to use the fewest files, or SMALLEST_SIZE
+           to read the fewest bytes
+          @returns list of tuples of file path and field info ordered from the
+           valid time backwards or None if the accumulation cannot be covered
+        """
+        # number of files, number of bytes, and index of input to use
+        # to cover the accumulation from each search time
+        best = {}
+        for search_time in sorted(inputs):
+            for index, (_, _, accum_amount, file_size) in (
+                    enumerate(inputs[search_time])):
+                next_time = search_time - timedelta(seconds=accum_amount)
+                if next_time in inputs:
+                    if next_time not in best:
+                        continue
+                    num_files, num_bytes, _ = best[next_time]
+                else:
+                    num_files, num_bytes = 0, 0
+
+                cost = (num_files + 1, num_bytes + file_size, index)
+                current = best.get(search_time)
+                if current is None:
+                    best[search_time] = cost
+                    if selection == 'ORDER':
+                        break
+                elif selection == 'FEWEST_FILES' and cost[0] < current[0]:
+                    best[search_time] = cost
+                elif (selection == 'SMALLEST_SIZE' and
+                      cost[1::-1] < current[1::-1]):
+                    best[search_time] = cost
+
+        if valid_time not in best:
             return None
 
+        files_found = []
+        search_time = valid_time
+        while search_time in inputs:
+            search_file, field_info, accum_amount, _ = (
+                inputs[search_time][best[search_time][2]]
+            )
+            files_found.append((search_file, field_info))
+            search_time -= timedelta(seconds=accum_amount)
+
         return files_found
 
     def get_lowest_fcst_file(self, valid_time, data_src):
@@ -792,10 +1043,7 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
             search_file = do_string_sub(search_file, **time_info)
             self.logger.debug(f"Looking for {search_file}")
 
-            search_file = preprocess_file(
-                search_file,
-                self.c_dict[data_src+'_INPUT_DATATYPE'],
-                self.config)
+            search_file = self._preprocess_input(search_file, data_src)
 
             if search_file is not None:
                 return search_file, forecast_lead
@@ -848,9 +1096,25 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                   in_template)
         input_path = do_string_sub(input_path, **time_info)
 
-        return preprocess_file(input_path,
-                               self.c_dict[f'{data_src}_INPUT_DATATYPE'],
-                               self.config), lead
+        return self._preprocess_input(input_path, data_src), lead
+
+    def _preprocess_input(self, input_path, data_src):
+        """! Get path to input file, decompressing or converting it if needed.
+        If directory contents are cached, files that are not in the cached
+        listing are skipped without checking the file system.
+
+          @param input_path path to input file
+          @param data_src type of data (FCST or OBS)
+          @returns path to input file or None if not found
+        """
+        data_type = self.c_dict[f'{data_src}_INPUT_DATATYPE']
+        if (self._dir_listing is not None and
+                self.c_dict.get('INPUT_MUST_EXIST', True) and
+                not self._dir_listing.may_preprocess(input_path, data_type,
+                                                     self.config)):
+            return None
+
+        return preprocess_file(input_path, data_type, self.config)
 
     def get_template_accum(self, accum_dict, search_time, lead, data_src):
         # apply string substitution to accum amount
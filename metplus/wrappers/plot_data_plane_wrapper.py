@@ -139,15 +139,31 @@ class PlotDataPlaneWrapper(CommandBuilder):
              Args:
                 @param time_info dictionary containing timing information
         """
+        command_group = self.prepare_command_group(time_info)
+        if not command_group:
+            return False
+
+        return self.run_command_groups([command_group])
+
+    def prepare_command_group(self, time_info):
+        """! Build the plot_data_plane command and the command to convert the
+        output to an image if requested without running them. The commands
+        can be run with run_command_groups, which allows plots from many run
+        times to be generated concurrently.
+
+            @param time_info dictionary containing timing information
+            @returns list of prepared commands to run in order or None if
+             the commands could not be built
+        """
         self.clear()
 
         # get input files
         if not self.find_input_files(time_info):
-            return False
+            return None
 
         # get output path
         if not self.find_and_check_output_file(time_info):
-            return False
+            return None
 
         # get other configurations for command
         self.set_command_line_arguments(time_info)
@@ -155,13 +171,20 @@ class PlotDataPlaneWrapper(CommandBuilder):
         # set environment variables if using config file
         self.set_environment_variables(time_info)
 
-        if not self.build():
-            return False
+        cmd = self.get_command()
+        if cmd is None:
+            self.log_error("Could not generate command")
+            return None
+
+        command_group = [self.prepare_command(cmd)]
 
         if self.c_dict['CONVERT_TO_IMAGE']:
-            return self.convert_to_png(self.get_output_path())
+            convert_command = self.get_convert_command(self.get_output_path())
+            if not convert_command:
+                return None
+            command_group.append(self.prepare_command(convert_command))
 
-        return True
+        return command_group
 
     def find_input_files(self, time_info):
         # if using python embedding input, don't check if file exists,
@@ -212,15 +235,25 @@ class PlotDataPlaneWrapper(CommandBuilder):
             @param ps_filename ps file generated by plot_data_plane
             @returns True if success, False if error
         """
+        convert_command = self.get_convert_command(ps_filename)
+        if not convert_command:
+            return False
+
+        return self.run_command(convert_command)
+
+    def get_convert_command(self, ps_filename):
+        """! Get command to convert output postscript file to a rotated png
+
+            @param ps_filename ps file generated by plot_data_plane
+            @returns command string or None if CONVERT is not set
+        """
         convert_exe = self.c_dict.get('CONVERT_EXE')
         if not convert_exe:
             self.log_error("[exe] CONVERT not set correctly. Cannot generate"
                            "image file.")
-            return False
+            return None
 
         png_filename = f"{os.path.splitext(ps_filename)[0]}.png"
-        convert_command = (f"{convert_exe} -rotate 90 "
-                           f"-background white -flatten "
-                           f"{ps_filename} {png_filename}")
-
-        return self.run_command(convert_command)
+        return (f"{convert_exe} -rotate 90 "
+                f"-background white -flatten "
+                f"{ps_filename} {png_filename}")
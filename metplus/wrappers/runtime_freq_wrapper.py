@@ -17,7 +17,7 @@ from ..util import time_util
 from . import CommandBuilder
 from ..util import do_string_sub
 from ..util import log_runtime_banner, get_lead_sequence, is_loop_by_init
-from ..util import skip_time, getlist
+from ..util import skip_time, getlist, get_shard, is_in_shard
 from ..util import time_generator, add_to_time_input
 
 '''!@namespace RuntimeFreqWrapper
@@ -26,8 +26,82 @@ from ..util import time_generator, add_to_time_input
 '''
 
 
+class TimeIndexedFileList(list):
+    """! List of file dictionaries (see get_files_from_time) that also keeps
+    an index of the position of each item by init, valid, forecast lead
+    (in seconds), and storm ID. This allows the items that may match a run
+    time to be found with dictionary lookups instead of comparing the time
+    information of every item. Items should only be added with append or
+    extend so that the index stays current.
+    """
+    INDEX_KEYS = ('init', 'valid', 'lead', 'storm_id')
+
+    def __init__(self, items=()):
+        super().__init__()
+        self._index = {key: {} for key in self.INDEX_KEYS}
+        self.extend(items)
+
+    @staticmethod
+    def _get_index_value(time_info, key):
+        """! Get value to index for time info key. Forecast leads are
+        converted to seconds so that equivalent leads share the same key.
+        Lead is None if seconds cannot be computed, e.g. using months.
+        """
+        value = time_info.get(key, '*')
+        if key != 'lead' or value == '*':
+            return value
+        return time_util.ti_get_seconds_from_lead(value,
+                                                  time_info.get('valid', '*'))
+
+    def append(self, file_dict):
+        time_info = file_dict.get('time_info', {})
+        for key in self.INDEX_KEYS:
+            value = self._get_index_value(time_info, key)
+            self._index[key].setdefault(value, []).append(len(self))
+        super().append(file_dict)
+
+    def extend(self, items):
+        for file_dict in items:
+            self.append(file_dict)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def find(self, time_info, keys):
+        """! Get positions of items that may match the time information.
+        Items that are returned must still be checked with compare_time_info,
+        but items that are not returned are guaranteed not to match.
+
+        @param time_info dictionary containing time information for run
+        @param keys list of time info keys to use to narrow the search
+        @returns sorted list of positions of items that may match
+        """
+        matches = None
+        for key in keys:
+            value = self._get_index_value(time_info, key)
+            if value is None or value == '*':
+                continue
+
+            positions = set(self._index[key].get(value, ()))
+            # leads that could not be converted to seconds are compared
+            # directly in compare_time_info, so they must be checked
+            if key == 'lead':
+                positions.update(self._index[key].get(None, ()))
+
+            matches = positions if matches is None else matches & positions
+
+        if matches is None:
+            return range(len(self))
+
+        return sorted(matches)
+
+
 class RuntimeFreqWrapper(CommandBuilder):
 
+    # time info keys used to find files that match a run time
+    TIME_INDEX_KEYS = ('init', 'valid', 'lead')
+
     # valid options for run frequency
     FREQ_OPTIONS = [
         'RUN_ONCE',
@@ -93,6 +167,15 @@ class RuntimeFreqWrapper(CommandBuilder):
 
         c_dict['TEMPLATE_DICT'] = template_dict
 
+    def runs_per_run_time(self):
+        """! Check if each run time is processed separately. Wrappers that run
+        once or once per forecast lead process files from many run times.
+
+        @returns True if each run time is processed separately
+        """
+        return self.c_dict['RUNTIME_FREQ'] in ('RUN_ONCE_PER_INIT_OR_VALID',
+                                               'RUN_ONCE_FOR_EACH')
+
     def run_all_times(self):
         if self.c_dict['RUNTIME_FREQ'] not in self.FREQ_OPTIONS:
             self.log_error(f"Invalid value for "
@@ -156,11 +239,15 @@ class RuntimeFreqWrapper(CommandBuilder):
         self.logger.debug(f"Running once for each init/valid time")
 
         success = True
-        for time_input in time_generator(self.config):
+        shard = get_shard(self.config)
+        for index, time_input in enumerate(time_generator(self.config)):
             if time_input is None:
                 success = False
                 continue
 
+            if not is_in_shard(shard, index):
+                continue
+
             log_runtime_banner(self.config, time_input, self)
             add_to_time_input(time_input,
                               instance=self.instance,
@@ -214,11 +301,15 @@ class RuntimeFreqWrapper(CommandBuilder):
         self.logger.debug(f"Running once for each init/valid and lead time")
 
         success = True
-        for time_input in time_generator(self.config):
+        shard = get_shard(self.config)
+        for index, time_input in enumerate(time_generator(self.config)):
             if time_input is None:
                 success = False
                 continue
 
+            if not is_in_shard(shard, index):
+                continue
+
             log_runtime_banner(self.config, time_input, self)
             add_to_time_input(time_input,
                               instance=self.instance,
@@ -279,17 +370,19 @@ class RuntimeFreqWrapper(CommandBuilder):
         self.logger.debug("Finding all input files")
         all_files = []
 
-        # loop over all init/valid times
-        for time_input in time_generator(self.config):
-            if time_input is None:
-                return False
+        # list each input directory once while finding files for all times
+        with self.cached_directory_listing():
+            # loop over all init/valid times
+            for time_input in time_generator(self.config):
+                if time_input is None:
+                    return False
 
-            add_to_time_input(time_input,
-                              instance=self.instance,
-                              custom=custom)
+                add_to_time_input(time_input,
+                                  instance=self.instance,
+                                  custom=custom)
 
-            lead_files = self.get_all_files_from_leads(time_input)
-            all_files.extend(lead_files)
+                lead_files = self.get_all_files_from_leads(time_input)
+                all_files.extend(lead_files)
 
         if not all_files:
             return False
@@ -308,22 +401,23 @@ class RuntimeFreqWrapper(CommandBuilder):
         lead_seq = get_lead_sequence(self.config,
                                      time_input,
                                      wildcard_if_empty=wildcard_if_empty)
-        for lead in lead_seq:
-            current_time_input = time_input.copy()
-            current_time_input['lead'] = lead
+        with self.cached_directory_listing():
+            for lead in lead_seq:
+                current_time_input = time_input.copy()
+                current_time_input['lead'] = lead
 
-            # set current lead time config and environment variables
-            time_info = time_util.ti_calculate(current_time_input)
+                # set current lead time config and environment variables
+                time_info = time_util.ti_calculate(current_time_input)
 
-            if skip_time(time_info, self.c_dict.get('SKIP_TIMES')):
-                continue
+                if skip_time(time_info, self.c_dict.get('SKIP_TIMES')):
+                    continue
 
-            file_dict = self.get_files_from_time(time_info)
-            if file_dict:
-                if isinstance(file_dict, list):
-                    lead_files.extend(file_dict)
-                else:
-                    lead_files.append(file_dict)
+                file_dict = self.get_files_from_time(time_info)
+                if file_dict:
+                    if isinstance(file_dict, list):
+                        lead_files.extend(file_dict)
+                    else:
+                        lead_files.append(file_dict)
 
         return lead_files
 
@@ -332,26 +426,27 @@ class RuntimeFreqWrapper(CommandBuilder):
             return True
 
         new_files = []
-        for run_time in time_generator(self.config):
-            if run_time is None:
-                continue
+        with self.cached_directory_listing():
+            for run_time in time_generator(self.config):
+                if run_time is None:
+                    continue
 
-            current_time_input = time_input.copy()
-            if 'valid' in run_time:
-                current_time_input['valid'] = run_time['valid']
-                del current_time_input['init']
-            elif 'init' in run_time:
-                current_time_input['init'] = run_time['init']
-                del current_time_input['valid']
-            time_info = time_util.ti_calculate(current_time_input)
-            if skip_time(time_info, self.c_dict.get('SKIP_TIMES')):
-                continue
-            file_dict = self.get_files_from_time(time_info)
-            if file_dict:
-                if isinstance(file_dict, list):
-                    new_files.extend(file_dict)
-                else:
-                    new_files.append(file_dict)
+                current_time_input = time_input.copy()
+                if 'valid' in run_time:
+                    current_time_input['valid'] = run_time['valid']
+                    del current_time_input['init']
+                elif 'init' in run_time:
+                    current_time_input['init'] = run_time['init']
+                    del current_time_input['valid']
+                time_info = time_util.ti_calculate(current_time_input)
+                if skip_time(time_info, self.c_dict.get('SKIP_TIMES')):
+                    continue
+                file_dict = self.get_files_from_time(time_info)
+                if file_dict:
+                    if isinstance(file_dict, list):
+                        new_files.extend(file_dict)
+                    else:
+                        new_files.append(file_dict)
 
         return new_files
 
@@ -445,22 +540,36 @@ class RuntimeFreqWrapper(CommandBuilder):
                or None if could not find any files
         """
         all_input_files = {}
-        if not self.c_dict.get('ALL_FILES'):
+        all_files = self.c_dict.get('ALL_FILES')
+        if not all_files:
             return all_input_files
 
+        # index files by time so matching files can be looked up directly
+        if not isinstance(all_files, TimeIndexedFileList):
+            all_files = TimeIndexedFileList(all_files)
+            self.c_dict['ALL_FILES'] = all_files
+
         if leads is None:
             lead_loop = [None]
         else:
             lead_loop = leads
 
-        for file_dict in self.c_dict['ALL_FILES']:
-            for lead in lead_loop:
-                if lead is not None:
-                    current_time_info = time_info.copy()
-                    current_time_info['lead'] = lead
-                else:
-                    current_time_info = time_info
-
+        run_time_infos = []
+        positions = set()
+        for lead in lead_loop:
+            if lead is not None:
+                current_time_info = time_info.copy()
+                current_time_info['lead'] = lead
+            else:
+                current_time_info = time_info
+            run_time_infos.append(current_time_info)
+            positions.update(all_files.find(current_time_info,
+                                            self.TIME_INDEX_KEYS))
+
+        # loop over candidates in original order so list files are consistent
+        for position in sorted(positions):
+            file_dict = all_files[position]
+            for current_time_info in run_time_infos:
                 # compare time information for each input file
                 # add file to list of files to use if it matches
                 if not self.compare_time_info(current_time_info,
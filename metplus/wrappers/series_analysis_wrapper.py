@@ -12,12 +12,14 @@ Condition codes: 0 for success, 1 for failure
 """
 
 import os
+from collections import OrderedDict
 
 # handle if module can't be loaded to run wrapper
 WRAPPER_CANNOT_RUN = False
 EXCEPTION_ERR = ''
 try:
     import netCDF4
+    import numpy as np
 except Exception as err_msg:
     WRAPPER_CANNOT_RUN = True
     EXCEPTION_ERR = err_msg
@@ -34,6 +36,48 @@ from ..util import field_read_prob_info, add_field_info_to_time_info
 from .plot_data_plane_wrapper import PlotDataPlaneWrapper
 from . import RuntimeFreqWrapper
 
+# maximum number of parsed file lists kept by each wrapper
+PARSED_FILE_LIST_CACHE_SIZE = 64
+
+
+class ParsedFileList:
+    """! Contents of a file list file with the time information parsed from
+    each file path using a filename template. The first line of the file
+    list file, which contains 'file_list', is skipped. The paths, time
+    information dictionaries, and forecast leads in seconds are stored in
+    parallel lists. Paths that do not match the template are kept in files
+    but are not included in the other lists.
+    """
+    def __init__(self, file_path, template, logger=None):
+        with open(file_path, 'r') as file_handle:
+            self.files = [line.strip()
+                          for line in file_handle.read().splitlines()[1:]]
+
+        self.time_info = []
+        self.leads = []
+        for filepath in self.files:
+            file_time_info = parse_template(template, filepath, logger)
+            if not file_time_info:
+                continue
+            self.time_info.append(file_time_info)
+            self.leads.append(
+                ti_get_seconds_from_lead(file_time_info.get('lead'),
+                                         file_time_info.get('valid'))
+            )
+
+    def get_lead_range(self):
+        """! Get the smallest and largest forecast lead in the file list.
+
+        @returns tuple of first and last forecast lead formatted as 3 digit
+         hours or None, None if no leads could be parsed
+        """
+        leads = [lead for lead in self.leads if lead is not None]
+        if not leads:
+            return None, None
+        return (str(ti_get_hours_from_lead(min(leads))).zfill(3),
+                str(ti_get_hours_from_lead(max(leads))).zfill(3))
+
+
 class SeriesAnalysisWrapper(RuntimeFreqWrapper):
     """!  Performs series analysis with filtering options
     """
@@ -84,6 +128,9 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
         'prc',
     ]
 
+    # also use storm ID to find files that match a run time
+    TIME_INDEX_KEYS = ('init', 'valid', 'lead', 'storm_id')
+
     def __init__(self, config, instance=None):
         self.app_name = 'series_analysis'
         self.app_path = os.path.join(config.getdir('MET_BIN_DIR', ''),
@@ -91,6 +138,8 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
 
         super().__init__(config, instance=instance)
 
+        self._parsed_file_lists = OrderedDict()
+
         if self.c_dict['GENERATE_PLOTS']:
             self.plot_data_plane = self._plot_data_plane_init()
 
@@ -353,6 +402,13 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
 
         c_dict['PNG_FILES'] = {}
 
+        # number of plot_data_plane and convert commands to run at once
+        c_dict['PLOT_NUM_PROCESSES'] = (
+            self.config.getint('config',
+                               'SERIES_ANALYSIS_PLOT_NUM_PROCESSES',
+                               1)
+        )
+
         c_dict['RUN_ONCE_PER_STORM_ID'] = (
             self.config.getbool('config',
                                 'SERIES_ANALYSIS_RUN_ONCE_PER_STORM_ID',
@@ -486,10 +542,11 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
     def get_all_files_for_leads(self, input_dict, leads):
         all_files = []
         current_input_dict = input_dict.copy()
-        for lead in leads:
-            current_input_dict['lead'] = lead
-            new_files = self.get_all_files_for_lead(current_input_dict)
-            all_files.extend(new_files)
+        with self.cached_directory_listing():
+            for lead in leads:
+                current_input_dict['lead'] = lead
+                new_files = self.get_all_files_for_lead(current_input_dict)
+                all_files.extend(new_files)
         return all_files
 
     def run_at_time_once(self, time_info, lead_group=None):
@@ -912,6 +969,7 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
         output_filename = os.path.basename(self.c_dict['OUTPUT_TEMPLATE'])
         output_template = os.path.join(output_dir, output_filename)
 
+        command_groups = []
         for var_info in self.c_dict['VAR_LIST']:
             name = var_info['fcst_name']
             level = var_info['fcst_level']
@@ -937,8 +995,14 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
                 self.logger.debug(f"Skipping plot for {storm_id}")
                 continue
 
-            _, nseries = self._get_netcdf_min_max(plot_input,
-                                                  'series_cnt_TOTAL')
+            # read min/max of all stats, opening the output file once
+            variable_names = ['series_cnt_TOTAL']
+            variable_names.extend(f'series_cnt_{cur_stat}'
+                                  for cur_stat in self.c_dict['STAT_LIST'])
+            min_max = self._get_netcdf_min_max_values(plot_input,
+                                                      variable_names)
+
+            _, nseries = min_max['series_cnt_TOTAL']
             nseries_str = '' if nseries is None else f" (N = {nseries})"
             time_info['nseries'] = nseries_str
 
@@ -948,10 +1012,7 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
                 if self.c_dict['PNG_FILES'].get(key) is None:
                     self.c_dict['PNG_FILES'][key] = []
 
-                min_value, max_value = (
-                    self._get_netcdf_min_max(plot_input,
-                                             f'series_cnt_{cur_stat}')
-                )
+                min_value, max_value = min_max[f'series_cnt_{cur_stat}']
                 range_min_max = f"{min_value} {max_value}"
 
                 plot_output = (f"{os.path.splitext(plot_input)[0]}_"
@@ -966,19 +1027,27 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
                 self.plot_data_plane.c_dict['FIELD_NAME'] = f"series_cnt_{cur_stat}"
                 self.plot_data_plane.c_dict['FIELD_LEVEL'] = level
                 self.plot_data_plane.c_dict['RANGE_MIN_MAX'] = range_min_max
-                self.plot_data_plane.run_at_time_once(time_info)
-                self.all_commands.extend(self.plot_data_plane.all_commands)
-                self.plot_data_plane.all_commands.clear()
+                command_group = (
+                    self.plot_data_plane.prepare_command_group(time_info)
+                )
+                if command_group:
+                    command_groups.append(command_group)
 
                 png_filename = f"{os.path.splitext(plot_output)[0]}.png"
                 self.c_dict['PNG_FILES'][key].append(png_filename)
 
+        # run plot_data_plane and convert for each stat concurrently
+        self.plot_data_plane.run_command_groups(
+            command_groups,
+            num_processes=self.c_dict['PLOT_NUM_PROCESSES']
+        )
+        self.all_commands.extend(self.plot_data_plane.all_commands)
+        self.plot_data_plane.all_commands.clear()
+
     def generate_animations(self):
         """! Use ImageMagick convert to create an animated gif from the png
               images generated from the current run
         """
-        success = True
-
         convert_exe = self.c_dict.get('CONVERT_EXE')
         if not convert_exe:
             self.log_error("[exe] CONVERT not set correctly. Cannot generate"
@@ -989,6 +1058,7 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
                                    'series_animate')
         mkdir_p(animate_dir)
 
+        command_groups = []
         for group, files in self.c_dict['PNG_FILES'].items():
             # write list of files to a text file
             list_file = f'series_animate_{group}_files.txt'
@@ -1000,10 +1070,13 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
             gif_filepath = os.path.join(animate_dir, gif_file)
             convert_command = (f"{convert_exe} -dispose Background -delay 100 "
                                f"{' '.join(files)} {gif_filepath}")
-            if not self.run_command(convert_command):
-                success = False
+            command_groups.append([self.prepare_command(convert_command)])
 
-        return success
+        # each animation is independent, so they can be run concurrently
+        return self.run_command_groups(
+            command_groups,
+            num_processes=self.c_dict['PLOT_NUM_PROCESSES']
+        )
 
     def get_fcst_file_info(self, fcst_path):
         """! Get the number of all the gridded forecast n x m tile
@@ -1016,41 +1089,17 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
             forecast tile files, and the first and last file. If info cannot
             be parsed, return (None, None, None)
         """
-        # read the file but skip the first line because it contains 'file_list'
-        with open(fcst_path, 'r') as file_handle:
-            files_of_interest = file_handle.readlines()
-
-        if len(files_of_interest) < 2:
-            self.log_error(f"No files found in file list: {fcst_path}")
-            return None, None, None
-
-        files_of_interest = files_of_interest[1:]
-        num = str(len(files_of_interest))
-
         data_type = 'BOTH' if self.c_dict['USING_BOTH'] else 'FCST'
         template = os.path.join(self.c_dict[f'{data_type}_INPUT_DIR'],
                                 self.c_dict[f'{data_type}_INPUT_TEMPLATE'])
 
-        smallest_fcst = 99999999
-        largest_fcst = -99999999
-        beg = None
-        end = None
-        for filepath in files_of_interest:
-            filepath = filepath.strip()
-            file_time_info = parse_template(template,
-                                            filepath,
-                                            self.logger)
-            if not file_time_info:
-                continue
-            lead = ti_get_seconds_from_lead(file_time_info.get('lead'),
-                                            file_time_info.get('valid'))
-            if lead < smallest_fcst:
-                smallest_fcst = lead
-                beg = str(ti_get_hours_from_lead(lead)).zfill(3)
-            if lead > largest_fcst:
-                largest_fcst = lead
-                end = str(ti_get_hours_from_lead(lead)).zfill(3)
+        file_list = self._get_parsed_file_list(fcst_path, template)
+        if not file_list.files:
+            self.log_error(f"No files found in file list: {fcst_path}")
+            return None, None, None
 
+        num = str(len(file_list.files))
+        beg, end = file_list.get_lead_range()
         if beg is None or end is None:
             return None, None, None
 
@@ -1066,13 +1115,38 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
            @returns tuple containing the minimum and maximum values or
             None, None if something went wrong
         """
+        return SeriesAnalysisWrapper._get_netcdf_min_max_values(
+            filepath, [variable_name]
+        )[variable_name]
+
+    @staticmethod
+    def _get_netcdf_min_max_values(filepath, variable_names):
+        """! Determine the min and max of many variables, opening the NetCDF
+           file once and reading each variable once. Fill values, masked
+           values, and NaN are ignored.
+
+           @param filepath NetCDF file to inspect
+           @param variable_names list of variable names to read
+           @returns dictionary where key is variable name and value is a
+            tuple containing the minimum and maximum values or None, None if
+            the file or variable could not be read or has no valid values
+        """
+        min_max = {name: (None, None) for name in variable_names}
         try:
-            nc_var = netCDF4.Dataset(filepath).variables[variable_name]
-            min_value = nc_var[:].min()
-            max_value = nc_var[:].max()
-            return min_value, max_value
-        except (FileNotFoundError, KeyError):
-            return None, None
+            nc_file = netCDF4.Dataset(filepath)
+        except (FileNotFoundError, OSError):
+            return min_max
+
+        with nc_file:
+            for name in variable_names:
+                if name not in nc_file.variables:
+                    continue
+                values = np.ma.masked_invalid(nc_file.variables[name][:])
+                if values.count() == 0:
+                    continue
+                min_max[name] = values.min(), values.max()
+
+        return min_max
 
     def get_formatted_fields(self, var_info, fcst_path, obs_path):
         """! Get forecast and observation field information for var_info and
@@ -1111,8 +1185,8 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
         template = os.path.join(self.c_dict[f'{other}_INPUT_DIR'],
                                 self.c_dict[f'{other}_INPUT_TEMPLATE'])
         # for each file apply time info to field info and add to list
-        for file_time_info in self._get_times_from_file_list(file_list_path,
-                                                             template):
+        file_list = self._get_parsed_file_list(file_list_path, template)
+        for file_time_info in file_list.time_info:
             level = do_string_sub(var_info[f'{data_type}_level'],
                                   **file_time_info)
             field = self.get_field_info(
@@ -1132,13 +1206,28 @@ class SeriesAnalysisWrapper(RuntimeFreqWrapper):
         return any(item in ['init', 'valid', 'lead']
                    for item in get_tags(level))
 
-    @staticmethod
-    def _get_times_from_file_list(file_path, template):
-        with open(file_path, 'r') as file_handle:
-            file_list = file_handle.read().splitlines()[1:]
-
-        for file_name in file_list:
-            file_time_info = parse_template(template, file_name)
-            if not file_time_info:
-                continue
-            yield file_time_info
+    def _get_parsed_file_list(self, file_path, template):
+        """! Get file list file contents with time information parsed from
+        each file path. The result is cached so that the file list is only
+        read and parsed once for each template, even though it is used for
+        every field in VAR_LIST and again when generating plots. The
+        modification time and size of the file list file are included in the
+        key so a file list that is rewritten is parsed again. Only the
+        PARSED_FILE_LIST_CACHE_SIZE most recently used file lists are kept.
+
+        @param file_path path to file list file
+        @param template filename template used to parse time information
+        @returns ParsedFileList object
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), template,
+               stat.st_mtime_ns, stat.st_size)
+        file_list = self._parsed_file_lists.get(key)
+        if file_list is None:
+            file_list = ParsedFileList(file_path, template, self.logger)
+            self._parsed_file_lists[key] = file_list
+            while len(self._parsed_file_lists) > PARSED_FILE_LIST_CACHE_SIZE:
+                self._parsed_file_lists.popitem(last=False)
+        else:
+            self._parsed_file_lists.move_to_end(key)
+        return file_list
@@ -326,6 +326,13 @@ class TCGenWrapper(CommandBuilder):
 
         return cmd
 
+    def runs_per_run_time(self):
+        """! This wrapper processes all run times at once.
+
+        @returns False
+        """
+        return False
+
     def run_all_times(self):
         """! Runs the MET application for a given run time. This function
               loops over the list of forecast leads and runs the
@@ -315,6 +315,14 @@ class TCPairsWrapper(CommandBuilder):
                                                  True)
         return c_dict
 
+    def runs_per_run_time(self):
+        """! Check if each run time is processed separately. All files are
+        processed at once if READ_ALL_FILES or RUN_ONCE is set.
+
+        @returns True if each run time is processed separately
+        """
+        return not (self.c_dict['READ_ALL_FILES'] or self.c_dict['RUN_ONCE'])
+
     def run_all_times(self):
         """! Build up the command to invoke the MET tool tc_pairs.
         """
@@ -219,6 +219,13 @@ class TCMPRPlotterWrapper(CommandBuilder):
         self.add_env_var('MET_INSTALL_DIR', self.c_dict['MET_INSTALL_DIR'])
         super().set_environment_variables()
 
+    def runs_per_run_time(self):
+        """! This wrapper processes all run times at once.
+
+        @returns False
+        """
+        return False
+
     def run_all_times(self):
         """! Builds the command for invoking tcmpr.R plot script. """
         self.logger.debug(f"Script: {self.c_dict['TCMPR_SCRIPT']}")
@@ -12,7 +12,6 @@ data field
 import numpy as np
 import xarray as xr
 import pandas as pd
-import pyresample as pyr
 from pandas.tseries.offsets import DateOffset
 from datetime import datetime, timedelta
 from sklearn.metrics import mean_squared_error
@@ -21,6 +20,12 @@ from glob import glob
 import warnings
 import os, sys
 
+# import regrid_util directly from the METplus source tree so the metplus
+# package and its dependencies are not required in this environment
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                *[os.pardir]*5, 'metplus', 'util'))
+import regrid_util
+
 
 if len(sys.argv) < 6:
     print("Must specify the following elements: fcst_file obs_file ice_file, climo_file, valid_date, file_flag")
@@ -152,40 +157,26 @@ ice_data2['lat']=ice_data2.lat.astype('single')
 def regrid(model,obs):
     """
     regrid data to obs -- this assumes DataArrays
+    gaussian-weighted kd-tree weights are cached on disk by regrid_util
+    so they are only computed once for each pair of grids
     """
-    #model2=model.copy()
-    model2=model
-    model2_lon=model2.lon.values
-    model2_lat=model2.lat.values
-    model2_data=model2.to_masked_array()
+    model2_lon=model.lon.values
+    model2_lat=model.lat.values
+    model2_data=model.to_masked_array()
     if model2_lon.ndim==1:
         model2_lon,model2_lat=np.meshgrid(model2_lon,model2_lat)
 
-    #obs2=obs.copy()
-    obs2=obs
-    obs2_lon=obs2.lon.astype('single').values
-    obs2_lat=obs2.lat.astype('single').values
-    obs2_data=obs2.astype('single').to_masked_array()
-    if obs2.lon.ndim==1:
-        obs2_lon,obs2_lat=np.meshgrid(obs2.lon.values,obs2.lat.values)
-
-    model2_lon1=pyr.utils.wrap_longitudes(model2_lon)
-    #model2_lat1=model2_lat.copy()
-    model2_lat1=model2_lat
-    obs2_lon1=pyr.utils.wrap_longitudes(obs2_lon)
-    #obs2_lat1=obs2_lat.copy()
-    obs2_lat1=obs2_lat
-
-    # pyresample gausssian-weighted kd-tree interp
-    # define the grids
-    orig_def = pyr.geometry.GridDefinition(lons=model2_lon1,lats=model2_lat1)
-    targ_def = pyr.geometry.GridDefinition(lons=obs2_lon1,lats=obs2_lat1)
+    obs2_lon=obs.lon.astype('single').values
+    obs2_lat=obs.lat.astype('single').values
+    if obs.lon.ndim==1:
+        obs2_lon,obs2_lat=np.meshgrid(obs.lon.values,obs.lat.values)
+
+    # gaussian-weighted kd-tree interp
     radius=50000
     sigmas=25000
-    model2_data2=pyr.kd_tree.resample_gauss(orig_def,model2_data,targ_def,
-                                            radius_of_influence=radius,
-                                            sigmas=sigmas,
-                                            fill_value=None)
+    model2_data2=regrid_util.regrid(model2_lon,model2_lat,model2_data,
+                                    obs2_lon,obs2_lat,method='gauss',
+                                    radius=radius,sigma=sigmas)
     model=xr.DataArray(model2_data2,coords=[obs.lat.values,obs.lon.values],dims=['lat','lon'])
 
     return model
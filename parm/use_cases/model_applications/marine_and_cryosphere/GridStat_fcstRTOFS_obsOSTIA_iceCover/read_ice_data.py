@@ -15,10 +15,15 @@ from sklearn.metrics import mean_squared_error
 import xarray as xr
 import pandas as pd
 from pyproj import Geod
-import pyresample as pyr
 from datetime import datetime, date
 import os, sys
 
+# import regrid_util directly from the METplus source tree so the metplus
+# package and its dependencies are not required in this environment
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                *[os.pardir]*5, 'metplus', 'util'))
+import regrid_util
+
 #-------------------------------------
 def iceArea(lon1,lat1,ice1):
     """
@@ -112,22 +117,14 @@ rtofs_extent,rtofs_area,rtofs_surface_area=iceArea(rlon,rlat,rice)
 # interpolate rtofs to ncep grid
 print('interpolating rtofs to OSTIA grid')            
     
-# pyresample gausssian-weighted kd-tree interp
-rlon1=pyr.utils.wrap_longitudes(rlon)
-rlat1=rlat.copy()
-nlon1=pyr.utils.wrap_longitudes(nlon)
+# gausssian-weighted kd-tree interp
+# weights are cached on disk by regrid_util so they are only computed once
+nlon1=((nlon+180)%360)-180 # wrap longitudes to -180 - 180
 nlat1=nlat.copy()
-# define the grids
-orig_def = pyr.geometry.GridDefinition(lons=rlon1,lats=rlat1)
-targ_def = pyr.geometry.GridDefinition(lons=nlon1,lats=nlat1)
 radius=50000
 sigmas=25000    
-rice2=pyr.kd_tree.resample_gauss(orig_def,rice,targ_def,
-                                     radius_of_influence=radius,
-                                     sigmas=sigmas,
-                                     nprocs=8,
-                                     neighbours=8,
-                                     fill_value=None)
+rice2=regrid_util.regrid(rlon,rlat,rice,nlon1,nlat1,method='gauss',
+                         radius=radius,sigma=sigmas,neighbours=8)
             
 print('creating combined mask')
 combined_mask=np.logical_and(nice.mask,rice2.mask)
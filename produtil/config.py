@@ -11,7 +11,7 @@ ways of automatically accessing configuration options."""
 # decides what symbols are imported by "from produtil.config import *"
 __all__=['from_file','confwalker','ProdConfig','ENVIRONMENT','ProdTask']
 
-import collections,re,string,os,logging,threading
+import collections,re,string,os,logging,threading,functools
 import os.path,sys
 import datetime
 import produtil.fileop, produtil.datastore
@@ -82,11 +82,11 @@ class ConfFormatter(Formatter):
         if quoted_literals:
             self.format=self.slow_format
             self.vformat=self.slow_vformat
-            self.parse=qparse
+            self.parse=_cached_qparse
 
     @property
     def quoted_literals(self):
-        return self.parse==qparse
+        return self.parse==_cached_qparse
 
     def slow_format(self,format_string,*args,**kwargs):
         return self.vformat(format_string,args,kwargs)
@@ -127,6 +127,9 @@ class ConfFormatter(Formatter):
         @param args the indexed arguments to str.format()
         @param kwargs the keyword arguments to str.format()"""
         kwargs['__depth']+=1
+        deps=kwargs.get('__deps',None)
+        if deps is not None:
+            deps.add(key)
         if kwargs['__depth']>=configparser.MAX_INTERPOLATION_DEPTH:
             raise configparser.InterpolationDepthError(kwargs['__key'],
                 kwargs['__section'],key)
@@ -241,6 +244,13 @@ def qparse(format_string):
         result.append( ( literal_text, None, None, None ) )
     return result
 
+@functools.lru_cache(maxsize=4096)
+def _cached_qparse(format_string):
+    """!Same as qparse but remembers the parsed form of each format
+    string so the regular expression only runs once per string.  The
+    result is a tuple so the cached value cannot be modified."""
+    return tuple(qparse(format_string))
+
 ########################################################################
 
 ##@var FCST_KEYS
@@ -355,6 +365,9 @@ class ConfTimeFormatter(ConfFormatter):
         @param kwargs the keyword arguments to str.format()"""
         v=NOTFOUND
         kwargs['__depth']+=1
+        deps=kwargs.get('__deps',None)
+        if deps is not None:
+            deps.add(key)
         if kwargs['__depth']>=configparser.MAX_INTERPOLATION_DEPTH:
             raise configparser.InterpolationDepthError(
                 kwargs['__key'],kwargs['__section'],v)
@@ -555,6 +568,12 @@ class ProdConfig(object):
         self._conf.add_section('dir')
         self._fallback_callbacks=list()
 
+        # expanded values of options read without morevars or taskvars,
+        # keyed by (section,option), and the names of the options that
+        # each expanded value depends on, used to discard stale values
+        self._interp_cache=dict()
+        self._interp_deps=collections.defaultdict(set)
+
     @property
     def quoted_literals(self):
         return self._time_formatter.quoted_literals and \
@@ -721,7 +740,9 @@ class ProdConfig(object):
         ProdConfig object to read additional files.
         @param source the file to read
         @return self"""
-        self._conf.read(source)
+        with self:
+            self._conf.read(source)
+            self._clear_interp_cache()
         return self
 
     def readfp(self,source):
@@ -731,7 +752,9 @@ class ProdConfig(object):
         This is used to implement the readstr.
         @param source the opened file to read
         @return self"""
-        self._conf.readfp(source)
+        with self:
+            self._conf.readfp(source)
+            self._clear_interp_cache()
         return self
 
     def readstr(self,string):
@@ -743,7 +766,23 @@ class ProdConfig(object):
         @param string the string to parse
         @return self"""
         sio=StringIO(string)
-        self._conf.readfp(sio)
+        with self:
+            self._conf.readfp(sio)
+            self._clear_interp_cache()
+        return self
+
+    def read_dict(self,dictionary):
+        """!reads config data from a dict
+
+        Reads config data from a dict of sections, each of which is
+        a dict of option names and values, adding it to the
+        configuration.  This is faster than setting each option with
+        self.set when many options are set at once.
+        @param dictionary the dict of sections to read
+        @return self"""
+        with self:
+            self._conf.read_dict(dictionary)
+            self._clear_interp_cache()
         return self
 
     def set_options(self,section,**kwargs):
@@ -756,8 +795,7 @@ class ProdConfig(object):
         @param kwargs additional keyword arguments are the option names
             and values"""
         for k,v in kwargs.items():
-            value=str(v)
-            self._conf.set(section,k,value)
+            self.set(section,k,v)
 
     @property
     def realtime(self):
@@ -773,7 +811,25 @@ class ProdConfig(object):
         Sets the specified config option (key) in the specified
         section, to the specified value.  All three are converted to
         strings via str() before setting the value."""
-        self._conf.set(str(section),str(key),str(value))
+        with self:
+            self._conf.set(str(section),str(key),str(value))
+            self._clear_interp_cache(str(key))
+    def _clear_interp_cache(self,opt=None):
+        """!discard cached expanded values
+
+        Discards the cached results of string expansion that may have
+        changed.  This must be called whenever the underlying
+        ConfigParser object is modified.
+        @param opt the name of the option that changed.  Only values
+          that refer to an option with this name are discarded.  If
+          None or @inc, all cached values are discarded."""
+        with self:
+            if opt is None or opt=='@inc':
+                self._interp_cache.clear()
+                self._interp_deps.clear()
+                return
+            for cache_key in self._interp_deps.pop(opt,()):
+                self._interp_cache.pop(cache_key,None)
     def __enter__(self):
         """!grab the thread lock
 
@@ -816,15 +872,17 @@ class ProdConfig(object):
         """!returns the Datastore
 
         Returns the produtil.datastore.Datastore object for this
-        ProdConfig."""
+        ProdConfig.  The sqlite3 write-ahead log is used instead of
+        file locking if [config] datastore_wal is true."""
         d=self._datastore
         if d is not None:
             return d
         with self:
             if self._datastore is None:
                 dsfile=self.getstr('config','datastore')
+                wal=self.getbool('config','datastore_wal',False)
                 self._datastore=produtil.datastore.Datastore(dsfile,
-                    logger=self.log('datastore'))
+                    logger=self.log('datastore'),wal=wal)
             return self._datastore
 
     ##@var datastore
@@ -892,6 +950,7 @@ class ProdConfig(object):
                              ('DD','%d'), ('hour','%H'), ('cyc','%H'),
                              ('HH','%H'), ('minute','%M'), ('min','%M') ]:
                 self._conf.set('config',var,self._cycle.strftime(fmt))
+            self._clear_interp_cache()
     def add_section(self,sec):
         """!add a new config section
 
@@ -1141,6 +1200,61 @@ class ProdConfig(object):
         @param taskvars  serves the same purpose as morevars, but
         provides a second scope.
         @return the result of the string expansion"""
+        if morevars is None and taskvars is None:
+            got=self._interp_cache.get((sec,opt),None)
+            if got is not None:
+                return got
+            return self._interp_and_cache(sec,opt)
+        return self._interp_uncached(sec,opt,morevars,taskvars)
+
+    def _interp_and_cache(self,sec,opt):
+        """!expand an option and remember the result
+
+        Expands option opt from section sec without any additional
+        variables and stores the result along with the names of the
+        options that were referenced while expanding it, so that the
+        result can be discarded when any of those options change.
+        Values that refer to environment variables are not cached
+        since the environment can change without the ProdConfig
+        knowing about it.
+        @param sec the section name
+        @param opt the option name
+        @return the result of the string expansion"""
+        deps=set()
+        got=self._interp_uncached(sec,opt,None,None,deps=deps)
+        if 'ENV' not in deps:
+            self._cache_value((sec,opt),got,[opt]+list(deps))
+        return got
+
+    def _cache_value(self,cache_key,value,deps):
+        """!remember a value computed from the configuration
+
+        Stores a value so it can be looked up in self._interp_cache
+        until one of the options it depends on is changed.
+        @param cache_key hashable key to store the value under
+        @param value the value to store
+        @param deps names of the options that the value depends on.
+          Names may include a section, i.e. section/option"""
+        with self:
+            self._interp_cache[cache_key]=value
+            for dep in deps:
+                if not isinstance(dep,str):
+                    continue
+                isec=dep.find('/')
+                if isec>=0 and dep[(isec+1):]:
+                    dep=dep[(isec+1):]
+                self._interp_deps[dep].add(cache_key)
+
+    def _interp_uncached(self,sec,opt,morevars,taskvars,deps=None):
+        """!expand an option without using cached values
+
+        See _interp for details.
+        @param sec the section name
+        @param opt the option name
+        @param morevars,taskvars dicts of more variables for string expansion
+        @param deps if not None, a set that the names of all variables
+          referenced during string expansion are added to
+        @return the result of the string expansion"""
         sections=( sec, 'config','dir', '@inc' )
         gotted=False
         for section in sections:
@@ -1176,7 +1290,7 @@ class ProdConfig(object):
         if morevars is None:
             return self._formatter.format(got,
                 __section=sec,__key=opt,__depth=0,__conf=self._conf,
-                ENV=ENVIRONMENT, __taskvars=taskvars)
+                ENV=ENVIRONMENT, __taskvars=taskvars, __deps=deps)
         else:
             return self._formatter.format(got,
                 __section=sec,__key=opt,__depth=0,__conf=self._conf,
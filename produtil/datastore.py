@@ -9,6 +9,7 @@ Datastore."""
 import sqlite3, threading, collections, re, contextlib, time, random,\
     traceback, datetime, logging, os, time
 import produtil.fileop, produtil.locking, produtil.sigsafety, produtil.log
+import produtil.filewatch
 
 ##@var __all__
 # Symbols exported by "from produtil.datastore import *"
@@ -142,8 +143,18 @@ class Datastore(object):
     parameter, and an arbitrary list of (key,value) metadata pairs.
     This object can safely be accessed by multiple threads in the
     local process, and handles concurrency between processes via file
-    locking."""
-    def __init__(self,filename,logger=None,locking=True):
+    locking.
+
+    If wal=True, the sqlite3 write-ahead log is used instead of file
+    locking.  Readers then never block writers, and writers wait for
+    each other with the sqlite3 busy timeout instead of retrying an
+    external lock file.  Connections are kept in a pool and reused by
+    any thread that starts a transaction.  The write-ahead log
+    requires shared memory, so all processes that use the database
+    must run on the same host: do not use it for database files that
+    are accessed from several nodes on a network filesystem."""
+    def __init__(self,filename,logger=None,locking=True,wal=False,
+                 busy_timeout=300):
         """!Datastore constructor
 
         Creates a Datastore for the specified sqlite3 file.  Uses the
@@ -164,19 +175,30 @@ class Datastore(object):
           write at the same time.  This functionality is provided
           for the rare situation where you are unable to write to
           a database, such as when reading other users' sqlite3 
-          database files."""
+          database files.
+        @param wal use the sqlite3 write-ahead log and busy timeouts
+          instead of file locking.  See the class documentation.
+        @param busy_timeout if wal=True, the number of seconds to wait
+          for another process to finish writing before giving up"""
         self._logger=logger
         self.filename=filename
         self.db=None
         self._locking=locking
+        self._wal=wal
+        self._busy_timeout=busy_timeout
         self._connections=dict()
+        self._idle_connections=list()
         self._map_lock=threading.Lock()
         self._db_lock=threading.Lock()
-        lockfile=filename+'.lock'
-        if logger is not None:
-            logger.debug('Lockfile is %s for database %s'%(lockfile,filename))
-        self._file_lock=produtil.locking.LockFile(
-            lockfile,logger=logger,max_tries=300,sleep_time=0.1,first_warn=50)
+        self._file_lock=None
+        if not wal:
+            lockfile=filename+'.lock'
+            if logger is not None:
+                logger.debug('Lockfile is %s for database %s'%(
+                    lockfile,filename))
+            self._file_lock=produtil.locking.LockFile(
+                lockfile,logger=logger,max_tries=300,sleep_time=0.1,
+                first_warn=50)
         self._transtack=collections.defaultdict(list)
         with self.transaction():
             self._createdb(self._connection())
@@ -188,15 +210,40 @@ class Datastore(object):
 
     def _connection(self):
         """!Gets the current thread's database connection.  Each thread
-        has its own connection."""
+        has its own connection.  If wal=True, that is the pooled
+        connection used by the thread's current transaction."""
         tid=threading.current_thread().ident
         with self._map_lock:
             if tid in self._connections:
                 return self._connections[tid]
+            elif self._wal:
+                c=self._idle_connections.pop() if self._idle_connections \
+                    else self._wal_connect()
+                self._connections[tid]=c
+                return c
             else:
                 c=sqlite3.connect(self.filename)
                 self._connections[tid]=c
                 return c
+    def _wal_connect(self):
+        """!Opens a new connection for the write-ahead log mode.  The
+        connection can be used by any thread, and transactions are
+        started explicitly by _lock() so that they take the write
+        lock immediately instead of upgrading a read lock."""
+        c=sqlite3.connect(self.filename,timeout=self._busy_timeout,
+                          isolation_level=None,check_same_thread=False)
+        if self._locking:
+            c.execute('PRAGMA journal_mode=WAL')
+            c.execute('PRAGMA synchronous=NORMAL')
+        return c
+    def _release_connection(self):
+        """!Returns the current thread's connection to the pool of idle
+        connections so another thread can reuse it."""
+        tid=threading.current_thread().ident
+        with self._map_lock:
+            c=self._connections.pop(tid,None)
+            if c is not None:
+                self._idle_connections.append(c)
     @contextlib.contextmanager
     def _mystack(self):
         """!Gets the transaction stack for the current thread."""
@@ -205,6 +252,14 @@ class Datastore(object):
             yield self._transtack[tid]
     def _lock(self):
         """!Acquires the database lock for the current thread."""
+        if self._wal:
+            if not self._locking: return
+            try:
+                self._connection().execute('BEGIN IMMEDIATE')
+            except:
+                self._release_connection()
+                raise
+            return
         if not self._locking: return
         self._db_lock.acquire()
         try:
@@ -216,6 +271,9 @@ class Datastore(object):
         """!Releases the database lock from the current thread.  If the
         current thread does not have the lock, the results are
         undefined."""
+        if self._wal:
+            self._release_connection()
+            return
         if not self._locking: return
         self._file_lock.release()
         self._db_lock.release()
@@ -295,7 +353,14 @@ class Transaction(object):
             first=not s # True = first transaction from this thread
             s.append(self)
         if first:
-            self.ds._lock()
+            try:
+                self.ds._lock()
+            except:
+                # the transaction never started, so the next one from
+                # this thread must get the lock again
+                with self.ds._mystack() as s:
+                    s.remove(self)
+                raise
         return self
     def __exit__(self,etype,evalue,traceback):
         """!Releases the database lock if this is the last Transaction
@@ -321,6 +386,12 @@ class Transaction(object):
         @param subvals the substitution values"""
         cursor=self.ds._connection().execute(stmt,subvals)
         return cursor.lastrowid
+    def mutate_many(self,stmt,seq_of_subvals):
+        """!Performs the same SQL database modification once for each
+        set of substitution values in one call to executemany.
+        @param stmt the SQL query
+        @param seq_of_subvals an iterable of substitution values"""
+        self.ds._connection().executemany(stmt,seq_of_subvals)
     def init_datum(self,d,meta=True):
         """!Add a Datum to the database if it is not there already.
 
@@ -343,9 +414,9 @@ class Transaction(object):
                     break
 
         if meta and d._meta is not None and d._meta: 
-            for k,v in d._meta.items():
-                if k!='location' and k!='available':
-                    self.mutate('INSERT OR IGNORE INTO metadata VALUES (?,?,?)',(d.did,k,v))
+            self.mutate_many('INSERT OR IGNORE INTO metadata VALUES (?,?,?)',
+                             [(d.did,k,v) for k,v in d._meta.items()
+                              if k!='location' and k!='available'])
         if meta:
             self.refresh_meta(d,or_add=False)
     def update_datum(self,d):
@@ -991,7 +1062,7 @@ class UpstreamFile(Product):
 
 def wait_for_products(plist,logger,renamer=None,action=None,
                       renamer_args=None,action_args=None,sleeptime=20,
-                      maxtime=1800):
+                      maxtime=1800,watch=True,min_sleeptime=1):
     """!Waits for products to be available and performs an action on them.
 
     Waits for a specified list of products to be available, and
@@ -1016,6 +1087,15 @@ def wait_for_products(plist,logger,renamer=None,action=None,
        set to something lower than that.  Default: 20
     @param maxtime - maximum amount of time to spend in this routine
        before giving up.
+    @param watch - if True and inotify is available, wake up as soon
+       as the database or the directory of a product's location
+       changes, instead of sleeping sleeptime seconds.  Changes to
+       the lock and shared memory files of the database are ignored
+       because checking a product changes them.
+    @param min_sleeptime - if inotify is not used, the first sleep is
+       this long, and each sleep after that is twice as long as the
+       last, up to sleeptime.  The sleep time starts over whenever a
+       product becomes available.  Default: 1
     @returns the number of products that became available before the
        maximum wait time was hit.    """
     if renamer is None:
@@ -1025,7 +1105,7 @@ def wait_for_products(plist,logger,renamer=None,action=None,
     if not ( isinstance(plist,tuple) or isinstance(plist,list) ):
         raise TypeError('In wait_for_products, plist must be a '
                         'list or tuple, not a '+type(plist).__name__)
-    now=int(time.time())
+    now=time.time()
     start=now
     seen=set()
     for p in plist:
@@ -1035,28 +1115,53 @@ def wait_for_products(plist,logger,renamer=None,action=None,
     if renamer_args is None: renamer_args=list()
     if action_args is None: action_args=list()
     logger.info('Waiting for %d products.'%(int(len(plist)),))
-    while len(seen)<len(plist) and now<start+maxtime:
-        for p in plist:
-            if p in seen: continue
-            if not p.available: p.check()
-            if p.available:
-                logger.info('Product %s is available at location %s'
-                            %(repr(p.did),repr(p.location)))
-                seen.add(p)
-                if action is not None:
-                    name=renamer(p,logger,*renamer_args)
-                    action(p,name,logger,*action_args)
-            else:
-                logger.info(
-                    'Product %s not available (available=%s location=%s).'
-                    %(repr(p.did),repr(p.available),repr(p.location)))
-        now=int(time.time())
-        if now<start+maxtime and len(seen)<len(plist):
-            sleepnow=max(0.01,min(sleeptime,start+maxtime-now-1))
-            logfun=logger.info if (sleepnow>=5) else logger.debug
-            logfun('Sleeping %g seconds...'%(float(sleepnow),))
-            time.sleep(sleepnow)
-            logfun('Done sleeping.')
+    polltime=min(sleeptime,max(0.01,min_sleeptime))
+    # log unavailable products at INFO level only on a full check,
+    # not when waking up early because a watched directory changed
+    full_check=True
+    with produtil.filewatch.DirectoryWatcher(
+            logger=logger,use_inotify=watch) as watcher:
+        while len(seen)<len(plist) and now<start+maxtime:
+            missing_logfun=logger.info if full_check else logger.debug
+            for p in plist:
+                if p in seen: continue
+                if not p.available: p.check()
+                if p.available:
+                    logger.info('Product %s is available at location %s'
+                                %(repr(p.did),repr(p.location)))
+                    seen.add(p)
+                    polltime=min(sleeptime,max(0.01,min_sleeptime))
+                    if action is not None:
+                        name=renamer(p,logger,*renamer_args)
+                        action(p,name,logger,*action_args)
+                else:
+                    missing_logfun(
+                        'Product %s not available (available=%s location=%s).'
+                        %(repr(p.did),repr(p.available),repr(p.location)))
+                    if watcher.active:
+                        dbfile=os.path.abspath(p._dstore.filename)
+                        watcher.ignore(dbfile+'.lock')
+                        watcher.ignore(dbfile+'-shm')
+                        watcher.watch(os.path.dirname(dbfile))
+                        if p.location:
+                            watcher.watch(os.path.dirname(os.path.abspath(
+                                p.location)))
+            now=time.time()
+            if now<start+maxtime and len(seen)<len(plist):
+                sleepnow=max(0.01,min(sleeptime if watcher.active
+                                      else polltime,start+maxtime-now))
+                logfun=logger.info if (sleepnow>=5) else logger.debug
+                if watcher.active:
+                    logfun('Waiting up to %g seconds for changes...'
+                           %(float(sleepnow),))
+                    # an empty set means the wait timed out
+                    full_check=watcher.wait(sleepnow)==set()
+                    logfun('Done waiting.')
+                else:
+                    logfun('Sleeping %g seconds...'%(float(sleepnow),))
+                    time.sleep(sleepnow)
+                    logfun('Done sleeping.')
+                    polltime=min(sleeptime,polltime*2)
     logger.info('Done waiting for products: found %d of %d products.'
                 %(int(len(seen)),int(len(plist))))
     return len(seen)
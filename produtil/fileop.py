@@ -18,7 +18,7 @@ __all__=['FileOpError','FileOpErrors','CannotLinkMulti',
          'netcdfver','touch']
 
 import os,tempfile,filecmp,stat,shutil,errno,random,time,fcntl,math,logging
-import produtil.cluster, produtil.pipeline
+import produtil.cluster, produtil.pipeline, produtil.filewatch
 
 module_logger=logging.getLogger('produtil.fileop')
 
@@ -1056,22 +1056,87 @@ class FileWaiter:
         """!Returns the number of files that were NOT found."""
         return len(self._fset)-len(self._found)
 
+    def candidates(self,filename):
+        """!Returns the paths that may make a file ready when they are
+        created or changed.  This default implementation returns only
+        the file itself.  A subclass that overrides check() to accept
+        other paths, such as compressed copies of the file, should
+        return them here too so that their inotify events are noticed.
+        @param filename the path to the file"""
+        return [filename]
+
+    def ready_time(self,filename):
+        """!Returns the time at which a file that exists, but is too
+        new, will meet the age requirements set in the constructor.
+        This is used to check the file again at that time instead of
+        waiting for a change to its directory.
+        @param filename the path to the file
+        @returns the time in seconds since the epoch, or None if the
+          file does not exist or is too small"""
+        try:
+            s=os.stat(filename)
+        except EnvironmentError:
+            return None
+        if self.min_size is not None and s.st_size<self.min_size:
+            return None
+        ready=0
+        for age,filetime in ((self.min_mtime_age,s.st_mtime),
+                             (self.min_atime_age,s.st_atime),
+                             (self.min_ctime_age,s.st_ctime)):
+            if age is not None:
+                ready=max(ready,filetime+age+1)
+        return ready
+
     def checkfiles(self,maxwait=1800,sleeptime=20,logger=None,
-                   log_each_file=True):
+                   log_each_file=True,watch=True,min_sleeptime=1):
         """!Looks for the requested files.  Will loop, checking over
-        and over up to maxwait seconds, sleeping sleeptime seconds
-        between checks.
+        and over up to maxwait seconds, sleeping between checks.
+
+        If watch=True and inotify is available, the directories of the
+        missing files are watched, and a file is checked as soon as it
+        is written instead of after sleeping.  Files that exist but
+        are too new are checked again when they are old enough.  All
+        missing files are still checked every sleeptime seconds, since
+        files written by other hosts do not generate events.  Without
+        inotify, the sleep time starts at min_sleeptime and doubles up
+        to sleeptime, starting over whenever a file is found.
         @param maxwait maximum seconds to wait
-        @param sleeptime sleep time in seconds between checks
+        @param sleeptime maximum sleep time in seconds between checks
         @param logger a logging.Logger for messages
-        @param log_each_file log messages about each file checked"""
+        @param log_each_file log messages about each file checked
+        @param watch use inotify to wait for files if it is available
+        @param min_sleeptime the first sleep time when polling"""
         maxwait=int(maxwait)
         start=int(time.time())
-        first=True
         if log_each_file:
             flogger=logger
         else:
             flogger=None
+        watcher=produtil.filewatch.DirectoryWatcher(logger=logger,
+                                                    use_inotify=watch)
+        try:
+            return self._checkfiles(watcher,start,maxwait,sleeptime,
+                                    min_sleeptime,logger,flogger)
+        finally:
+            watcher.close()
+
+    def _checkfiles(self,watcher,start,maxwait,sleeptime,min_sleeptime,
+                    logger,flogger):
+        """!Implementation of checkfiles.
+        @param watcher the produtil.filewatch.DirectoryWatcher
+        @param start the time at which checkfiles was called
+        @param maxwait,sleeptime,min_sleeptime,logger see checkfiles
+        @param flogger a logging.Logger for messages about each file"""
+        first=True
+        changed=None
+        lastfull=start
+        retry_at=dict()
+        polltime=min(sleeptime,max(min_sleeptime,1e-3))
+        if watcher.active:
+            for filename in self._flist:
+                if filename not in self._found:
+                    for path in self.candidates(filename):
+                        watcher.watch(os.path.dirname(os.path.abspath(path)))
         while True:
             if len(self._fset)<=0: 
                 if logger is not None:
@@ -1085,46 +1150,99 @@ class FileWaiter:
             needfiles=math.ceil(self.min_fraction*nfiles)
 
             if frac>=self.min_fraction-1e-5: 
-                logger.info('Have required fraction of files.')
+                if logger is not None:
+                    logger.info('Have required fraction of files.')
                 return True
             if now-start>=maxwait: 
-                logger.info('Waited too long.  Giving up.')
+                if logger is not None:
+                    logger.info('Waited too long.  Giving up.')
                 return False
             
             if not first:
-                sleepnow=max(0,min(sleeptime,start+maxwait-now-1))
+                sleepnow=max(0,min(sleeptime if watcher.active else polltime,
+                                   start+maxwait-now-1))
                 if sleepnow<1e-3:
-                    logger.info('Waited too long.  Giving up.')
+                    if logger is not None:
+                        logger.info('Waited too long.  Giving up.')
                     return False
                 if logger is not None:
-                    logger.info('Still need files: have %d of %d, '
-                                'but need %g%% of them (%g file%s).'
-                                %(len(self._found),len(self._fset),
-                                  self.min_fraction*100.0,needfiles,
-                                  's' if (needfiles>1) else ''))
-                    logfun=logger.info if (sleepnow>=5) else logger.debug
-                    logfun('Sleeping %g seconds...'%(float(sleepnow),))
-                time.sleep(sleepnow)
-                if logger is not None:
-                    logfun('Done sleeping.')
+                    # only log each wakeup from a directory change once
+                    # per full check to avoid flooding the log
+                    logfun=logger.info if changed is None else logger.debug
+                    logfun('Still need files: have %d of %d, '
+                           'but need %g%% of them (%g file%s).'
+                           %(len(self._found),len(self._fset),
+                             self.min_fraction*100.0,needfiles,
+                             's' if (needfiles>1) else ''))
+                if watcher.active:
+                    changed=self._wait_for_change(watcher,sleepnow,
+                                                  retry_at,logger)
+                    if time.time()-lastfull>=sleeptime:
+                        # check everything every sleeptime seconds in
+                        # case files were written by another host
+                        changed=None
+                else:
+                    if logger is not None:
+                        logfun=logger.info if (sleepnow>=5) \
+                            else logger.debug
+                        logfun('Sleeping %g seconds...'%(float(sleepnow),))
+                    time.sleep(sleepnow)
+                    if logger is not None:
+                        logfun('Done sleeping.')
+                    polltime=min(sleeptime,polltime*2)
 
             first=False
 
+            now=time.time()
+            if changed is None:
+                lastfull=now
             for filename in self._flist:
                 if filename in self._found: continue
+                if changed is not None and \
+                        retry_at.get(filename,now+1)>now and \
+                        not any(os.path.abspath(path) in changed
+                                for path in self.candidates(filename)):
+                    continue
                 if self.check(filename,logger=flogger):
                     self._found.add(filename)
+                    retry_at.pop(filename,None)
+                    polltime=min(sleeptime,max(min_sleeptime,1e-3))
                     if flogger is not None:
                         flogger.info('%s: found this one (%d of %d found).'
                                     %(filename,len(self._found),
                                       len(self._fset)))
+                elif watcher.active:
+                    ready=self.ready_time(filename)
+                    if ready is None:
+                        retry_at.pop(filename,None)
+                    else:
+                        retry_at[filename]=ready
                 
         return len(self._found)>=len(self._fset)
 
+    def _wait_for_change(self,watcher,sleepnow,retry_at,logger):
+        """!Waits until a watched directory changes, a file that was too
+        new is old enough, or sleepnow seconds have passed, whichever
+        comes first.
+        @param watcher the produtil.filewatch.DirectoryWatcher
+        @param sleepnow the maximum number of seconds to wait
+        @param retry_at dict of the times at which files that were too
+          new should be checked again
+        @param logger a logging.Logger for messages
+        @returns the set of paths to check, or None to check all
+          missing files"""
+        now=time.time()
+        pending=[t for f,t in retry_at.items() if f not in self._found]
+        waitnow=max(0,min([sleepnow]+[t-now for t in pending]))
+        if logger is not None:
+            logger.debug('Waiting up to %g seconds for files...'
+                         %(float(waitnow),))
+        return watcher.wait(waitnow)
+
 def wait_for_files(flist,logger=None,maxwait=1800,sleeptime=20,
                    min_size=1,min_mtime_age=30,min_atime_age=None,
                    min_ctime_age=None,min_fraction=1.0,
-                   log_each_file=True):
+                   log_each_file=True,watch=True):
     """!Waits for files to meet requirements.  This is a simple
     wrapper around the FileWaiter class for convenience.  It is
     equivalent to creating a FileWaiter with the provided arguments,
@@ -1142,7 +1260,10 @@ def wait_for_files(flist,logger=None,maxwait=1800,sleeptime=20,
             that must match the above requirements in order for
             FileWaiter.wait to return True. Default is 1.0, which
             means all of them.
-        @param log_each_file log messages about each file checked  """
+        @param log_each_file log messages about each file checked
+        @param watch use inotify to find files as soon as they are
+            written, if it is available.  See FileWaiter.checkfiles."""
     waiter=FileWaiter(flist,min_size,min_mtime_age,min_atime_age,
                       min_ctime_age,min_fraction)
-    return waiter.checkfiles(maxwait,sleeptime,logger,log_each_file)
+    return waiter.checkfiles(maxwait,sleeptime,logger,log_each_file,
+                             watch=watch)
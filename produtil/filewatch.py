@@ -0,0 +1,284 @@
+"""!Waits for changes to directories using Linux inotify.
+
+This module implements a DirectoryWatcher that blocks until files are
+created, written, or moved into a set of directories.  It is used by
+produtil.fileop.FileWaiter and produtil.datastore.wait_for_products so
+that they can react to new files as soon as they are written instead
+of sleeping between checks.  On systems without inotify, or if the
+inotify limits are exhausted, the watcher is inactive and callers fall
+back to polling.
+
+Note that inotify only reports changes made by the local host.  Files
+written by other hosts to a network filesystem will not generate
+events, so callers must still check every file from time to time.
+
+@code
+import produtil.filewatch
+with produtil.filewatch.DirectoryWatcher() as watcher:
+    watcher.watch('/path/to/dir')
+    changed=watcher.wait(20)
+    ... changed is a set of paths that changed, or None if unknown ...
+@endcode"""
+
+import os, sys, errno, select, struct, threading, time, ctypes, ctypes.util
+
+##@var __all__
+# Symbols exported by "from produtil.filewatch import *"
+__all__=['DirectoryWatcher','inotify_available']
+
+##@var IN_MODIFY
+# inotify event: a file was modified
+IN_MODIFY=0x00000002
+
+##@var IN_ATTRIB
+# inotify event: file metadata changed, such as with touch
+IN_ATTRIB=0x00000004
+
+##@var IN_CLOSE_WRITE
+# inotify event: a file that was open for writing was closed
+IN_CLOSE_WRITE=0x00000008
+
+##@var IN_MOVED_TO
+# inotify event: a file was moved into the directory
+IN_MOVED_TO=0x00000080
+
+##@var IN_CREATE
+# inotify event: a file or directory was created
+IN_CREATE=0x00000100
+
+##@var IN_DELETE_SELF
+# inotify event: the watched directory was deleted
+IN_DELETE_SELF=0x00000400
+
+##@var IN_MOVE_SELF
+# inotify event: the watched directory was moved
+IN_MOVE_SELF=0x00000800
+
+##@var IN_Q_OVERFLOW
+# inotify event: events were lost because the queue overflowed
+IN_Q_OVERFLOW=0x00004000
+
+##@var IN_IGNORED
+# inotify event: the watch was removed
+IN_IGNORED=0x00008000
+
+##@var IN_ISDIR
+# inotify event flag: the subject of the event is a directory
+IN_ISDIR=0x40000000
+
+##@var IN_NONBLOCK
+# inotify_init1 flag: non-blocking reads
+IN_NONBLOCK=os.O_NONBLOCK
+
+##@var IN_CLOEXEC
+# inotify_init1 flag: close on exec
+IN_CLOEXEC=getattr(os,'O_CLOEXEC',0o2000000)
+
+##@var WATCH_MASK
+# Events that indicate a file may now meet the requirements of a waiter
+WATCH_MASK=IN_MODIFY|IN_ATTRIB|IN_CLOSE_WRITE|IN_MOVED_TO|IN_CREATE| \
+    IN_DELETE_SELF|IN_MOVE_SELF
+
+_EVENT_HEADER=struct.Struct('iIII')
+_libc=None
+_libc_lock=threading.Lock()
+
+def _get_libc():
+    """!Loads the C library functions needed for inotify.
+    @returns a ctypes.CDLL object, or None if inotify is not supported"""
+    global _libc
+    with _libc_lock:
+        if _libc is None:
+            _libc=False
+            if sys.platform.startswith('linux'):
+                try:
+                    libc=ctypes.CDLL(ctypes.util.find_library('c'),
+                                     use_errno=True)
+                    libc.inotify_init1.argtypes=[ctypes.c_int]
+                    libc.inotify_add_watch.argtypes=[
+                        ctypes.c_int,ctypes.c_char_p,ctypes.c_uint32]
+                    _libc=libc
+                except (OSError,AttributeError):
+                    pass
+        return _libc or None
+
+def inotify_available():
+    """!Returns True if inotify can be used on this system."""
+    return _get_libc() is not None
+
+class DirectoryWatcher(object):
+    """!Waits for files to be created, written or moved into a set of
+    directories.  If a directory does not exist yet, its nearest
+    existing parent is watched until it is created.  This object is
+    meant to be used by one thread at a time."""
+    def __init__(self,logger=None,use_inotify=True):
+        """!DirectoryWatcher constructor.
+        @param logger a logging.Logger for messages
+        @param use_inotify if False, do not use inotify even if it is
+          available.  The watcher will be inactive."""
+        self._logger=logger
+        self._fd=-1
+        self._wanted=set()
+        self._ignored=set()
+        self._watches=dict()
+        self._wds=dict()
+        libc=_get_libc() if use_inotify else None
+        if libc is not None:
+            fd=libc.inotify_init1(IN_NONBLOCK|IN_CLOEXEC)
+            if fd<0:
+                if logger is not None:
+                    logger.info('Cannot use inotify: %s'%(
+                        os.strerror(ctypes.get_errno()),))
+            else:
+                self._fd=fd
+        self._libc=libc
+
+    @property
+    def active(self):
+        """!True if inotify is being used, False if callers must poll."""
+        return self._fd>=0
+
+    def __enter__(self):
+        """!Returns self so the watcher can be closed by a with block."""
+        return self
+    def __exit__(self,etype,evalue,traceback):
+        """!Closes the watcher at the end of a with block.
+        @param etype,evalue,traceback exception information, if any"""
+        self.close()
+    def close(self):
+        """!Stops watching all directories and closes the inotify file
+        descriptor."""
+        if self._fd>=0:
+            os.close(self._fd)
+        self._fd=-1
+        self._watches.clear()
+        self._wds.clear()
+
+    def watch(self,path):
+        """!Adds a directory to the set of watched directories.
+        @param path the directory to watch"""
+        path=os.path.abspath(path)
+        if path in self._wanted:
+            return
+        self._wanted.add(path)
+        self._add_watches()
+
+    def ignore(self,path):
+        """!Ignores changes to a file in a watched directory.  This is
+        used for files that the caller changes itself, such as lock
+        files, so that they do not wake up the caller.
+        @param path the file to ignore"""
+        self._ignored.add(os.path.abspath(path))
+
+    def _add_watch(self,path):
+        """!Adds an inotify watch for one directory.
+        @param path the directory
+        @returns True if the watch was added or already existed"""
+        if path in self._watches:
+            return True
+        wd=self._libc.inotify_add_watch(self._fd,os.fsencode(path),
+                                        WATCH_MASK)
+        if wd<0:
+            err=ctypes.get_errno()
+            if err==errno.ENOSPC and self._logger is not None:
+                self._logger.info('%s: cannot watch directory: inotify '
+                                  'watch limit reached'%(path,))
+            return False
+        self._watches[path]=wd
+        self._wds[wd]=path
+        return True
+
+    def _add_watches(self):
+        """!Watches every wanted directory, or its nearest existing
+        parent if the directory does not exist yet."""
+        if not self.active:
+            return
+        for path in self._wanted:
+            while not self._add_watch(path):
+                parent=os.path.dirname(path)
+                if parent==path:
+                    break
+                path=parent
+
+    def wait(self,timeout):
+        """!Waits for a change to a watched directory.  If the watcher
+        is inactive, this simply sleeps.
+        @param timeout the maximum number of seconds to wait
+        @returns a set of the paths that were created or changed,
+          which is empty if the timeout was reached, or None if any
+          file may have changed without an event being received"""
+        timeout=max(0.0,float(timeout))
+        if not self.active:
+            time.sleep(timeout)
+            return None
+        deadline=time.time()+timeout
+        while True:
+            try:
+                ready,_,_=select.select([self._fd],[],[],
+                                        max(0.0,deadline-time.time()))
+            except InterruptedError:
+                ready=[]
+            if ready:
+                changed=self._read_events()
+                if changed is None or changed:
+                    return changed
+            if time.time()>=deadline:
+                return set()
+
+    def _read_events(self):
+        """!Reads all pending inotify events.
+        @returns the set of paths that changed, or None if events were
+          lost or a watched directory was removed"""
+        changed=set()
+        rewatch=False
+        while True:
+            try:
+                data=os.read(self._fd,65536)
+            except BlockingIOError:
+                break
+            offset=0
+            while offset+_EVENT_HEADER.size<=len(data):
+                wd,mask,_,namelen=_EVENT_HEADER.unpack_from(data,offset)
+                offset+=_EVENT_HEADER.size
+                name=data[offset:offset+namelen].rstrip(b'\0')
+                offset+=namelen
+                if mask&IN_Q_OVERFLOW:
+                    changed=None
+                    continue
+                path=self._wds.get(wd)
+                if path is None:
+                    continue
+                if mask&(IN_DELETE_SELF|IN_MOVE_SELF|IN_IGNORED):
+                    del self._wds[wd]
+                    self._watches.pop(path,None)
+                    rewatch=True
+                    if changed is not None:
+                        changed.add(path)
+                    continue
+                if not name:
+                    continue
+                fullpath=os.path.join(path,os.fsdecode(name))
+                if fullpath in self._ignored:
+                    continue
+                if mask&IN_ISDIR and \
+                        mask&(IN_CREATE|IN_MOVED_TO) and \
+                        self._is_wanted_parent(fullpath):
+                    rewatch=True
+                if changed is not None:
+                    changed.add(fullpath)
+        if rewatch:
+            self._add_watches()
+            # files may have been written to a new directory before it
+            # was watched, so callers must check everything
+            return None
+        return changed
+
+    def _is_wanted_parent(self,path):
+        """!Returns True if the path is a wanted directory or one of its
+        parents.
+        @param path the path of a new directory"""
+        prefix=path+os.sep
+        for wanted in self._wanted:
+            if wanted==path or wanted.startswith(prefix):
+                return True
+        return False
@@ -693,6 +693,14 @@ class Pipeline(object):
         else:
             return -128
 
+    def rusage(self):
+        """!Returns a list of the resource usage (the struct_rusage
+        from os.wait4) of each child process that has exited, or an
+        empty list if communicate has not completed."""
+        m=self.__managed
+        if not m: return list()
+        return [ r[2] for r in m.values() ]
+
     def to_string(self):
         """!Calls self.communicate(), and returns the stdout from the
         pipeline (self.outbytes).  The return value will be Null if
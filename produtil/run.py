@@ -431,7 +431,7 @@ def runsync(logger=None,mpiimpl=None):
         mpiimpl=detect_mpi()
     return mpiimpl.runsync(logger=logger)
 
-def run(arg,logger=None,sleeptime=None,**kwargs):
+def run(arg,logger=None,sleeptime=None,rusage=None,**kwargs):
     """!Executes the specified program and attempts to return its exit
     status.  In the case of a pipeline, the highest exit status seen
     is returned.  For MPI programs, exit statuses are unreliable and
@@ -445,10 +445,14 @@ def run(arg,logger=None,sleeptime=None,**kwargs):
       exe(), bigexe() or mpirun()
     @param logger a logging.Logger to log messages
     @param sleeptime time to sleep between checks of child process
+    @param rusage if a list is provided, the resource usage from
+      os.wait4 of each child process is appended to it
     @param kwargs ignored"""
     p=make_pipeline(arg,False,logger=logger)
     p.communicate(sleeptime=sleeptime)
     result=p.poll()
+    if rusage is not None:
+        rusage.extend(p.rusage())
     if logger is not None:
         logger.info('  - exit status %d'%(int(result),))
     return result
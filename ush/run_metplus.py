@@ -28,6 +28,7 @@ import produtil.setup
 
 from metplus.util import metplus_check
 from metplus.util import pre_run_setup, run_metplus, post_run_cleanup
+from metplus.util import run_metplus_shards
 from metplus import __version__ as metplus_version
 
 '''!@namespace run_metplus
@@ -40,7 +41,7 @@ def main():
     METplus script that invokes the necessary Python scripts
     to perform various activities, such as series analysis."""
 
-    config_inputs = get_config_inputs_from_command_line()
+    config_inputs, num_shards = get_config_inputs_from_command_line()
     config = pre_run_setup(config_inputs)
 
     # warn if calling master_metplus.py
@@ -50,7 +51,11 @@ def main():
                "This script name will be removed in a future version.")
         config.logger.warning(msg)
 
-    total_errors = run_metplus(config)
+    if num_shards:
+        total_errors = run_metplus_shards(config, config_inputs, num_shards,
+                                          os.path.abspath(__file__))
+    else:
+        total_errors = run_metplus(config)
 
     post_run_cleanup(config, 'METplus', total_errors)
 
@@ -64,6 +69,14 @@ def usage():
     print ('''
 Usage: %s arg1 arg2 arg3
     -h|--help               Display this usage statement
+    --shard i/N             Only run shard i (starting at 0) of N shards of
+                            the run times
+    --shards N              Split the run times into N shards and run each
+                            shard in a separate process. Uses MPI to launch
+                            the shards if it is available
+    --daemon                Watch the input directories and run the
+                            wrappers for each run time as soon as all of its
+                            input files have been written
 
 Arguments:
 /path/to/parmfile.conf -- Specify custom configuration file to use
@@ -79,7 +92,8 @@ def get_config_inputs_from_command_line():
          usage statement if invalid configuration or if help
          statement is requested, i.e. -h. Report error if
          invalid flag was provided, i.e. -a.
-         @returns list of config inputs
+         @returns tuple of list of config inputs and number of shards to
+          launch or None if --shards was not used
     """
     # if not arguments were provided, print usage and exit
     if len(sys.argv) < 2:
@@ -94,7 +108,26 @@ def get_config_inputs_from_command_line():
 
     # pull out command line arguments
     config_inputs = []
-    for arg in sys.argv[1:]:
+    num_shards = None
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        if arg in ('--shard', '--shards'):
+            if not args:
+                print('ERROR: Missing value for %s' % arg)
+                usage()
+
+            value = args.pop(0)
+            if arg == '--shards':
+                num_shards = get_shard_count(value)
+            else:
+                config_inputs.extend(get_shard_overrides(value))
+            continue
+
+        if arg == '--daemon':
+            config_inputs.append('config.REALTIME_DAEMON=True')
+            continue
+
         if arg.startswith('-'):
             # ignore -c and --config since they are now optional
             if arg == '-c' or arg == '--config' or arg == '-config':
@@ -115,7 +148,36 @@ def get_config_inputs_from_command_line():
     if not config_inputs:
         usage()
 
-    return config_inputs
+    return config_inputs, num_shards
+
+
+def get_shard_count(value):
+    """! Read value of --shards argument.
+         @param value number of shards
+         @returns integer number of shards
+    """
+    if not value.isdigit() or int(value) < 1:
+        print('ERROR: Invalid value for --shards: %s' % value)
+        usage()
+
+    return int(value)
+
+
+def get_shard_overrides(value):
+    """! Read value of --shard argument and get config overrides to set.
+         @param value shard to run in the format i/N where i is the index of
+          the shard starting at 0 and N is the number of shards
+         @returns list of config variable overrides
+    """
+    index, _, count = value.partition('/')
+    if (not index.isdigit() or not count.isdigit() or
+            int(index) >= int(count)):
+        print('ERROR: Invalid value for --shard: %s. '
+              'Must be i/N where 0 <= i < N' % value)
+        usage()
+
+    return ['config.SHARD_INDEX=%s' % int(index),
+            'config.SHARD_COUNT=%s' % int(count)]
 
 
 if __name__ == "__main__":